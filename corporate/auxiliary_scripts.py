@@ -1,80 +1,153 @@
 import os
-import zipfile
-import shutil
 
 from django.conf import settings
-from django.db.models import Q
 from django.template.defaultfilters import slugify
 
 from corporate.models import CorporateResourceGuide
-from mig_main.models import Major, MemberProfile, Standing
-from mig_main.utility import zipdir
+from mig_main.models import MemberProfile, Standing
+from mig_main.utility import sync_directory, update_zip
 
 RESUMES_BY_MAJOR_LOCATION = lambda: os.path.sep.join([settings.MEDIA_ROOT,'Resumes_by_major'])
 RESUMES_BY_YEAR_LOCATION = lambda: os.path.sep.join([settings.MEDIA_ROOT,'Resumes_by_year'])
+RESUMES_BY_MAJOR_ZIP = lambda: os.sep.join([settings.MEDIA_ROOT,'TBP_resumes_by_major.zip'])
+RESUMES_BY_YEAR_ZIP = lambda: os.sep.join([settings.MEDIA_ROOT,'TBP_resumes_by_year.zip'])
 
-def compile_resumes(include_alums=False):
+
+def get_media_path(field_file):
     media_parent = '/'.join(settings.MEDIA_ROOT.split('/')[:-2])+'/'
-    if os.path.exists(RESUMES_BY_MAJOR_LOCATION()):
-        shutil.rmtree(RESUMES_BY_MAJOR_LOCATION())
-    os.makedirs(RESUMES_BY_MAJOR_LOCATION())
+    return media_parent+field_file.url
+
+
+def get_resource_guide_entries():
+    """ Returns the active corporate resource guide as a {file name: path}
+    dictionary, empty if there is none.
+    """
     resource_guides = CorporateResourceGuide.objects.filter(active=True)
-    if resource_guides:
-        shutil.copy(media_parent+resource_guides[0].resource_guide.url,os.path.sep.join([RESUMES_BY_MAJOR_LOCATION(),slugify(resource_guides[0].name)+'.pdf']))
-    for resume_major in Major.objects.all():
-        query=Q(major=resume_major)
-        users_in_major = MemberProfile.get_members(include_alums=include_alums).filter(query)
-        for user in users_in_major:
-            if user.resume:
-                major_dir = os.path.sep.join([RESUMES_BY_MAJOR_LOCATION(),slugify(resume_major.name)])
-                if not os.path.exists(major_dir):
-                    os.makedirs(major_dir)
-                resume_name=user.get_resume_name()
-                shutil.copy(media_parent+user.resume.url,os.path.sep.join([major_dir,resume_name]))
-    if os.path.exists(RESUMES_BY_YEAR_LOCATION()):
-        shutil.rmtree(RESUMES_BY_YEAR_LOCATION())
-    os.makedirs(RESUMES_BY_YEAR_LOCATION())
-    if resource_guides:
-        shutil.copy(media_parent+resource_guides[0].resource_guide.url,os.path.sep.join([RESUMES_BY_YEAR_LOCATION(),slugify(resource_guides[0].name)+'.pdf']))
+    if not resource_guides:
+        return {}
+    return {
+        slugify(resource_guides[0].name)+'.pdf': get_media_path(
+                                            resource_guides[0].resource_guide
+        )
+    }
+
+
+def get_members_with_resumes(include_alums=True):
+    return MemberProfile.get_members(
+                include_alums=include_alums
+    ).exclude(resume='').select_related('standing').prefetch_related('major')
+
+
+def get_resume_year_directory(member):
+    """ Returns the directory of the by-year resume book the member's resume
+    goes in.
+    """
+    if member.standing.name == 'Alumni':
+        status_dir = slugify(member.standing.name)
+    else:
+        status_dir = slugify(member.standing.name)+'-student'
+    return os.path.sep.join([
+                status_dir,
+                'Graduating'+slugify(member.expect_grad_date.year)
+    ])
+
 
+def get_resumes_by_major(include_alums=False):
+    """ Returns the resume book by major as a {path in the book: path of the
+    file} dictionary, along with the directories it should have.
+    """
+    entries = get_resource_guide_entries()
+    for user in get_members_with_resumes(include_alums=include_alums):
+        for resume_major in user.major.all():
+            entries[os.path.sep.join([
+                        slugify(resume_major.name),
+                        user.get_resume_name()
+            ])] = get_media_path(user.resume)
+    return entries, []
+
+
+def get_resumes_by_year(include_alums=False):
+    """ Returns the resume book by standing and graduation year as a {path
+    in the book: path of the file} dictionary, along with the directories it
+    should have: one per standing, even if it is empty.
+    """
+    entries = get_resource_guide_entries()
+    directories = []
     for standing in Standing.objects.all():
-        members = MemberProfile.get_members().filter(standing=standing)
         if standing.name == 'Alumni':
             if not include_alums:
                 continue
-            status_dir = os.path.sep.join([RESUMES_BY_YEAR_LOCATION(),slugify(standing.name)])
+            directories.append(slugify(standing.name))
         else:
-            status_dir = os.path.sep.join([RESUMES_BY_YEAR_LOCATION(), slugify(standing.name)+'-student'])
-        if not os.path.exists(status_dir):
-            os.makedirs(status_dir)
-        for user in members:
-            if user.resume:
-                current_grad_year = user.expect_grad_date.year
-                year_dir = os.path.sep.join([status_dir,'Graduating'+slugify(current_grad_year)])
-                if not os.path.exists(year_dir):
-                    os.makedirs(year_dir)
-                resume_name=slugify(user.last_name+'_'+user.first_name+'_'+user.uniqname)+'.pdf'
-                shutil.copy(media_parent+user.resume.url,os.path.sep.join([year_dir,resume_name]))
+            directories.append(slugify(standing.name)+'-student')
+    for user in get_members_with_resumes():
+        if user.standing.name == 'Alumni' and not include_alums:
+            continue
+        resume_name=slugify(user.last_name+'_'+user.first_name+'_'+user.uniqname)+'.pdf'
+        entries[os.path.sep.join([
+                    get_resume_year_directory(user),
+                    resume_name
+        ])] = get_media_path(user.resume)
+    return entries, directories
+
+
+def compile_resumes(include_alums=False):
+    """ Brings the resume books by major and by year up to date, copying only
+    the resumes that were added or changed and removing those that no longer
+    belong. Returns the changes to each book.
+    """
+    by_major, major_directories = get_resumes_by_major(include_alums)
+    by_year, year_directories = get_resumes_by_year(include_alums)
+    return {
+        'by_major': sync_directory(
+                        RESUMES_BY_MAJOR_LOCATION(),
+                        by_major,
+                        major_directories
+        ),
+        'by_year': sync_directory(
+                        RESUMES_BY_YEAR_LOCATION(),
+                        by_year,
+                        year_directories
+        ),
+    }
+
 
 def update_resume_zips():
-    compile_resumes()
-    current_path = os.getcwd()
-    zip_file_name = os.sep.join([settings.MEDIA_ROOT,'TBP_resumes_by_major.zip'])
-    try:
-        os.remove(zip_file_name)
-    except OSError:
-        pass
-    zip_f = zipfile.ZipFile(zip_file_name,'w')
-    os.chdir(RESUMES_BY_MAJOR_LOCATION())
-    zipdir('.',zip_f)
-    zip_f.close()
-    zip_file_name_year = os.sep.join([settings.MEDIA_ROOT,'TBP_resumes_by_year.zip'])
-    try:
-        os.remove(zip_file_name_year)
-    except OSError:
-        pass
-    zip_f = zipfile.ZipFile(zip_file_name_year,'w')
-    os.chdir(RESUMES_BY_YEAR_LOCATION())
-    zipdir('.',zip_f)
-    zip_f.close()
-    os.chdir(current_path)
\ No newline at end of file
+    changes = compile_resumes()
+    update_zip(
+            RESUMES_BY_MAJOR_ZIP(),
+            RESUMES_BY_MAJOR_LOCATION(),
+            changes['by_major']
+    )
+    update_zip(
+            RESUMES_BY_YEAR_ZIP(),
+            RESUMES_BY_YEAR_LOCATION(),
+            changes['by_year']
+    )
+
+
+def get_resume_entries(majors=None, grad_years=None, standings=None):
+    """ Returns the (name in the zip, path) entries of a resume book limited
+    to the given majors, graduation years and standings, for streaming with
+    get_zip_response.
+
+    A filter that is not given (or empty) does not limit the book. Alumni
+    are left out, as they are from the prebuilt books.
+    """
+    members = get_members_with_resumes(include_alums=False)
+    if majors:
+        members = members.filter(major__in=majors).distinct()
+    if grad_years:
+        members = members.filter(expect_grad_date__year__in=grad_years)
+    if standings:
+        members = members.filter(standing__in=standings)
+    entries = sorted(get_resource_guide_entries().items())
+    for user in members:
+        entries.append((
+                os.path.sep.join([
+                    get_resume_year_directory(user),
+                    user.get_resume_name()
+                ]),
+                get_media_path(user.resume)
+        ))
+    return entries
@@ -8,7 +8,7 @@ from django_select2.forms import (
 from localflavor.us.forms import USPhoneNumberField
 
 from corporate.models import Company, MemberContact, NonMemberContact
-from mig_main.models import MemberProfile, TBPChapter
+from mig_main.models import Major, MemberProfile, Standing, TBPChapter
 
 
 class AddContactForm(forms.Form):
@@ -196,3 +196,31 @@ ContactFormSet = formset_factory(
                         formset=BaseContactFormSet,
                         can_delete=True
 )
+
+
+class ResumeFilterForm(forms.Form):
+    """ Picks the part of the resume book to download. Leaving a field empty
+    includes everyone for it.
+    """
+    majors = forms.ModelMultipleChoiceField(
+                    queryset=Major.objects.order_by('name'),
+                    required=False
+    )
+    grad_years = forms.TypedMultipleChoiceField(
+                    label='Graduation years',
+                    coerce=int,
+                    required=False
+    )
+    standings = forms.ModelMultipleChoiceField(
+                    queryset=Standing.objects.exclude(name='Alumni'),
+                    required=False
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(ResumeFilterForm, self).__init__(*args, **kwargs)
+        grad_dates = MemberProfile.get_members(
+                                include_alums=False
+        ).exclude(resume='').dates('expect_grad_date', 'year')
+        self.fields['grad_years'].choices = [
+            (grad_date.year, grad_date.year) for grad_date in grad_dates
+        ]
@@ -5,6 +5,7 @@ from corporate import views
 urlpatterns = [
 	url(r'^$',views.index, name='index'),
 	url(r'^resumes/$',views.resumes, name='resumes'),
+	url(r'^resumes/download/$',views.download_resumes, name='download_resumes'),
 	url(r'^edit/$',views.update_corporate_page, name='update_corporate_page'),
 	url(r'^update_resource_guide/$',views.update_resource_guide, name='update_resource_guide'),
 	url(r'^add_contact/$',views.add_company_contact, name='add_company_contact'),
@@ -4,11 +4,11 @@ from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.template import loader
 from django_ajax.decorators import ajax
-from corporate.auxiliary_scripts import update_resume_zips
-from corporate.forms import AddContactForm, ContactFormSet
+from corporate.auxiliary_scripts import get_resume_entries, update_resume_zips
+from corporate.forms import AddContactForm, ContactFormSet, ResumeFilterForm
 from corporate.models import CorporateTextField, CorporateResourceGuide
 from corporate.models import CompanyContact, Company, JobField, CorporateEmail
-from mig_main.utility import get_message_dict, Permissions
+from mig_main.utility import get_message_dict, get_zip_response, Permissions
 
 FORM_ERROR = 'Your submision contained errors, please correct and resubmit.'
 
@@ -53,6 +53,7 @@ def resumes(request):
     context_dict = {
         'by_major_zip': 'TBP_resumes_by_major.zip',
         'by_year_zip': 'TBP_resumes_by_year.zip',
+        'form': ResumeFilterForm(),
         'subnav': 'resumes',
         }
     context_dict.update(get_common_context(request))
@@ -60,6 +61,17 @@ def resumes(request):
     return HttpResponse(template.render(context_dict, request))
 
 
+def download_resumes(request):
+    form = ResumeFilterForm(request.GET)
+    if not form.is_valid():
+        request.session['error_message'] = FORM_ERROR
+        return redirect('corporate:resumes')
+    return get_zip_response(
+                'TBP_resumes.zip',
+                get_resume_entries(**form.cleaned_data)
+    )
+
+
 def update_corporate_page(request):
     if not Permissions.can_edit_corporate_page(request.user):
         request.session['error_message'] = 'You are not authorized to edit the corporate page'
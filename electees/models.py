@@ -1,5 +1,5 @@
 from django.db import models
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
 from django.core.validators import RegexValidator
 
 from event_cal.models import CalendarEvent
@@ -75,130 +75,171 @@ class ElecteeGroup(models.Model):
     def __unicode__(self):
         return unicode(self.term)+": "+self.group_name
 
-    def add_threshold_attendance_points(self):
-        """ Add the group points for events that group members attended.
-        Goes through each event and if the requisite fraction of group members
-        were in attendance, points are rewarded accordingly.
+    @classmethod
+    def get_attendance_matrix(cls, term):
+        """ Returns the attendance at the term's completed service and social
+        events as a dictionary mapping each event id to its name, whether it
+        is a service and/or social event, and the set of attendees'
+        uniqnames.
+
+        Built from a single attendance query so that it can be shared by all
+        of the term's groups.
         """
-        evts = CalendarEvent.objects.filter(
+        categories = EventCategory.get_categories_with_ancestors()
+        service_ids = set()
+        social_ids = set()
+        for category_id, chain in categories.items():
+            names = [category.name for category in chain]
+            if 'Service Hours' in names:
+                service_ids.add(category_id)
+            if 'Social Credits' in names:
+                social_ids.add(category_id)
+        attendance = CalendarEvent.objects.filter(
                                 completed=True,
-                                term=grp.term
-        )
-        num_members = grp.members.all().count()
-        if num_members == 0:
-            return None
-        service_cat = EventCategory.objects.get(name='Service Hours')
-        social_cat = EventCategory.objects.get(name='Social Credits')
-        service_query = service_cat.get_children(Q())
-        social_query = social_cat.get_children(Q())
-
-        # Following 4 lines fix the issue of having groups get lots of credit
-        # when groups are empty. That should be fixed by return above. Also
-        # this seems to create new problem of recalculating points based on
-        # changing group size, rather than its size at the time the event
-        # happened
-        # threshold_evts = grp.electeegroupevent_set.exclude(
-        #                                related_event_id=None
-        #                                )
-        # threshold_evts.delete()
-
-        # service
-        for evt in evts.filter(service_query):
-            if grp.electeegroupevent_set.filter(
-                            related_event_id=evt.id).exists():
-                continue
-            num_attendees = 0
-            for group_member in grp.members.all():
-                if evt.eventshift_set.filter(attendees=group_member).exists():
-                    num_attendees += 1
-            if num_attendees == num_members:
-                grp_pts = grp.electeegroupevent_set.create(
-                        description='Threshold Attendance Event: '+evt.name,
-                        points=30,
-                        related_event_id=evt.id
-                )
-                grp_pts.save()
-            elif num_attendees >= num_members/2.0:
-                grp_pts = grp.electeegroupevent_set.create(
-                        description='Threshold Attendance Event: '+evt.name,
-                        points=15,
-                        related_event_id=evt.id
-                )
-                grp_pts.save()
-        # social
-        for evt in evts.filter(social_query):
-            if grp.electeegroupevent_set.filter(
-                            related_event_id=evt.id).exists():
-                continue
-            num_attendees = 0
-            for group_member in grp.members.all():
-                if evt.eventshift_set.filter(attendees=group_member).exists():
-                    num_attendees += 1
-            if num_attendees == num_members:
-                grp_pts = grp.electeegroupevent_set.create(
-                        description='Threshold Attendance Event: '+evt.name,
-                        points=10,
-                        related_event_id=evt.id
-                )
-                grp_pts.save()
-            elif num_attendees >= num_members/2.0:
-                grp_pts = grp.electeegroupevent_set.create(
-                        description='Threshold Attendance Event: '+evt.name,
-                        points=5,
-                        related_event_id=evt.id
-                )
-                grp_pts.save()
-        grp.electeegroupevent_set.filter(
-                    description='half_members_3_socials'
-        ).delete()
-        grp.electeegroupevent_set.filter(
-                    description='All_members_3_socials'
+                                term=term,
+                                event_type_id__in=service_ids | social_ids
+        ).values_list(
+                'id',
+                'name',
+                'event_type_id',
+                'eventshift__attendees'
+        ).distinct()
+        matrix = {}
+        for event_id, name, event_type_id, attendee in attendance:
+            if event_id not in matrix:
+                matrix[event_id] = {
+                    'name': name,
+                    'is_service': event_type_id in service_ids,
+                    'is_social': event_type_id in social_ids,
+                    'attendees': set(),
+                }
+            if attendee is not None:
+                matrix[event_id]['attendees'].add(attendee)
+        return matrix
+
+    @classmethod
+    def update_group_points(cls, term):
+        """ Adds the threshold attendance and socials points for every group
+        in the term and re-sums the stored points.
+
+        A group is rewarded for an event if at least half of its members
+        attended (more if all of them did), and for having at least half (or
+        all) of its members attend 3 or more socials. Points for an event are
+        awarded once, the socials points are recomputed each time.
+        """
+        groups = list(cls.objects.filter(term=term))
+        if not groups:
+            return
+        group_ids = [group.id for group in groups]
+        members = {group_id: set() for group_id in group_ids}
+        for group_id, uniqname in cls.members.through.objects.filter(
+                    electeegroup__in=group_ids
+                ).values_list('electeegroup_id', 'memberprofile_id'):
+            members[group_id].add(uniqname)
+        awarded = set(ElecteeGroupEvent.objects.filter(
+                                electee_group__in=group_ids
+                    ).exclude(
+                        related_event_id=None
+                    ).values_list('electee_group_id', 'related_event_id'))
+        matrix = cls.get_attendance_matrix(term)
+        ElecteeGroupEvent.objects.filter(
+                electee_group__in=group_ids,
+                description__in=[
+                    'half_members_3_socials',
+                    'All_members_3_socials'
+                ]
         ).delete()
-        num_w_three = 0
-        for group_member in grp.members.all():
-            socials_attended = evts.filter(
-                                    social_query
-                ).filter(
-                    eventshift__attendees=group_member
-                ).distinct().count()
-            if socials_attended >= 3:
-                num_w_three += 1
-        if num_w_three == num_members:
-            grp_pts = grp.electeegroupevent_set.create(
-                                description='All_members_3_socials',
-                                points=40
-            )
-            grp_pts.save()
-        elif num_w_three >= num_members/2.0:
-            grp_pts = grp.electeegroupevent_set.create(
-                                description='half_members_3_socials',
-                                points=20
-            )
-            grp_pts.save()
-
-    def sum_group_points(self):
-        """ Sums and saves the group points.
+        new_points = []
+        for group in groups:
+            group_members = members[group.id]
+            num_members = len(group_members)
+            if num_members == 0:
+                continue
+            socials_attended = dict.fromkeys(group_members, 0)
+            for event_id, event in sorted(matrix.items()):
+                attendees = event['attendees'] & group_members
+                if event['is_social']:
+                    for uniqname in attendees:
+                        socials_attended[uniqname] += 1
+                if (group.id, event_id) in awarded:
+                    continue
+                full_points = 30 if event['is_service'] else 10
+                if len(attendees) == num_members:
+                    points = full_points
+                elif len(attendees) >= num_members/2.0:
+                    points = full_points/2
+                else:
+                    continue
+                new_points.append(ElecteeGroupEvent(
+                        electee_group=group,
+                        description='Threshold Attendance Event: ' +
+                                    event['name'],
+                        points=points,
+                        related_event_id=event_id
+                ))
+            num_w_three = len([
+                uniqname for uniqname, count in socials_attended.items()
+                if count >= 3
+            ])
+            if num_w_three == num_members:
+                new_points.append(ElecteeGroupEvent(
+                        electee_group=group,
+                        description='All_members_3_socials',
+                        points=40
+                ))
+            elif num_w_three >= num_members/2.0:
+                new_points.append(ElecteeGroupEvent(
+                        electee_group=group,
+                        description='half_members_3_socials',
+                        points=20
+                ))
+        ElecteeGroupEvent.objects.bulk_create(new_points)
+        cls.sum_group_points(term)
+
+    @classmethod
+    def sum_group_points(cls, term):
+        """ Sums and saves the points of each of the term's groups.
         Does not return anything. Does not re-evaluate event attendance.
         """
-        evts = self.electeegroupevent_set.all()
-        temp_pts = 0
-        for evt in evts:
-            temp_pts += evt.points
-        self.points = temp_pts
-        self.save()
+        totals = dict(ElecteeGroupEvent.objects.filter(
+                                electee_group__term=term
+                    ).values_list(
+                        'electee_group_id'
+                    ).annotate(Sum('points')))
+        for group in cls.objects.filter(term=term):
+            points = totals.get(group.id) or 0
+            if group.points != points:
+                group.points = points
+                group.save(update_fields=['points'])
 
     def get_points(self):
-        """ Tabulates and returns the group points.
-        Provided that the group indeed has members."""
-        if self.members.count() > 0:
-            self.add_threshold_attendance_points()
-            self.sum_group_points()
+        """ Returns the group points as last tabulated by
+        update_group_points.
+        """
         return self.points
 
+    @classmethod
+    def get_standings(cls, term):
+        """ Returns the term's groups ordered by points, each annotated with
+        its ranking (tied groups share a ranking).
+        """
+        standings = list(cls.objects.filter(term=term).order_by(
+                                                    '-points',
+                                                    'group_name'
+        ))
+        for index, group in enumerate(standings):
+            if index and group.points == standings[index - 1].points:
+                group.ranking = standings[index - 1].ranking
+            else:
+                group.ranking = index + 1
+        return standings
+
     def get_ranking(self):
         """ Determines where the team ranks.
         Returns the place.
         """
+        if hasattr(self, 'ranking'):
+            return self.ranking
         return ElecteeGroup.objects.filter(
                             term=self.term,
                             points__gt=self.points
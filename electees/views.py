@@ -1,7 +1,5 @@
 import json
 import os
-import zipfile
-import shutil
 from datetime import date
 
 
@@ -16,6 +14,7 @@ from django.forms.models import modelformset_factory, modelform_factory
 from django.forms import CheckboxSelectMultiple
 from django.core.urlresolvers import reverse
 
+from corporate.auxiliary_scripts import get_media_path
 from event_cal.models import InterviewShift
 from electees.models import (
                     ElecteeGroup,
@@ -34,7 +33,8 @@ from mig_main.utility import (
                 Permissions,
                 get_previous_page,
                 get_message_dict,
-                zipdir
+                sync_directory,
+                update_zip
 )
 from member_resources.views import get_permissions as get_member_permissions
 from history.models import Officer
@@ -52,35 +52,24 @@ from django.conf import  settings
 
 ELECTEE_RESUME_LOCATION = lambda: os.path.sep.join([settings.MEDIA_ROOT,'electee_resumes'])
 
+ELECTEE_RESUME_ZIP = lambda: os.sep.join([settings.MEDIA_ROOT,'TBP_electee_resumes.zip'])
+
 def compile_electee_resumes():
-    try:
-        shutil.rmtree(ELECTEE_RESUME_LOCATION())
-    except OSError:
-        pass
-    media_parent = '/'.join(settings.MEDIA_ROOT.split('/')[:-2])+'/'
-    os.makedirs(ELECTEE_RESUME_LOCATION())
-    electees = MemberProfile.get_electees()
+    """ Brings the electee resume book up to date, copying only the resumes
+    that were added or changed. Returns the changes to the book.
+    """
+    electees = MemberProfile.get_electees().exclude(
+                                    resume=''
+    ).select_related('standing')
+    entries = {}
     for electee in electees:
-        if electee.resume:
-            standing_dir = os.path.sep.join([ELECTEE_RESUME_LOCATION(),slugify(electee.standing.name)])
-            if not os.path.exists(standing_dir):
-                os.makedirs(standing_dir)
-            resume_name=slugify(electee.last_name+'_'+electee.first_name+'_'+electee.uniqname)+'.pdf'
-            shutil.copy(media_parent+electee.resume.url,os.path.sep.join([standing_dir,resume_name]))
+        resume_name=slugify(electee.last_name+'_'+electee.first_name+'_'+electee.uniqname)+'.pdf'
+        entries[os.path.sep.join([slugify(electee.standing.name),resume_name])] = get_media_path(electee.resume)
+    return sync_directory(ELECTEE_RESUME_LOCATION(), entries)
 
 def update_electee_resume_zips():
-    compile_electee_resumes()
-    current_path = os.getcwd()
-    zip_file_name = os.sep.join([settings.MEDIA_ROOT,'TBP_electee_resumes.zip'])
-    try:
-        os.remove(zip_file_name)
-    except OSError:
-        pass
-    zip_f = zipfile.ZipFile(zip_file_name,'w')
-    os.chdir(ELECTEE_RESUME_LOCATION())
-    zipdir('.',zip_f)
-    zip_f.close()
-    os.chdir(current_path)
+    changes = compile_electee_resumes()
+    update_zip(ELECTEE_RESUME_ZIP(), ELECTEE_RESUME_LOCATION(), changes)
 
 def can_submit_background_form(user):
     if not user_is_member(user):
@@ -120,7 +109,7 @@ def get_common_context(request):
 
 def view_electee_groups(request):
     request.session['current_page']=request.path
-    e_groups = ElecteeGroup.objects.filter(term=AcademicTerm.get_current_term()).order_by('points')
+    e_groups = ElecteeGroup.get_standings(AcademicTerm.get_current_term())
     packets = ElecteeResource.objects.filter(term=AcademicTerm.get_current_term(),resource_type__is_packet=True).order_by('resource_type')
     resources = ElecteeResource.objects.filter(term=AcademicTerm.get_current_term(),resource_type__is_packet=False).order_by('resource_type')
     old_packets = ElecteeResource.objects.exclude(
@@ -196,6 +185,7 @@ def edit_electee_group_membership(request):
             group.members.clear()
             for member in members:
                 group.members.add(MemberProfile.objects.get(uniqname=member))
+        ElecteeGroup.update_group_points(AcademicTerm.get_current_term())
         request.session['success_message']='Your changes have been saved'
 
     e_groups = ElecteeGroup.objects.filter(term=AcademicTerm.get_current_term())
@@ -220,6 +210,7 @@ def manually_edit_electee_group_membership(request):
     if request.method=='POST':
         if formset.is_valid():
             formset.save()
+            ElecteeGroup.update_group_points(term)
             request.session['success_message']='Electee team membership updated successfully'
             return redirect('electees:view_electee_groups')
         else:
@@ -251,6 +242,7 @@ def edit_electee_group_points(request):
         formset = GroupPointsFormSet(request.POST,prefix='group_points',queryset=ElecteeGroupEvent.objects.filter(related_event_id=None,electee_group__term=term))
         if formset.is_valid():
             formset.save()
+            ElecteeGroup.sum_group_points(term)
             request.session['success_message']='Electee team points updated successfully'
             return redirect('electees:view_electee_groups')
         else:
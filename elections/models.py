@@ -7,7 +7,7 @@ from django.utils.encoding import force_unicode
 
 from markdown import markdown
 
-from mig_main.models import OfficerPosition
+from mig_main.models import OfficerPosition, invalidate_nav_dropdowns
 
 def default_close_date():
     return date.today()+timedelta(weeks=3)
@@ -28,6 +28,14 @@ class Election(models.Model):
     def __unicode__(self):
         return str(self.term)+" Election"
 
+    def save(self, *args, **kwargs):
+        super(Election, self).save(*args, **kwargs)
+        invalidate_nav_dropdowns()
+
+    def delete(self, *args, **kwargs):
+        super(Election, self).delete(*args, **kwargs)
+        invalidate_nav_dropdowns()
+
     @classmethod
     def get_current_elections(cls):
         return cls.objects.filter(
@@ -6,6 +6,7 @@ from event_cal.models import (
             EventPhoto,
             EventShift,
             GoogleCalendar,
+            GoogleCalendarChange,
             InterviewShift,
             MeetingSignIn,
             MeetingSignInUserData,
@@ -23,6 +24,7 @@ class CalendarAdmin(admin.ModelAdmin):
 
 admin.site.register(CalendarEvent, CalendarAdmin)
 admin.site.register(GoogleCalendar)
+admin.site.register(GoogleCalendarChange)
 admin.site.register(MeetingSignIn)
 admin.site.register(MeetingSignInUserData)
 admin.site.register(AnnouncementBlurb)
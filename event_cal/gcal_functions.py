@@ -4,6 +4,7 @@ from gcal import gflags
 from gcal import httplib2
 
 from gcal.apiclient.discovery import build
+from gcal.apiclient.http import BatchHttpRequest
 from gcal.oauth2client.file import Storage
 from gcal.oauth2client.client import OAuth2WebServerFlow
 from gcal.oauth2client.tools import run
@@ -23,6 +24,10 @@ FLAGS.auth_local_webserver = False
 # The client_id and client_secret are copied from the API Access tab on
 # the Google APIs Console
 CALENDAR_DATA = migweb.local_settings.gcal_cal_data
+# Google caps calendar batches at 50 requests and only accepts them on the
+# per-API batch endpoint.
+BATCH_URI = 'https://www.googleapis.com/batch/calendar/v3'
+BATCH_SIZE = 50
 FLOW = OAuth2WebServerFlow(
     client_id=migweb.local_settings.gcal_client_id,
     client_secret=migweb.local_settings.gcal_client_secret,
@@ -85,3 +90,28 @@ def get_service(http):
     if http:
         return build(serviceName='calendar', version='v3', http=http,
                      developerKey=migweb.local_settings.gcal_developerKey)
+
+
+def execute_batched(http, requests):
+    """
+    Sends the (key, request) pairs to google in batches of BATCH_SIZE and
+    returns a dictionary mapping each key to a (response, exception) pair.
+    If a whole batch fails, every request in it gets that batch's exception.
+    """
+    results = {}
+    for start in range(0, len(requests), BATCH_SIZE):
+        chunk = requests[start:start + BATCH_SIZE]
+        keys = {}
+
+        def callback(request_id, response, exception):
+            results[keys[request_id]] = (response, exception)
+        batch = BatchHttpRequest(callback=callback, batch_uri=BATCH_URI)
+        for index, (key, request) in enumerate(chunk):
+            keys[str(index)] = key
+            batch.add(request, request_id=str(index))
+        try:
+            batch.execute(http=http)
+        except Exception, err:
+            for key, request in chunk:
+                results.setdefault(key, (None, err))
+    return results
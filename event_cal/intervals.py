@@ -0,0 +1,55 @@
+""" Interval arithmetic for event shifts.
+
+Intervals are (start, end) pairs of datetimes. Everything here works on
+plain lists in memory so that callers can fetch the shifts they need in a
+single query and then merge them for as many members and events as they
+like.
+"""
+from datetime import timedelta
+
+
+def merge_intervals(intervals):
+    """ Returns the intervals sorted and merged so that none overlap.
+
+    Intervals that overlap (or nest) are replaced by their union. Intervals
+    that merely touch are left separate, which does not change their total
+    duration.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start < merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_duration(intervals):
+    """ Returns the total time covered by the intervals as a timedelta,
+    counting overlapping time only once.
+    """
+    duration = timedelta(hours=0)
+    for start, end in merge_intervals(intervals):
+        duration += end - start
+    return duration
+
+
+def get_hours(intervals):
+    """ Returns the total time covered by the intervals in hours, counting
+    overlapping time only once.
+    """
+    return get_duration(intervals).total_seconds()/3600.0
+
+
+def overlaps_any(interval, intervals):
+    """ Returns True if the interval overlaps any of the intervals.
+
+    Intervals that only touch (one ends as the other starts) do not
+    overlap.
+    """
+    start, end = interval
+    for other_start, other_end in intervals:
+        if other_start < end and start < other_end:
+            return True
+    return False
@@ -0,0 +1,115 @@
+""" Shared setup and teardown for the sign-up and sign-in load test commands.
+
+Each command runs against a throwaway event (with its own calendar, officer
+position and event category, all named after the command) and throwaway
+users, and deletes all of them again when it is done.
+"""
+from Queue import Empty, Queue
+from string import ascii_lowercase
+from threading import Event, Thread
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
+
+from event_cal.models import CalendarEvent, GoogleCalendar
+from mig_main.models import OfficerPosition, UserProfile
+from requirements.models import EventCategory, ProgressItem
+
+# Uniqnames of the throwaway users are this prefix plus four letters.
+LOAD_TEST_UNIQNAME_PREFIX = 'zlt'
+
+
+def get_load_test_uniqname(index):
+    letters = ''
+    for count in range(4):
+        index, remainder = divmod(index, 26)
+        letters = ascii_lowercase[remainder] + letters
+    return LOAD_TEST_UNIQNAME_PREFIX + letters
+
+
+def get_load_test_uniqnames(count):
+    """ Returns the uniqnames for count throwaway users, raising CommandError
+    if any of them already exist (say from an earlier run that was killed).
+    """
+    uniqnames = [get_load_test_uniqname(index) for index in range(count)]
+    if (User.objects.filter(username__in=uniqnames).exists() or
+            UserProfile.objects.filter(uniqname__in=uniqnames).exists()):
+        raise CommandError('Load test users already exist, remove them '
+                           'before running the load test again.')
+    return uniqnames
+
+
+def create_load_test_event(name, term, **kwargs):
+    """ Returns a new event of a new category, on a new calendar and led by a
+    new officer position, all with the given name. Any other event fields
+    can be given as keyword arguments.
+    """
+    if EventCategory.objects.filter(name=name).exists():
+        raise CommandError('A "%s" event category already exists, remove it '
+                           'before running the load test again.' % name)
+    return CalendarEvent.objects.create(
+                name=name,
+                description=name,
+                announce_text=name,
+                assoc_officer=OfficerPosition.objects.create(
+                                name=name,
+                                description=name,
+                                email='load-test@umich.edu'
+                ),
+                event_type=EventCategory.objects.create(name=name),
+                google_cal=GoogleCalendar.objects.create(name=name),
+                term=term,
+                **kwargs
+    )
+
+
+def delete_load_test_data(event, uniqnames):
+    """ Deletes the throwaway event and everything made for it, and the
+    throwaway users (with their profiles and progress).
+    """
+    category = event.event_type
+    ProgressItem.objects.filter(event_type=category).delete()
+    CalendarEvent.objects.filter(event_type=category).delete()
+    UserProfile.objects.filter(uniqname__in=uniqnames).delete()
+    User.objects.filter(username__in=uniqnames).delete()
+    category.delete()
+    event.assoc_officer.delete()
+    event.google_cal.delete()
+
+
+def run_in_pool(calls, workers=None):
+    """ Runs the calls from a pool of threads (each with its own database
+    connection, like web server workers), releasing them all at once. With
+    no workers given, each call gets a thread of its own.
+
+    Returns the results in order, with the exception in place of the result
+    for calls that raised one.
+    """
+    start = Event()
+    pending = Queue()
+    for index, call in enumerate(calls):
+        pending.put((index, call))
+    results = [None] * len(calls)
+
+    def work():
+        start.wait()
+        try:
+            while True:
+                try:
+                    index, call = pending.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results[index] = call()
+                except Exception, err:
+                    results[index] = err
+        finally:
+            connection.close()
+    threads = [Thread(target=work) for count in range(workers or len(calls))]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results
@@ -0,0 +1,191 @@
+from datetime import date, timedelta
+from importlib import import_module
+from time import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from event_cal.load_testing import (
+                create_load_test_event,
+                delete_load_test_data,
+                get_load_test_uniqnames,
+                run_in_pool,
+)
+from event_cal.models import EventShift, MeetingSignIn, MeetingSignInUserData
+from event_cal.views import meeting_sign_in
+from mig_main.models import (
+                AcademicTerm,
+                MemberProfile,
+                ShirtSize,
+                Standing,
+                Status,
+                TBPChapter,
+)
+from requirements.models import ProgressItem
+
+BENCHMARK_NAME = 'Meeting sign-in benchmark'
+
+
+def get_percentile(timings, percentile):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+class Command(BaseCommand):
+    help = ('Simulates the burst of sign-ins at the start of a meeting: every '
+            'member signs in twice at once to a throwaway meeting. Reports '
+            'the time taken and checks that everyone got progress exactly '
+            'once. Run it against a local SQLite or Postgres database, it '
+            'creates and then deletes its own meeting and members.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--users',
+                type=int,
+                dest='users',
+                default=300,
+                help='How many members sign in.'
+        )
+        parser.add_argument(
+                '--workers',
+                type=int,
+                dest='workers',
+                default=20,
+                help='How many sign-ins are handled at the same time.'
+        )
+
+    def handle(self, *args, **options):
+        term = AcademicTerm.get_current_term()
+        status = Status.objects.first()
+        standing = Standing.objects.first()
+        chapter = TBPChapter.objects.first()
+        shirt_size = ShirtSize.objects.first()
+        if not (term and status and standing and chapter and shirt_size):
+            raise CommandError('The benchmark needs a current term and at '
+                               'least one status, standing, chapter and '
+                               'shirt size.')
+        uniqnames = get_load_test_uniqnames(options['users'])
+        event = create_load_test_event(BENCHMARK_NAME, term, use_sign_in=True)
+        try:
+            now = timezone.now()
+            shift = EventShift.objects.create(
+                        event=event,
+                        start_time=now,
+                        end_time=now + timedelta(hours=1)
+            )
+            sheet = MeetingSignIn.objects.create(
+                        event=event,
+                        code_phrase='benchmark',
+                        quick_question='Benchmark?'
+            )
+            profiles = []
+            for uniqname in uniqnames:
+                user = User.objects.create_user(
+                                uniqname,
+                                uniqname + '@umich.edu'
+                )
+                profiles.append(MemberProfile.objects.create(
+                                user=user,
+                                uniqname=uniqname,
+                                first_name='Load',
+                                last_name='Test',
+                                status=status,
+                                standing=standing,
+                                init_chapter=chapter,
+                                shirt_size=shirt_size,
+                                init_term=term,
+                                short_bio='',
+                                expect_grad_date=date.today(),
+                                UMID='00000000',
+                                phone='555-555-5555'
+                ))
+            self.run_benchmark(shift, sheet, profiles, options['workers'])
+        finally:
+            delete_load_test_data(event, uniqnames)
+
+    def sign_in(self, shift_id, user_id):
+        """ Posts a correct sign-in to the meeting sign-in view, as the user,
+        and returns how long it took.
+
+        The user is loaded fresh, as the authentication middleware would for
+        a real request.
+        """
+        start = time()
+        request = RequestFactory().post(
+                    reverse('event_cal:meeting_sign_in', args=(shift_id,)),
+                    {
+                        'secret_code': 'benchmark',
+                        'quick_question': 'yes',
+                    }
+        )
+        request.user = User.objects.get(id=user_id)
+        request.session = import_module(
+                                settings.SESSION_ENGINE
+        ).SessionStore()
+        response = meeting_sign_in(request, unicode(shift_id))
+        if 'error_message' in request.session:
+            raise CommandError(request.session['error_message'])
+        if response.status_code != 302:
+            raise CommandError('Sign-in returned %d' % response.status_code)
+        return time() - start
+
+    def run_benchmark(self, shift, sheet, profiles, workers):
+        with CaptureQueriesContext(connection) as queries:
+            self.sign_in(shift.id, profiles[0].user_id)
+        self.stdout.write('One sign-in: %d queries.' % (
+                                len(queries.captured_queries)
+        ))
+        start = time()
+        # Everyone submits twice, as happens when the page is slow to load.
+        results = run_in_pool([
+            (lambda p=profile: self.sign_in(shift.id, p.user_id))
+            for profile in profiles + profiles
+        ], workers)
+        elapsed = time() - start
+        errors = [r for r in results if isinstance(r, Exception)]
+        timings = [r for r in results if not isinstance(r, Exception)]
+        self.stdout.write('%d sign-ins from %d workers in %.2fs (%.0f/s), %d '
+                          'errors%s' % (
+                                len(results),
+                                workers,
+                                elapsed,
+                                len(results) / elapsed,
+                                len(errors),
+                                ' (%s)' % errors[0] if errors else ''
+                          ))
+        if timings:
+            self.stdout.write('Latency: median %.3fs, 95th percentile %.3fs, '
+                              'max %.3fs.' % (
+                                    get_percentile(timings, 0.5),
+                                    get_percentile(timings, 0.95),
+                                    max(timings)
+                              ))
+        progress = ProgressItem.objects.filter(related_event=shift.event_id)
+        problems = []
+        if progress.count() != len(profiles):
+            problems.append('%d progress items for %d members' % (
+                                progress.count(),
+                                len(profiles)
+            ))
+        if progress.values('member').distinct().count() != len(profiles):
+            problems.append('members missing progress')
+        responses = MeetingSignInUserData.objects.filter(meeting_data=sheet)
+        if responses.count() != len(profiles):
+            problems.append('%d sign-in responses for %d members' % (
+                                responses.count(),
+                                len(profiles)
+            ))
+        if shift.attendees.count() != len(profiles):
+            problems.append('%d attendees for %d members' % (
+                                shift.attendees.count(),
+                                len(profiles)
+            ))
+        if problems:
+            raise CommandError('Benchmark failed: ' + ', '.join(problems))
+        self.stdout.write('Benchmark passed: every member signed in once.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from event_cal.models import get_event_ajax_stats
+
+
+class Command(BaseCommand):
+    help = ('Prints how often the event popups were served from the cache. '
+            'Only meaningful with a cache shared between processes.')
+
+    def handle(self, *args, **options):
+        stats = get_event_ajax_stats()
+        lookups = stats['hits'] + stats['misses']
+        self.stdout.write('%d hits, %d misses (%.0f%% hit rate).' % (
+                                stats['hits'],
+                                stats['misses'],
+                                100.0 * stats['hits'] / lookups if lookups else 0
+        ))
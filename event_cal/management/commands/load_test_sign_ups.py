@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from event_cal.load_testing import (
+                create_load_test_event,
+                delete_load_test_data,
+                get_load_test_uniqnames,
+                run_in_pool,
+)
+from event_cal.models import EventShift
+from mig_main.models import AcademicTerm, UserProfile
+
+LOAD_TEST_NAME = 'Sign-up load test'
+
+
+class Command(BaseCommand):
+    help = ('Fires concurrent sign-ups, waitlist joins and unsign-ups at a '
+            'throwaway shift and checks that it never overfills and that no '
+            'one is lost or listed twice. Run it against a local SQLite or '
+            'Postgres database, it creates and then deletes its own event '
+            'and users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--users',
+                type=int,
+                dest='users',
+                default=60,
+                help='How many users try to sign up at once.'
+        )
+        parser.add_argument(
+                '--capacity',
+                type=int,
+                dest='capacity',
+                default=10,
+                help='The capacity of the shift.'
+        )
+        parser.add_argument(
+                '--leavers',
+                type=int,
+                dest='leavers',
+                default=5,
+                help='How many attendees unsign-up at once afterwards.'
+        )
+
+    def handle(self, *args, **options):
+        term = AcademicTerm.get_current_term()
+        if not term:
+            raise CommandError('The load test needs a current term.')
+        uniqnames = get_load_test_uniqnames(options['users'])
+        event = create_load_test_event(LOAD_TEST_NAME, term)
+        try:
+            start = timezone.now() + timedelta(days=7)
+            shift = EventShift.objects.create(
+                        event=event,
+                        start_time=start,
+                        end_time=start + timedelta(hours=1),
+                        max_attendance=options['capacity']
+            )
+            profiles = []
+            for uniqname in uniqnames:
+                user = User.objects.create_user(
+                                uniqname,
+                                uniqname + '@umich.edu'
+                )
+                profiles.append(UserProfile.objects.create(
+                                user=user,
+                                uniqname=uniqname,
+                                first_name='Load',
+                                last_name='Test'
+                ))
+            self.run_load_test(shift, profiles, options['leavers'])
+        finally:
+            delete_load_test_data(event, uniqnames)
+
+    def check_shift(self, shift, expected_total):
+        attendees = list(shift.attendees.values_list('uniqname', flat=True))
+        waitlist = list(shift.get_ordered_waitlist().values_list(
+                                                    'user_id',
+                                                    flat=True
+        ))
+        problems = []
+        if len(attendees) > shift.max_attendance:
+            problems.append('%d attendees for %d spots' % (
+                                len(attendees),
+                                shift.max_attendance
+            ))
+        if len(set(waitlist)) != len(waitlist):
+            problems.append('users listed twice on the waitlist')
+        if set(attendees) & set(waitlist):
+            problems.append('attendees still on the waitlist')
+        if len(attendees) + len(waitlist) != expected_total:
+            problems.append('%d users signed up or waitlisted, expected %d' % (
+                                len(attendees) + len(waitlist),
+                                expected_total
+            ))
+        if problems:
+            raise CommandError('Load test failed: ' + ', '.join(problems))
+        return attendees, waitlist
+
+    def report(self, step, results):
+        errors = [r for r in results if isinstance(r, Exception)]
+        self.stdout.write('%s: %d succeeded, %d refused, %d errors%s' % (
+                    step,
+                    results.count(True),
+                    results.count(False),
+                    len(errors),
+                    ' (%s)' % errors[0] if errors else ''
+        ))
+
+    def run_load_test(self, shift, profiles, leavers):
+        results = run_in_pool([
+            (lambda p=profile: EventShift.objects.get(
+                                    id=shift.id).reserve_spot(p))
+            for profile in profiles
+        ])
+        self.report('Sign-ups', results)
+        attendees, waitlist = self.check_shift(shift, results.count(True))
+
+        refused = [
+            profile for profile in profiles
+            if profile.uniqname not in attendees
+        ]
+        # Everyone refused joins the waitlist twice at once.
+        results = run_in_pool([
+            (lambda p=profile: EventShift.objects.get(
+                                    id=shift.id).join_waitlist(p))
+            for profile in refused + refused
+        ])
+        self.report('Waitlist joins', results)
+        attendees, waitlist = self.check_shift(
+                                    shift,
+                                    len(attendees) + results.count(True)
+        )
+
+        leaving = attendees[:leavers]
+        total = len(attendees) + len(waitlist) - len(leaving)
+
+        def leave(uniqname):
+            leaving_shift = EventShift.objects.get(id=shift.id)
+            leaving_shift.attendees.remove(uniqname)
+            leaving_shift.fill_from_waitlist()
+            return True
+        results = run_in_pool([
+            (lambda u=uniqname: leave(u))
+            for uniqname in leaving
+        ])
+        self.report('Unsign-ups with waitlist promotion', results)
+        attendees, waitlist = self.check_shift(shift, total)
+        self.stdout.write('Load test passed: %d attendees for %d spots, %d '
+                          'on the waitlist.' % (
+                                len(attendees),
+                                shift.max_attendance,
+                                len(waitlist)
+                          ))
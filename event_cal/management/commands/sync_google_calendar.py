@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from event_cal.gcal_functions import get_credentials, get_authorized_http
+from event_cal.models import GoogleCalendarChange
+
+
+class Command(BaseCommand):
+    help = ('Sends the queued google calendar changes to google in batches. '
+            'Meant to be run every minute or so.')
+
+    def handle(self, *args, **options):
+        http = get_authorized_http(get_credentials())
+        if not http:
+            raise CommandError('Could not authorize with google calendar.')
+        handled = failed = 0
+        while True:
+            chunk_handled, chunk_failed = GoogleCalendarChange.send_pending(
+                                                                        http
+            )
+            handled += chunk_handled
+            failed += chunk_failed
+            if chunk_handled == chunk_failed:
+                break
+        self.stdout.write(
+                'Sent %d google calendar changes, %d failed.' % (
+                    handled - failed,
+                    failed
+                )
+        )
+        abandoned = GoogleCalendarChange.get_abandoned_changes().count()
+        if abandoned:
+            self.stdout.write(
+                    '%d changes failed too often and will not be retried.' % (
+                        abandoned
+                    )
+            )
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:50
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_cal', '0023_calendarevent_active_status_email_sent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleCalendarChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change_type', models.CharField(choices=[(b'U', b'Update event'), (b'D', b'Delete event'), (b'A', b'Add attendee'), (b'R', b'Remove attendee')], max_length=1)),
+                ('calendar_id', models.CharField(blank=True, max_length=100)),
+                ('google_event_id', models.CharField(blank=True, max_length=64)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('display_name', models.CharField(blank=True, max_length=128)),
+                ('time_added', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='event_cal.EventShift')),
+            ],
+        ),
+    ]
@@ -1,24 +1,38 @@
 from datetime import date, datetime, timedelta
 from markdown import markdown
 import json
-import time
+from uuid import uuid4
 
 from django.core.cache import cache
 from django.core.mail import EmailMessage, send_mail
 from django.core.urlresolvers import reverse
-from django.db import models
-from django.db.models import Max, Min, Q
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.encoding import force_unicode
+from django.utils.functional import cached_property
 from stdimage import StdImageField
 import tweepy
 from gcal.apiclient.errors import HttpError
 
-from event_cal.gcal_functions import get_credentials, get_authorized_http
-from event_cal.gcal_functions import get_service
+from event_cal.gcal_functions import execute_batched, get_service
+from event_cal.intervals import (
+                get_duration,
+                get_hours,
+                merge_intervals,
+                overlaps_any,
+)
 from mig_main.models import AcademicTerm, OfficerPosition, MemberProfile
 from mig_main.models import UserProfile
-from requirements.models import Requirement
+from requirements.models import (
+                EventCategory,
+                ProgressItem,
+                ProgressRollup,
+                Requirement,
+                invalidate_progress_rows,
+)
 from migweb.settings import DEBUG, twitter_token, twitter_secret
 
 COE_EVENT_EMAIL_BODY = r'''%(salutation)s,
@@ -77,6 +91,92 @@ not checked.
 '''
 
 
+# Google calendar changes are sent GCAL_SYNC_CHUNK_SIZE at a time. Failures
+# with a transient status are retried after an exponentially growing delay
+# (in seconds) up to GCAL_SYNC_MAX_ATTEMPTS times, other failures are not.
+GCAL_SYNC_CHUNK_SIZE = 500
+GCAL_SYNC_MAX_ATTEMPTS = 8
+GCAL_SYNC_RETRY_DELAY = 30
+GCAL_SYNC_RETRY_STATUSES = [403, 409, 429, 500, 503]
+# Events in these categories (or their children) earn one credit regardless
+# of how long the attendee was there.
+FIXED_PROGRESS_CATEGORIES = ['Meeting Attendance', 'Social Credits']
+# Meeting sign-in looks up the shift, event and sign-in sheet from the cache
+# so that a burst of sign-ins at the start of a meeting skips those queries.
+MEETING_SIGN_IN_CACHE_PREFIX = 'MEETING_SIGN_IN_'
+MEETING_SIGN_IN_TIMEOUT = 60*60
+# The event popup html is cached in a variant for each kind of viewer. The
+# variants' keys include a version for the event that is replaced whenever
+# something they show changes, which discards all of them at once.
+EVENT_AJAX_CACHE_PREFIX = 'EVENT_AJAX_'
+EVENT_AJAX_TIMEOUT = 60*60*2
+# The upcoming events feed is rebuilt when it expires (the next time an event
+# starts or ends) or when an event in it changes. Only one process rebuilds an
+# expired feed, the others keep serving it for up to UPCOMING_EVENTS_LOCK
+# seconds meanwhile.
+UPCOMING_EVENTS_CACHE_KEY = 'UPCOMING_EVENTS_FEED'
+UPCOMING_EVENTS_LOCK = 30
+# Events with more shifts than this only list their shifts on their page.
+UPCOMING_EVENTS_MAX_SHIFTS = 5
+
+
+def get_event_ajax_version(event_id):
+    """ Returns the current version of the event's cached popup html.
+    """
+    version = cache.get(EVENT_AJAX_CACHE_PREFIX+'VERSION'+unicode(event_id))
+    if version is None:
+        version = clear_event_ajax_cache(event_id)
+    return version
+
+
+def clear_event_ajax_cache(event_id):
+    """ Discards every cached variant of the event's popup html by giving it
+    a new version, and returns that version.
+    """
+    version = uuid4().hex
+    cache.set(
+            EVENT_AJAX_CACHE_PREFIX+'VERSION'+unicode(event_id),
+            version,
+            None
+    )
+    return version
+
+
+def count_event_ajax_lookup(hit):
+    """ Counts a hit or a miss of the event popup cache.
+    """
+    key = EVENT_AJAX_CACHE_PREFIX+('HITS' if hit else 'MISSES')
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted in between, the count starts over.
+        pass
+
+
+def get_event_ajax_stats():
+    """ Returns the event popup cache's hit and miss counts (since the cache
+    was last cleared).
+    """
+    counts = cache.get_many([
+                    EVENT_AJAX_CACHE_PREFIX+'HITS',
+                    EVENT_AJAX_CACHE_PREFIX+'MISSES'
+    ])
+    return {
+        'hits': counts.get(EVENT_AJAX_CACHE_PREFIX+'HITS', 0),
+        'misses': counts.get(EVENT_AJAX_CACHE_PREFIX+'MISSES', 0),
+    }
+
+
+def get_http_status(error):
+    """ Returns the http status of a google API error, or None if the
+    request never got a response.
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status
+    return None
+
+
 # Create your models here.
 def default_term():
     """ Returns the current term.
@@ -264,7 +364,7 @@ class CalendarEvent(models.Model):
         return an_evts.order_by('earliest_shift')
 
     @classmethod
-    def get_upcoming_events(cls, reset=False):
+    def get_upcoming_events(cls):
         """ Returns a queryset of upcoming events.
 
         Returns all events that are upcoming or are happening now and have
@@ -275,13 +375,9 @@ class CalendarEvent(models.Model):
         events will be incorrectly (albeit intentionally) skipped if they have
         announcement start dates set for after the event commences.
 
-        If reset is False, it pulls the upcoming events from the cache
-        (provided they exist in the cache). Otherwise it assembles them from
-        the database and stores them in the cache prior to returning.
+        This always queries the database, pages shown to everyone should use
+        get_upcoming_feed instead.
         """
-        upcoming_events = cache.get('upcoming_events', None)
-        if upcoming_events and not reset:
-            return upcoming_events
         now = timezone.localtime(timezone.now())
         today = date.today()
         non_meeting_query = (
@@ -296,24 +392,188 @@ class CalendarEvent(models.Model):
         an_evts = event_pool.distinct().annotate(
                     earliest_shift=Min('eventshift__start_time')
         )
-        upcoming_events = an_evts.order_by('earliest_shift')
-        cache.set('upcoming_events', upcoming_events)
-        return upcoming_events
+        return an_evts.order_by('earliest_shift')
+
+    @classmethod
+    def get_upcoming_feed(cls):
+        """ Returns the upcoming events and the meetings going on now, as
+        built by build_upcoming_feed, from the cache where possible.
+        """
+        feed = cache.get(UPCOMING_EVENTS_CACHE_KEY, None)
+        if feed is not None:
+            if feed['expires'] > timezone.now():
+                return feed
+            lock_key = UPCOMING_EVENTS_CACHE_KEY + '_LOCK'
+            if not cache.add(lock_key, True, UPCOMING_EVENTS_LOCK):
+                # Another request is rebuilding it.
+                return feed
+        return cls.reset_upcoming_feed()
+
+    @classmethod
+    def reset_upcoming_feed(cls):
+        """ Rebuilds the upcoming events feed, stores it in the cache and
+        returns it.
+        """
+        feed = cls.build_upcoming_feed()
+        cache.set(UPCOMING_EVENTS_CACHE_KEY, feed, None)
+        cache.delete(UPCOMING_EVENTS_CACHE_KEY + '_LOCK')
+        return feed
+
+    @classmethod
+    def clear_upcoming_feed(cls, event_id=None):
+        """ Discards the cached upcoming events feed, or, if an event is
+        given, only does so if the event is in the feed.
+        """
+        if event_id is not None:
+            feed = cache.get(UPCOMING_EVENTS_CACHE_KEY, None)
+            if feed is None or event_id not in feed['event_ids']:
+                return
+        cache.delete(UPCOMING_EVENTS_CACHE_KEY)
+
+    @classmethod
+    def build_upcoming_feed(cls):
+        """ Returns the upcoming events and the meetings going on now as
+        plain rows, along with when they next change.
+
+        The feed is a dictionary with:
+            events: the upcoming events in order, each a dictionary of its
+                id, name, announce_text, earliest_start, event_type,
+                is_current_meeting, num_shifts and, unless it has more than
+                UPCOMING_EVENTS_MAX_SHIFTS shifts, its shifts.
+            current_meetings: the same for the meetings going on now, with
+                their shifts and agenda_url.
+            event_ids: the ids of every event in the feed.
+            expires: when an event next starts or ends (or is announced), at
+                which point the feed must be rebuilt.
+            version: a unique identifier for this build of the feed.
+        """
+        now = timezone.now()
+        events = list(cls.get_upcoming_events().select_related('event_type'))
+        meetings = list(cls.objects.filter(
+                            cls.get_current_meeting_query()
+        ).distinct().select_related('event_type', 'agenda').order_by(
+                                                            'earliest_start'))
+        meeting_ids = set([meeting.id for meeting in meetings])
+        event_ids = set([event.id for event in events]) | meeting_ids
+        shifts = {}
+        shift_rows = EventShift.objects.filter(
+                            event__in=event_ids
+        ).annotate(num_attendees=Count('attendees')).order_by(
+                                        'start_time'
+        ).values(
+                'id',
+                'event_id',
+                'start_time',
+                'end_time',
+                'location',
+                'max_attendance',
+                'num_attendees'
+        )
+        for shift in shift_rows:
+            shifts.setdefault(shift['event_id'], []).append(shift)
+
+        def get_row(event):
+            event_shifts = shifts.get(event.id, [])
+            row = {
+                'id': event.id,
+                'name': event.name,
+                'announce_text': event.announce_text,
+                'earliest_start': getattr(event, 'earliest_shift',
+                                          event.earliest_start),
+                'event_type': event.event_type.name,
+                'is_current_meeting': event.id in meeting_ids,
+                'num_shifts': len(event_shifts),
+            }
+            if (len(event_shifts) <= UPCOMING_EVENTS_MAX_SHIFTS or
+                    event.id in meeting_ids):
+                row['shifts'] = event_shifts
+            return row
+        current_meetings = []
+        for meeting in meetings:
+            row = get_row(meeting)
+            row['agenda_url'] = (meeting.agenda.pdf_file.url
+                                 if meeting.agenda else None)
+            current_meetings.append(row)
+
+        # Upcoming events drop off (or lose a shift) as their shifts start,
+        # meetings come and go with the grace periods around their shifts and
+        # events are announced at midnight.
+        local_now = timezone.localtime(now)
+        changes = [timezone.make_aware(
+                    datetime.combine(local_now.date() + timedelta(days=1),
+                                     datetime.min.time()),
+                    timezone.get_current_timezone()
+        )]
+        for event_id in event_ids:
+            changes.extend([shift['start_time']
+                            for shift in shifts.get(event_id, [])])
+        next_meeting = EventShift.objects.filter(
+                            event__use_sign_in=True,
+                            start_time__gt=now - cls.before_grace
+        ).aggregate(start=Min('start_time'))['start']
+        if next_meeting:
+            changes.append(next_meeting + cls.before_grace)
+        meeting_end = EventShift.objects.filter(
+                            event__use_sign_in=True,
+                            end_time__gte=now - cls.after_grace
+        ).aggregate(end=Min('end_time'))['end']
+        if meeting_end:
+            changes.append(meeting_end + cls.after_grace)
+        return {
+            'events': [get_row(event) for event in events],
+            'current_meetings': current_meetings,
+            'event_ids': event_ids,
+            'expires': min([change for change in changes if change > now]),
+            'version': uuid4().hex,
+        }
 
     # Instance Methods, built-ins
     def save(self, *args, **kwargs):
-        """ Saves the event. Also clears the cache entry for its ajax."""
+        """ Saves the event. Also clears the cache entry for its ajax and
+        the meeting sign-in entries for its shifts.
+        """
         if self.eventshift_set.exists():
             shifts = self.eventshift_set.all()
             self.earliest_start = shifts.order_by('start_time')[0].start_time
             self.latest_end = shifts.order_by('-end_time')[0].end_time
         super(CalendarEvent, self).save(*args, **kwargs)
-        cache.delete('EVENT_AJAX'+unicode(self.id))
+        clear_event_ajax_cache(self.id)
+        CalendarEvent.clear_upcoming_feed()
+        self.clear_sign_in_cache()
 
     def delete(self, *args, **kwargs):
         """ Deletes the event. Also clears the cache entry for its ajax."""
-        cache.delete('EVENT_AJAX'+unicode(self.id))
+        clear_event_ajax_cache(self.id)
+        self.clear_sign_in_cache()
         super(CalendarEvent, self).delete(*args, **kwargs)
+        CalendarEvent.clear_upcoming_feed()
+
+    def get_ajax_timeout(self, shifts):
+        """ Returns how long (in seconds) the event's popup html can be
+        cached: until the next time one of the shifts opens or closes for
+        sign-up or sign-in, and at most EVENT_AJAX_TIMEOUT.
+        """
+        now = timezone.now()
+        changes = []
+        for shift in shifts:
+            changes.extend([
+                shift.start_time,
+                shift.start_time + self.before_grace,
+                shift.end_time + self.after_grace,
+            ])
+        timeout = EVENT_AJAX_TIMEOUT
+        for change in changes:
+            if change > now:
+                timeout = min(timeout, (change - now).total_seconds())
+        return max(int(timeout), 1)
+
+    def clear_sign_in_cache(self):
+        """ Clears the cached meeting sign-in entries for the event's shifts.
+        """
+        cache.delete_many([
+            MEETING_SIGN_IN_CACHE_PREFIX + unicode(shift_id)
+            for shift_id in self.eventshift_set.values_list('id', flat=True)
+        ])
 
     def __unicode__(self):
         """ Returns a string representation of the event.
@@ -338,12 +598,16 @@ class CalendarEvent(models.Model):
                         distinction_type__standing_type__name=standing,
                         term=self.term.semester_type
         )
-        ev_category = self.event_type
-        while(not requirements.filter(event_category=ev_category).exists() and
-              ev_category.parent_category is not None
-              ):
-            ev_category = ev_category.parent_category
-        return ev_category
+        required_ids = set(requirements.values_list(
+                                            'event_category_id',
+                                            flat=True
+        ))
+        categories = EventCategory.get_categories_with_ancestors()
+        chain = categories.get(self.event_type_id, [self.event_type])
+        for ev_category in chain:
+            if ev_category.id in required_ids:
+                return ev_category
+        return chain[-1]
 
     def get_relevant_active_event_type(self):
         """ Returns the event type that matters for an active member.
@@ -381,14 +645,14 @@ class CalendarEvent(models.Model):
 
         This allows for easy determination of parent/child event categories.
         """
-        is_event_type = self.event_type.name == type_name
-        event_category = self.event_type
-        while (not is_event_type and
-               event_category.parent_category is not None
-               ):
-            event_category = event_category.parent_category
-            is_event_type = is_event_type or event_category.name == type_name
-        return is_event_type
+        categories = EventCategory.get_categories_with_ancestors()
+        return any(
+            event_category.name == type_name
+            for event_category in categories.get(
+                                        self.event_type_id,
+                                        [self.event_type]
+            )
+        )
 
     def is_meeting(self):
         """ Returns True if the event is a meeting.
@@ -406,10 +670,9 @@ class CalendarEvent(models.Model):
         not depend on the amount of time spent at the event. These include
         socials and meetings, for instance.
         """
-        if self.is_meeting():
-            return True
-        if self.is_event_type('Social Credits'):
-            return True
+        for category_name in FIXED_PROGRESS_CATEGORIES:
+            if self.is_event_type(category_name):
+                return True
         return False
 
     def get_locations(self):
@@ -445,7 +708,16 @@ class CalendarEvent(models.Model):
 
         Analyzes the ProgressItems and gets a distinct list of attendees.
         """
-        return list(set([pr.member for pr in self.progressitem_set.all()]))
+        return list(MemberProfile.objects.filter(
+                                progressitem__related_event=self
+        ).distinct())
+
+    @cached_property
+    def attendees_with_progress(self):
+        """ The set of those who have received progress for the event, loaded
+        once per instance for templates that check many shifts against it.
+        """
+        return set(self.get_attendees_with_progress())
 
     def get_max_duration(self):
         """ Returns the maximum possible event duration.
@@ -453,23 +725,9 @@ class CalendarEvent(models.Model):
         Calculates the maximum time that could be spent at the event by
         accounting for overlapping shifts or gaps in shifts.
         """
-        shifts = self.eventshift_set.all().order_by('start_time')
-        duration = shifts[0].end_time-shifts[0].start_time
-        if shifts.count() == 1:
-            return duration
-        previous_shift = shifts[0]
-        end_time = previous_shift.end_time
-        start_time = previous_shift.start_time
-        duration = timedelta(hours=0)
-        for shift in shifts[1:]:
-            if shift.start_time < end_time:
-                end_time = max(shift.end_time, end_time)
-            else:
-                duration += end_time-start_time
-                end_time = shift.end_time
-                start_time = shift.start_time
-        duration += end_time-start_time
-        return duration
+        return get_duration(
+                self.eventshift_set.values_list('start_time', 'end_time')
+        )
 
     def get_event_attendees(self):
         """ Return a queryset of all the UserProfiles listed as attendees.
@@ -496,6 +754,13 @@ class CalendarEvent(models.Model):
         ).distinct()
         return u
 
+    @cached_property
+    def users_who_can_bring_items(self):
+        """ The set of those who can bring the event's preferred items, loaded
+        once per instance for templates that check many attendees against it.
+        """
+        return set(self.get_users_who_can_bring_items())
+
     def get_users_who_cannot_bring_items(self):
         """ If the event has preferred items, returns queryset of those who
         cannot bring them.
@@ -513,30 +778,184 @@ class CalendarEvent(models.Model):
         ).distinct()
         return u
 
+    @cached_property
+    def users_who_cannot_bring_items(self):
+        """ The set of those who cannot bring the event's preferred items,
+        loaded once per instance for templates that check many attendees
+        against it.
+        """
+        return set(self.get_users_who_cannot_bring_items())
+
     def get_attendee_hours_at_event(self, profile):
         """ Returns the number of hours the attendee was at the event.
 
         Determines how many hours the attendee spent at the event by summing
         the time of all shifts accounting for shifts that are overlapped.
         """
-        shifts = self.eventshift_set.filter(attendees=profile)
-        n = shifts.count()
-        count = 0
-        hours = 0
-        if not shifts.exists():
+        shifts = list(self.eventshift_set.filter(
+                                attendees=profile
+                    ).values_list('start_time', 'end_time'))
+        if not shifts:
             return 0
         if self.is_fixed_progress():
             return 1
-        shifts = shifts.order_by('start_time')  # No sense sorting until needed
-        while count < n:
-            start_time = shifts[count].start_time
-            end_time = shifts[count].end_time
-            while count < (n-1) and shifts[count+1].start_time < end_time:
-                count += 1
-                end_time = shifts[count].end_time
-            hours += (end_time-start_time).seconds/3600.0
-            count += 1
-        return hours
+        return get_hours(shifts)
+
+    @classmethod
+    def get_attendance_by_attendee(cls, events, attendees=None):
+        """ Returns the time each attendee will spend at each of the events.
+
+        The result maps (attendee uniqname, event id) to a dictionary with
+        the attendee's 'hours' at the event (1 for fixed progress events) and
+        the 'end_time' of their last shift. Overlapping shifts are only
+        counted once. Every shift is fetched in a single query, so this
+        should be preferred to get_attendee_hours_at_event when looking at
+        many members or events. If attendees is given, only those profiles
+        are included.
+        """
+        categories = EventCategory.get_categories_with_ancestors()
+        fixed_category_ids = set(
+            category_id for category_id, chain in categories.items()
+            if any(category.name in FIXED_PROGRESS_CATEGORIES
+                   for category in chain)
+        )
+        shift_attendance = EventShift.attendees.through.objects.filter(
+                                    eventshift__event__in=events
+        )
+        if attendees is not None:
+            shift_attendance = shift_attendance.filter(
+                                    userprofile__in=attendees
+            )
+        intervals = {}
+        fixed_event_ids = set()
+        for uniqname, event_id, event_type_id, start, end in (
+                shift_attendance.values_list(
+                    'userprofile_id',
+                    'eventshift__event_id',
+                    'eventshift__event__event_type_id',
+                    'eventshift__start_time',
+                    'eventshift__end_time'
+                )):
+            intervals.setdefault((uniqname, event_id), []).append(
+                                                            (start, end)
+            )
+            if event_type_id in fixed_category_ids:
+                fixed_event_ids.add(event_id)
+        attendance = {}
+        for key, attendee_intervals in intervals.items():
+            merged = merge_intervals(attendee_intervals)
+            attendance[key] = {
+                'hours': (1 if key[1] in fixed_event_ids
+                          else get_hours(merged)),
+                'end_time': merged[-1][1],
+            }
+        return attendance
+
+    def record_progress(self, progress_items, dry_run=False):
+        """ Records progress for the event from unsaved ProgressItems in bulk.
+
+        Items for those who are not members are skipped, as are items for
+        members who already have progress for the event or who are listed
+        more than once (only the first listing counts). Members who were not
+        signed up for any of the event's shifts are added to the first one.
+        Everything is written in one transaction, and the progress totals and
+        cached progress rows are updated once for the whole batch.
+
+        Returns a dictionary of the 'created' progress items, the members
+        whose progress was a 'duplicate' and the 'added_attendees'. With
+        dry_run set nothing is saved, but the same summary is returned.
+        """
+        member_ids = set(MemberProfile.objects.filter(
+                            uniqname__in=[
+                                item.member_id for item in progress_items
+                            ]
+                    ).values_list('uniqname', flat=True))
+        attendee_ids = set(EventShift.attendees.through.objects.filter(
+                                eventshift__event=self
+                        ).values_list('userprofile_id', flat=True))
+        with_progress = set(ProgressItem.objects.filter(
+                                related_event=self
+                        ).values_list('member_id', flat=True))
+        term = AcademicTerm.get_current_term()
+        is_fixed = self.is_fixed_progress()
+        created = []
+        duplicates = []
+        added_attendees = []
+        for item in progress_items:
+            if item.member_id not in member_ids:
+                continue
+            if item.member_id not in attendee_ids:
+                attendee_ids.add(item.member_id)
+                added_attendees.append(item.member)
+            if item.member_id in with_progress:
+                if item.member not in duplicates:
+                    duplicates.append(item.member)
+                continue
+            with_progress.add(item.member_id)
+            item.term = term
+            item.event_type_id = self.event_type_id
+            item.date_completed = date.today()
+            item.related_event = self
+            item.name = self.name
+            if is_fixed:
+                item.amount_completed = 1
+            created.append(item)
+        summary = {
+            'created': created,
+            'duplicates': duplicates,
+            'added_attendees': added_attendees,
+        }
+        if dry_run:
+            return summary
+        with transaction.atomic():
+            if added_attendees:
+                first_shift = self.eventshift_set.all()[0]
+                EventShift.attendees.through.objects.bulk_create([
+                    EventShift.attendees.through(
+                            eventshift_id=first_shift.id,
+                            userprofile_id=attendee.pk
+                    )
+                    for attendee in added_attendees
+                ])
+            ProgressItem.objects.bulk_create(created)
+            ProgressRollup.add_progress_items(created)
+        # Bulk creation skips the signals that otherwise clear these.
+        clear_event_ajax_cache(self.id)
+        CalendarEvent.clear_upcoming_feed(self.id)
+        invalidate_progress_rows(set(item.member_id for item in created))
+        return summary
+
+    def remove_attendees(self, attendee_shifts):
+        """ Removes the given EventShift-attendee links (a queryset of the
+        attendees through model) in bulk.
+        """
+        uniqnames = set(attendee_shifts.values_list(
+                                            'userprofile_id',
+                                            flat=True
+        ))
+        if not uniqnames:
+            return
+        attendee_shifts.delete()
+        clear_event_ajax_cache(self.id)
+        CalendarEvent.clear_upcoming_feed(self.id)
+        invalidate_progress_rows(uniqnames)
+
+    def remove_unconfirmed_attendees(self):
+        """ Clears the event's waitlists and removes the members who did not
+        receive progress for the event from its shifts.
+
+        Those who are not members are left signed up, as they cannot receive
+        progress.
+        """
+        WaitlistSlot.objects.filter(shift__event=self).delete()
+        self.remove_attendees(EventShift.attendees.through.objects.filter(
+                eventshift__event=self,
+                userprofile__memberprofile__isnull=False
+        ).exclude(
+                userprofile__in=ProgressItem.objects.filter(
+                                    related_event=self
+                                ).values('member_id')
+        ))
 
     def tweet_event(self, include_hashtag=False):
         """ Sends a tweet about the event from the chapter twitter account.
@@ -850,116 +1269,53 @@ not checked.
         email.send()
 
     def delete_gcal_event(self):
-        """ Deletes the event from the associated google calendar.
+        """ Queues the removal of the event from the associated google
+        calendar.
 
-        Events on the google calendars are actually event shifts, this goes
-        through and deletes all of the google calendar events associated with
-        this event's shifts.
+        Events on the google calendars are actually event shifts, this queues
+        the deletion of all of the google calendar events associated with
+        this event's shifts. The sync_google_calendar command sends them.
 
         If the website is in debug-mode, does nothing.
         """
         if DEBUG:
             return
-        c = get_credentials()
-        h = get_authorized_http(c)
-        if h:
-            service = get_service(h)
-            for shift in self.eventshift_set.all():
-                if shift.google_event_id:
-                    try:
-                        service.events().delete(
-                                    calendarId=self.google_cal.calendar_id,
-                                    eventId=shift.google_event_id
-                        ).execute()
-                    except:
-                        pass
+        calendar_id = self.google_cal.calendar_id
+        GoogleCalendarChange.objects.bulk_create([
+            GoogleCalendarChange(
+                    change_type='D',
+                    calendar_id=calendar_id,
+                    google_event_id=google_event_id
+            )
+            for google_event_id in self.eventshift_set.exclude(
+                                google_event_id='').values_list(
+                                'google_event_id', flat=True)
+        ])
 
     def add_event_to_gcal(self, previous_cal=None):
-        """ Adds the event to the associated google calendar.
+        """ Queues adding the event to the associated google calendar.
 
-        Events on the google calendars are actually event shifts, this goes
-        through and adds all of the google calendar events associated with
-        this event's shifts. If the event previously was associated with
-        google calendar events, it attempts to move them to the new calendar
-        (if it changed) or to update them. Otherwise (or that failing) it
-        creates new events.
+        Events on the google calendars are actually event shifts, this queues
+        an update of the google calendar event of each of this event's shifts.
+        The sync_google_calendar command sends them, moving events to the new
+        calendar (if it changed) and updating them, or creating them if they
+        do not exist yet.
 
         If the website is in debug-mode, does nothing.
         """
         if DEBUG:
             return
-        c = get_credentials()
-        h = get_authorized_http(c)
-        current_error_wait = .1
-        if h:
-            service = get_service(h)
-            gcal = self.google_cal
-            for shift in self.eventshift_set.all():
-                new_event = True
-                successfully_added = False
-                if shift.google_event_id:
-                    try:
-                        if previous_cal and not (previous_cal == gcal):
-                            service.events().move(
-                                    calendarId=previous_cal.calendar_id,
-                                    eventId=shift.google_event_id,
-                                    destination=gcal.calendar_id
-                            ).execute()
-                        gcal_event = service.events().get(
-                                    calendarId=gcal.calendar_id,
-                                    eventId=shift.google_event_id
-                        ).execute()
-                        if gcal_event['status'] == 'cancelled':
-                            gcal_event = {}
-                            new_event = True
-                        else:
-                            gcal_event['sequence'] = gcal_event['sequence']+1
-                            new_event = False
-                    except:
-                        gcal_event = {}
-                else:
-                    gcal_event = {}
-                gcal_event['summary'] = self.name
-                gcal_event['location'] = shift.location
-                gcal_event['start'] = {
-                                'dateTime': shift.start_time.isoformat('T'),
-                                'timeZone': 'America/Detroit'
-                }
-                gcal_event['end'] = {
-                                'dateTime': shift.end_time.isoformat('T'),
-                                'timeZone': 'America/Detroit'
-                }
-                gcal_event['recurrence'] = []
-                gcal_event['description'] = markdown(
-                                            force_unicode(self.description),
-                                            ['nl2br'],
-                                            safe_mode=True,
-                                            enable_attributes=False
-                )
-                while not successfully_added:
-                    try:
-                        if not new_event:
-                            service.events().update(
-                                            calendarId=gcal.calendar_id,
-                                            eventId=shift.google_event_id,
-                                            body=gcal_event
-                            ).execute()
-                        else:
-                            submitted_event = service.events().insert(
-                                            calendarId=gcal.calendar_id,
-                                            body=gcal_event
-                            ).execute()
-                            shift.google_event_id = submitted_event['id']
-                            shift.save()
-                        successfully_added = True
-                    except HttpError, err:
-                        if err.resp.status in [403, 500, 503]:
-                            time.sleep(current_error_wait)
-                            current_error_wait = current_error_wait * 2
-                            if 'sequence' in gcal_event:
-                                gcal_event['sequence']=gcal_event['sequence']+1
-                        else:
-                            raise
+        previous_calendar_id = ''
+        if previous_cal and not (previous_cal == self.google_cal):
+            previous_calendar_id = previous_cal.calendar_id
+        GoogleCalendarChange.objects.bulk_create([
+            GoogleCalendarChange(
+                    change_type='U',
+                    shift=shift,
+                    calendar_id=previous_calendar_id
+            )
+            for shift in self.eventshift_set.all()
+        ])
 
     def can_complete_event(self):
         """ Returns True if the event is able to be marked 'complete'.
@@ -985,14 +1341,10 @@ not checked.
         prevent users from signing up for shifts that overlap if this behavior
         is not intended.
         """
-        attendee_shifts = self.eventshift_set.filter(attendees__in=[profile])
-        overlapping_q1 = Q(start_time__lt=shift.start_time,
-                           end_time__lte=shift.end_time)
-        overlapping_q2 = Q(start_time__gte=shift.end_time,
-                           end_time__gt=shift.end_time)
-        query = overlapping_q1 | overlapping_q2
-        overlapping_shifts = attendee_shifts.distinct().exclude(query)
-        return overlapping_shifts.exists()
+        attendee_shifts = self.eventshift_set.filter(
+                                    attendees=profile
+        ).exclude(id=shift.id).values_list('start_time', 'end_time')
+        return overlaps_any((shift.start_time, shift.end_time), attendee_shifts)
 
     def get_fullness(self):
         """Gives a trinary evaluation of the fullness of the event.
@@ -1065,7 +1417,8 @@ class EventShift(models.Model):
         Also deletes the event's ajax entry from the cache to force a refresh.
         """
         super(EventShift, self).save(*args, **kwargs)
-        cache.delete('EVENT_AJAX'+unicode(self.event.id))
+        clear_event_ajax_cache(self.event_id)
+        cache.delete(MEETING_SIGN_IN_CACHE_PREFIX+unicode(self.id))
         self.event.save()
 
     def delete(self, *args, **kwargs):
@@ -1073,8 +1426,29 @@ class EventShift(models.Model):
 
         Also deletes the event's ajax entry from the cache to force a refresh.
         """
-        cache.delete('EVENT_AJAX'+unicode(self.event.id))
+        cache.delete(MEETING_SIGN_IN_CACHE_PREFIX+unicode(self.id))
         super(EventShift, self).delete(*args, **kwargs)
+        clear_event_ajax_cache(self.event_id)
+        CalendarEvent.clear_upcoming_feed()
+
+    @classmethod
+    def create_for_event(cls, event, shifts):
+        """ Creates the event's new shifts in bulk and returns them with their
+        ids set.
+
+        Saving each shift would re-save the event to update its first start
+        and last end, so instead the event is saved once afterwards. The new
+        shifts are assumed to be the event's most recently created ones.
+        """
+        cls.objects.bulk_create(shifts)
+        if shifts and shifts[0].id is None:
+            shift_ids = list(event.eventshift_set.order_by(
+                                                '-id'
+            ).values_list('id', flat=True)[:len(shifts)])
+            for shift, shift_id in zip(shifts, reversed(shift_ids)):
+                shift.id = shift_id
+        event.save()
+        return shifts
 
     def is_full(self):
         """ Returns True if the shift cannot accept more attendees."""
@@ -1138,110 +1512,218 @@ class EventShift(models.Model):
             return None
         return res_string.lstrip()+'s'
 
+    def get_gcal_fields(self):
+        """ Returns the fields of the shift's google calendar event that the
+        website manages.
+        """
+        event = self.event
+        return {
+            'summary': event.name,
+            'location': self.location,
+            'start': {
+                'dateTime': self.start_time.isoformat('T'),
+                'timeZone': 'America/Detroit'
+            },
+            'end': {
+                'dateTime': self.end_time.isoformat('T'),
+                'timeZone': 'America/Detroit'
+            },
+            'recurrence': [],
+            'description': markdown(
+                                force_unicode(event.description),
+                                ['nl2br'],
+                                safe_mode=True,
+                                enable_attributes=False
+            ),
+        }
+
     def delete_gcal_event_shift(self):
-        """ Deletes the google calendar event associated with the shift.
+        """ Queues the deletion of the google calendar event associated with
+        the shift.
 
         If in debug mode, does nothing.
         """
-        if DEBUG:
+        if DEBUG or not self.google_event_id:
             return
-        c = get_credentials()
-        h = get_authorized_http(c)
-        if h:
-            event = self.event
-            service = get_service(h)
-            if self.google_event_id:
-                try:
-                    service.events().delete(
-                        calendarId=event.google_cal.calendar_id,
-                        eventId=self.google_event_id
-                    ).execute()
-                except:
-                    pass
+        GoogleCalendarChange.objects.create(
+                change_type='D',
+                calendar_id=self.event.google_cal.calendar_id,
+                google_event_id=self.google_event_id
+        )
 
     def add_attendee_to_gcal(self, name, email):
-        """ Adds the attendee defined by the name and email to the google
-        calendar event.
+        """ Queues adding the attendee defined by the name and email to the
+        google calendar event.
 
         If in debug mode, does nothing.
         """
         if DEBUG:
             return
-        c = get_credentials()
-        h = get_authorized_http(c)
-        if h:
-            service = get_service(h)
-            event = self.event
-            if not self.google_event_id:
-                return
-            gcal_event = service.events().get(
-                            calendarId=event.google_cal.calendar_id,
-                            eventId=self.google_event_id
-            ).execute()
-            if gcal_event['status'] == 'cancelled':
-                return
-            else:
-                gcal_event['sequence'] += 1
-                if 'attendees' in gcal_event:
-                    gcal_event['attendees'].append(
-                        {
-                            'email': email,
-                            'displayName': name,
-                        })
-                else:
-                    gcal_event['attendees'] = [{
-                            'email': email,
-                            'displayName': name,
-                        }]
-                service.events().update(
-                        calendarId=event.google_cal.calendar_id,
-                        eventId=self.google_event_id,
-                        body=gcal_event
-                ).execute()
+        GoogleCalendarChange.objects.create(
+                change_type='A',
+                shift=self,
+                email=email,
+                display_name=name
+        )
 
     def delete_gcal_attendee(self, email):
-        """ Removes the attendee, defined by the given email, from the
+        """ Queues removing the attendee, defined by the given email, from the
         associated google calendar event.
 
         If in debug mode, does nothing.
         """
         if DEBUG:
             return
-        c = get_credentials()
-        h = get_authorized_http(c)
-        if h:
-            service = get_service(h)
-            event = self.event
-            if not self.google_event_id:
-                return
-            try:
-                gcal_event = service.events().get(
-                                calendarId=event.google_cal.calendar_id,
-                                eventId=self.google_event_id
-                ).execute()
-                if gcal_event['status'] == 'cancelled':
-                    return
-                else:
-                    gcal_event['sequence'] += 1
-                    if 'attendees' in gcal_event:
-                        gcal_event['attendees'][:] = [
-                                a for a
-                                in gcal_event['attendees']
-                                if a.get('email') != email
-                        ]
-                        service.events().update(
-                                calendarId=event.google_cal.calendar_id,
-                                eventId=self.google_event_id,
-                                body=gcal_event
-                        ).execute()
-            except:
-                return
+        GoogleCalendarChange.objects.create(
+                change_type='R',
+                shift=self,
+                email=email
+        )
+
+    @classmethod
+    def get_sign_in(cls, shift_id):
+        """ Returns the shift (with its event), the event's sign-in sheet (or
+        None) and the progress earned for signing in, for meeting sign-in.
+
+        The result is cached per shift, and cleared when the shift, its event
+        or the sign-in sheet changes. Raises EventShift.DoesNotExist if there
+        is no such shift.
+        """
+        cache_key = MEETING_SIGN_IN_CACHE_PREFIX + unicode(shift_id)
+        sign_in = cache.get(cache_key)
+        if sign_in is None:
+            shift = cls.objects.select_related('event').get(id=shift_id)
+            sheets = MeetingSignIn.objects.filter(event_id=shift.event_id)
+            if shift.event.is_fixed_progress():
+                hours = 1
+            else:
+                hours = get_hours([(shift.start_time, shift.end_time)])
+            sign_in = {
+                'shift': shift,
+                'sheet': sheets[0] if sheets else None,
+                'hours': hours,
+            }
+            cache.set(cache_key, sign_in, MEETING_SIGN_IN_TIMEOUT)
+        return sign_in
+
+    def sign_in(self, profile, hours, sheet=None, question_response='',
+                free_response=''):
+        """ Signs the profile in to the shift. Returns True if the profile is
+        a member who was given progress for the event, False otherwise, and
+        None (without signing them in) if the shift is full.
+
+        Members who already have progress for the event are only added to the
+        shift. Otherwise their sign-in responses and progress are recorded
+        along with their attendance, all in one transaction that holds the
+        shift's lock so a repeated submission cannot record progress twice
+        and concurrent sign-ins cannot overfill the shift. Attendees are only
+        counted if the shift has a limit.
+        """
+        recorded = False
+        with transaction.atomic():
+            self.lock_attendance()
+            if self.get_open_spots() == 0:
+                return None
+            if profile.is_member() and not ProgressItem.objects.filter(
+                                                related_event_id=self.event_id,
+                                                member_id=profile.uniqname
+                                            ).exists():
+                if sheet:
+                    MeetingSignInUserData.objects.create(
+                                meeting_data=sheet,
+                                question_response=question_response,
+                                free_response=free_response
+                    )
+                ProgressItem(
+                        member_id=profile.uniqname,
+                        term=AcademicTerm.get_current_term(),
+                        amount_completed=hours,
+                        event_type_id=self.event.event_type_id,
+                        related_event_id=self.event_id,
+                        date_completed=date.today(),
+                        name=self.event.name
+                ).save()
+                recorded = True
+            self.attendees.add(profile)
+        return recorded
+
+    def lock_attendance(self):
+        """ Locks the shift's row until the end of the current transaction,
+        so that only one sign-up or waitlist change for the shift runs at a
+        time.
+
+        This is a no-op update rather than select_for_update since SQLite
+        ignores FOR UPDATE but does serialize writers.
+        """
+        EventShift.objects.filter(id=self.id).update(
+                                    max_attendance=F('max_attendance')
+        )
+
+    def get_open_spots(self):
+        """ Returns the number of attendees the shift can still take, or None
+        if it is unlimited.
+
+        A max_attendance of 0 means no limit, as it does for the sign-up
+        pages.
+        """
+        if not self.max_attendance:
+            return None
+        return max(self.max_attendance - self.attendees.count(), 0)
+
+    def reserve_spot(self, profile):
+        """ Adds the profile to the shift's attendees if the shift has room
+        and returns whether it did.
+
+        The capacity check and the insert happen in one transaction holding
+        the shift's lock, so concurrent sign-ups cannot overfill the shift.
+        """
+        with transaction.atomic():
+            self.lock_attendance()
+            if self.get_open_spots() == 0:
+                return False
+            self.attendees.add(profile)
+        return True
+
+    def fill_from_waitlist(self):
+        """ Moves users from the front of the waitlist onto the shift until
+        it is full, and returns their profiles in waitlist order.
+        """
+        with transaction.atomic():
+            self.lock_attendance()
+            open_spots = self.get_open_spots()
+            slots = self.get_ordered_waitlist().select_related('user')
+            if open_spots is not None:
+                slots = slots[:open_spots]
+            slots = list(slots)
+            profiles = [slot.user for slot in slots]
+            if slots:
+                self.attendees.add(*profiles)
+                WaitlistSlot.objects.filter(
+                            id__in=[slot.id for slot in slots]
+                ).delete()
+        return profiles
+
+    def join_waitlist(self, profile):
+        """ Adds the profile to the end of the waitlist and returns True,
+        unless the profile is already on it or the shift has room.
+        """
+        with transaction.atomic():
+            self.lock_attendance()
+            if (self.get_open_spots() != 0 or
+                    self.waitlistslot_set.filter(user=profile).exists()):
+                return False
+            WaitlistSlot.objects.create(shift=self, user=profile)
+        return True
 
     def get_ordered_waitlist(self):
         """ Get the wait list slot objects associated with the shift in order
-        by the time they were added, that is in a normal wait list order.
+        they were added, that is in a normal wait list order.
+
+        Slots are ordered by id, which unlike the time added is unique, so
+        the front of the waitlist and spots on it come straight from the
+        index.
         """
-        return self.waitlistslot_set.all().order_by('time_added')
+        return self.waitlistslot_set.all().order_by('id')
 
     def get_waitlist_length(self):
         """ Return the number of users on the waitlist."""
@@ -1249,14 +1731,12 @@ class EventShift(models.Model):
 
     def get_users_waitlist_spot(self, profile):
         """ Returns the provided profile's spot on the waitlist."""
-        user_waitlist = WaitlistSlot.objects.filter(shift=self, user=profile)
-        if not user_waitlist:
+        slot_ids = self.waitlistslot_set.filter(
+                                        user=profile
+        ).values_list('id', flat=True)[:1]
+        if not slot_ids:
             return self.get_waitlist_length()
-        w = WaitlistSlot.objects.filter(
-                    shift=self,
-                    time_added__lt=user_waitlist[0].time_added
-        )
-        return w.count()
+        return self.waitlistslot_set.filter(id__lt=slot_ids[0]).count()
 
     def get_users_on_waitlist(self):
         """ Return an unordered list of users on the waitlist."""
@@ -1264,6 +1744,225 @@ class EventShift(models.Model):
         return UserProfile.objects.filter(waitlistslot__in=waitlist)
 
 
+class GoogleCalendarChange(models.Model):
+    """ A change to a shift's google calendar event that has not been sent to
+    google yet.
+
+    Editing events, shifts and sign-ups records the change here instead of
+    calling the calendar API during the request. The sync_google_calendar
+    command coalesces the pending changes per shift and sends them in
+    batches, retrying failures with an exponential backoff. Shifts get their
+    google event id before the event is created, so a retried creation never
+    duplicates an event.
+
+    For deletions calendar_id is the calendar holding the event, for updates
+    it is the calendar the event is moving from (if it is moving).
+    """
+    CHANGE_TYPES = (
+        ('U', 'Update event'),
+        ('D', 'Delete event'),
+        ('A', 'Add attendee'),
+        ('R', 'Remove attendee'),
+    )
+    change_type = models.CharField(max_length=1, choices=CHANGE_TYPES)
+    shift = models.ForeignKey(
+                EventShift,
+                null=True,
+                blank=True,
+                on_delete=models.SET_NULL
+    )
+    calendar_id = models.CharField(max_length=100, blank=True)
+    google_event_id = models.CharField(max_length=64, blank=True)
+    email = models.EmailField(blank=True)
+    display_name = models.CharField(max_length=128, blank=True)
+    time_added = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    def __unicode__(self):
+        return '%s (%s)' % (
+                    self.get_change_type_display(),
+                    self.shift or self.google_event_id
+        )
+
+    @classmethod
+    def get_due_changes(cls):
+        """ Returns the changes that should be sent now, oldest first."""
+        return cls.objects.filter(
+                    next_attempt__lte=timezone.now(),
+                    attempts__lt=GCAL_SYNC_MAX_ATTEMPTS
+        ).order_by('id')
+
+    @classmethod
+    def get_abandoned_changes(cls):
+        """ Returns the changes that failed too often to be retried."""
+        return cls.objects.filter(attempts__gte=GCAL_SYNC_MAX_ATTEMPTS)
+
+    @classmethod
+    def send_pending(cls, http):
+        """ Sends up to GCAL_SYNC_CHUNK_SIZE due changes to google.
+
+        Deletions are sent first, then for each shift its pending moves, the
+        current event is fetched, every pending change to it is applied and
+        the result is written back with a single insert or update. Returns
+        how many changes were handled and how many failed.
+        """
+        service = get_service(http)
+        changes = list(cls.get_due_changes().select_related(
+                                'shift__event__google_cal'
+        )[:GCAL_SYNC_CHUNK_SIZE])
+        done = []
+        failures = []
+        deletions = {}
+        shift_changes = {}
+        for change in changes:
+            if change.change_type == 'D':
+                key = (change.calendar_id, change.google_event_id)
+                deletions.setdefault(key, []).append(change)
+            elif change.shift is None:
+                # The shift was deleted, and its event with it.
+                done.append(change)
+            else:
+                shift_changes.setdefault(change.shift_id, []).append(change)
+
+        results = execute_batched(http, [
+            (key, service.events().delete(
+                        calendarId=key[0],
+                        eventId=key[1]))
+            for key in deletions
+        ])
+        for key, (response, error) in results.iteritems():
+            if error and get_http_status(error) not in [404, 410]:
+                failures.append((deletions[key], error))
+            else:
+                done.extend(deletions[key])
+
+        shifts = {}
+        for shift_id, pending in shift_changes.iteritems():
+            shift = pending[0].shift
+            if not shift.google_event_id:
+                if not any(c.change_type == 'U' for c in pending):
+                    # The shift is not on the calendar, as before.
+                    done.extend(pending)
+                    continue
+                shift.google_event_id = uuid4().hex
+                EventShift.objects.filter(id=shift_id).update(
+                                    google_event_id=shift.google_event_id
+                )
+            shifts[shift_id] = shift
+
+        def fail(shift_id, error):
+            failures.append((shift_changes[shift_id], error))
+            del shifts[shift_id]
+
+        moves = []
+        for shift_id, shift in shifts.iteritems():
+            calendar_id = shift.event.google_cal.calendar_id
+            sources = [
+                c.calendar_id for c in shift_changes[shift_id]
+                if c.change_type == 'U' and c.calendar_id and
+                c.calendar_id != calendar_id
+            ]
+            if sources:
+                moves.append((shift_id, service.events().move(
+                                    calendarId=sources[0],
+                                    eventId=shift.google_event_id,
+                                    destination=calendar_id
+                )))
+        results = execute_batched(http, moves)
+        for shift_id, (response, error) in results.iteritems():
+            if error and get_http_status(error) != 404:
+                fail(shift_id, error)
+
+        results = execute_batched(http, [
+            (shift_id, service.events().get(
+                        calendarId=shift.event.google_cal.calendar_id,
+                        eventId=shift.google_event_id))
+            for shift_id, shift in shifts.iteritems()
+        ])
+        writes = []
+        for shift_id, (gcal_event, error) in results.iteritems():
+            if error:
+                if get_http_status(error) != 404:
+                    fail(shift_id, error)
+                    continue
+                gcal_event = None
+            shift = shifts[shift_id]
+            pending = shift_changes[shift_id]
+            is_update = any(c.change_type == 'U' for c in pending)
+            if gcal_event is None or gcal_event['status'] == 'cancelled':
+                if not is_update:
+                    # Attendees are only added to events on the calendar.
+                    done.extend(pending)
+                    del shifts[shift_id]
+                    continue
+                if gcal_event:
+                    gcal_event = {
+                        'status': 'confirmed',
+                        'sequence': gcal_event['sequence'] + 1,
+                    }
+            else:
+                gcal_event['sequence'] += 1
+            new_event = gcal_event is None
+            if new_event:
+                gcal_event = {'id': shift.google_event_id}
+            if is_update:
+                gcal_event.update(shift.get_gcal_fields())
+            for change in pending:
+                if change.change_type not in ['A', 'R']:
+                    continue
+                attendees = [
+                    a for a in gcal_event.get('attendees', [])
+                    if a.get('email') != change.email
+                ]
+                if change.change_type == 'A':
+                    attendees.append({
+                        'email': change.email,
+                        'displayName': change.display_name,
+                    })
+                gcal_event['attendees'] = attendees
+            calendar_id = shift.event.google_cal.calendar_id
+            if new_event:
+                request = service.events().insert(
+                                calendarId=calendar_id,
+                                body=gcal_event
+                )
+            else:
+                request = service.events().update(
+                                calendarId=calendar_id,
+                                eventId=shift.google_event_id,
+                                body=gcal_event
+                )
+            writes.append((shift_id, request))
+        results = execute_batched(http, writes)
+        for shift_id, (response, error) in results.iteritems():
+            if error:
+                # A creation that already went through fails with a 409, the
+                # retry then finds the event and updates it instead.
+                fail(shift_id, error)
+            else:
+                done.extend(shift_changes[shift_id])
+
+        cls.objects.filter(id__in=[c.id for c in done]).delete()
+        now = timezone.now()
+        failed = 0
+        for failed_changes, error in failures:
+            status = get_http_status(error)
+            for change in failed_changes:
+                if status and status not in GCAL_SYNC_RETRY_STATUSES:
+                    change.attempts = GCAL_SYNC_MAX_ATTEMPTS
+                else:
+                    change.attempts += 1
+                change.next_attempt = now + timedelta(
+                        seconds=GCAL_SYNC_RETRY_DELAY * 2 ** change.attempts
+                )
+                change.last_error = unicode(error)
+                change.save()
+                failed += 1
+        return len(changes), failed
+
+
 class InterviewShift(models.Model):
     """ The object that connects the shift an electee signs up for to be
     interviewed with the shift an active signs up for to be the interviewer.
@@ -1301,6 +2000,14 @@ class MeetingSignIn(models.Model):
     code_phrase = models.CharField(max_length=100)
     quick_question = models.TextField()
 
+    def save(self, *args, **kwargs):
+        super(MeetingSignIn, self).save(*args, **kwargs)
+        self.event.clear_sign_in_cache()
+
+    def delete(self, *args, **kwargs):
+        self.event.clear_sign_in_cache()
+        super(MeetingSignIn, self).delete(*args, **kwargs)
+
 
 class MeetingSignInUserData(models.Model):
     """ The actual data that users provide when signing into a meeting."""
@@ -1405,3 +2112,67 @@ class UserCanBringPreferredItem(models.Model):
                         verbose_name='Yes, I can bring the item. ',
                         default=False
     )
+
+
+# The event popups show the attendees, leaders, waitlists, carpool and who
+# has already received credit, which change through the relations below
+# rather than through saving the event or its shifts.
+@receiver(m2m_changed, sender=EventShift.attendees.through)
+def clear_ajax_for_attendees(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    if not reverse:
+        event_ids = [instance.event_id]
+    elif pk_set is not None:
+        event_ids = EventShift.objects.filter(
+                            id__in=pk_set
+        ).values_list('event_id', flat=True)
+    else:
+        event_ids = EventShift.objects.filter(
+                            attendees=instance
+        ).values_list('event_id', flat=True)
+    for event_id in set(event_ids):
+        clear_event_ajax_cache(event_id)
+        # The feed shows how many are signed up.
+        CalendarEvent.clear_upcoming_feed(event_id)
+
+
+@receiver(m2m_changed, sender=CalendarEvent.leaders.through)
+def clear_ajax_for_leaders(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    if not reverse:
+        clear_event_ajax_cache(instance.id)
+        return
+    event_ids = CalendarEvent.objects.filter(
+                        leaders=instance
+    ).values_list('id', flat=True)
+    if pk_set is not None:
+        event_ids = pk_set
+    for event_id in set(event_ids):
+        clear_event_ajax_cache(event_id)
+
+
+@receiver(post_save, sender=WaitlistSlot)
+@receiver(post_delete, sender=WaitlistSlot)
+def clear_ajax_for_waitlist(sender, instance, **kwargs):
+    event_ids = EventShift.objects.filter(
+                        id=instance.shift_id
+    ).values_list('event_id', flat=True)
+    for event_id in event_ids:
+        clear_event_ajax_cache(event_id)
+
+
+@receiver(post_save, sender=CarpoolPerson)
+@receiver(post_delete, sender=CarpoolPerson)
+def clear_ajax_for_carpool(sender, instance, **kwargs):
+    clear_event_ajax_cache(instance.event_id)
+
+
+@receiver(post_save, sender=ProgressItem)
+@receiver(post_delete, sender=ProgressItem)
+def clear_ajax_for_progress(sender, instance, **kwargs):
+    if instance.related_event_id is not None:
+        clear_event_ajax_cache(instance.related_event_id)
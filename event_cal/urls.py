@@ -107,5 +107,7 @@ urlpatterns = [
         views.add_project_report_to_event, name='add_project_report_to_event'),
     url(r'^event_ajax/(?P<event_id>\d+)/$',
         views.get_event_ajax,name='get_event_ajax'),
+    url(r'^upcoming_events/json/$',
+        views.get_upcoming_events_json, name='get_upcoming_events_json'),
 
 ]
@@ -1,11 +1,11 @@
 # Create your views here.
 from datetime import datetime, date, timedelta
+import json
 import re
 
 from django.core.cache import cache
-from django.core.management import call_command
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, Http404
 from django.shortcuts import redirect, get_object_or_404
 from django.template import loader
 from django.contrib.auth.decorators import permission_required, login_required
@@ -14,11 +14,14 @@ from django.core.urlresolvers import reverse
 from django.core.mail import send_mail
 from django import forms
 from django.forms.models import modelformset_factory, modelform_factory
-from django.db.models import Min, Q
+from django.db import transaction
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Count, Min, Prefetch, Q
 
 from django_ajax.decorators import ajax
 
 from mig_main import messages
+from electees.models import ElecteeGroup
 from event_cal.forms import (
                 AddProjectReportForm,
                 BaseEventPhotoForm,
@@ -36,6 +39,7 @@ from event_cal.forms import (
                 MultiShiftFormset,
 )
 from event_cal.models import (
+                EVENT_AJAX_CACHE_PREFIX,
                 AnnouncementBlurb,
                 CalendarEvent,
                 CarpoolPerson,
@@ -46,9 +50,10 @@ from event_cal.models import (
                 InterviewPairing,
                 InterviewShift,
                 MeetingSignIn,
-                MeetingSignInUserData,
                 UserCanBringPreferredItem,
                 WaitlistSlot,
+                count_event_ajax_lookup,
+                get_event_ajax_version,
 )
 from history.models import (
                 BackgroundCheck,
@@ -56,6 +61,7 @@ from history.models import (
                 Officer,
                 ProjectReport,
 )
+from member_resources.models import QuorumTracker
 from mig_main.models import (
                 AcademicTerm,
                 MemberProfile,
@@ -66,7 +72,11 @@ from mig_main.models import (
 )
 from mig_main.utility import get_previous_page, Permissions, get_message_dict
 from outreach.models import TutoringRecord
-from requirements.models import ProgressItem, EventCategory
+from requirements.models import (
+                ProgressItem,
+                EventCategory,
+                invalidate_progress_rows,
+)
 
 from event_cal.gcal_functions import (
                 initialize_gcal,
@@ -81,6 +91,7 @@ GCAL_USE_PREF = [d for d in PREFERENCES
                  if d.get('name') == 'google_calendar_add'][0]
 GCAL_ACCT_PREF = [d for d in PREFERENCES
                   if d.get('name') == 'google_calendar_account'][0]
+EVENT_LIST_PAGE_SIZE = 20
 
 
 def notify_waitlist_move(event, shift, profile):
@@ -121,79 +132,73 @@ The TBP Website''' % {
     )
 
 
-def organize_shifts_interview(shifts, is_two_part):
-    if is_two_part:
-        times = sorted(
-                    set(
-                        [timezone.localtime(shift.first_shift.start_time)
-                         for shift in shifts]
-                    )
-        )
-        locations = sorted(
-                    set(
-                        [shift.first_shift.location.replace(
-                                '(Part 1)',
-                                ''
-                        ).replace(
-                                '(Part 2)',
-                                ''
-                        ) for shift in shifts]
-                    )
-        )
-        organized_shifts = [
-            {
-                'time': time,
-                'locations': [None for location in locations]
-            } for time in times
-        ]
+def get_interview_location(location):
+    """ Returns the location of an interview shift without its part number.
+    """
+    return (location or '').replace('(Part 1)', '').replace(
+                                    '(Part 2)',
+                                    ''
+    ).strip()
 
-    else:
-        times = sorted(
-                set(
-                    [timezone.localtime(shift.start_time) for shift in shifts]
-                )
-        )
-        locations = sorted(
-            set(
-                [shift.location.replace(
-                                '(Part 1)',
-                                ''
-                ).replace(
-                    '(Part 2)',
-                    ''
-                ).lstrip() for shift in shifts]
-            )
-        )
-        organized_shifts = [
-            {
-                'time': time,
-                'locations': [None for location in locations]
-            }
-            for time in times
-        ]
-    for time_count, time in enumerate(times):
-        for location_count, location in enumerate(locations):
-            if is_two_part:
-                shift = shifts.filter(
-                            first_shift__start_time=time,
-                            first_shift__location__contains=location,
-                )
-            else:
-                shift = shifts.filter(
-                            start_time=time,
-                            location__contains=location,
-                )
+
+def organize_shifts_interview(shifts, is_two_part):
+    """ Returns the interview shifts (or for two-part interviews the
+    pairings) laid out as a grid of time rows by location, along with the
+    locations.
+
+    The shifts are read once and placed by their (time, location) key, the
+    first shift in order taking a cell, so related objects the caller
+    prefetched are used by the whole grid.
+    """
+    grid = {}
+    times = set()
+    locations = set()
+    for shift in shifts:
+        actual_shift = shift.first_shift if is_two_part else shift
+        time = timezone.localtime(actual_shift.start_time)
+        location = get_interview_location(actual_shift.location)
+        times.add(time)
+        locations.add(location)
+        grid.setdefault((time, location), shift)
+    times = sorted(times)
+    locations = sorted(locations)
+    organized_shifts = []
+    for time in times:
+        time_row = {
+            'time': time,
+            'locations': [grid.get((time, location)) for location in locations]
+        }
+        for shift in time_row['locations']:
             if shift:
-                organized_shifts[time_count]['locations'][location_count] = shift[0]
                 if is_two_part:
-                    organized_shifts[time_count]['end_time'] = shift[0].second_shift.end_time
+                    time_row['end_time'] = shift.second_shift.end_time
                 else:
-                    organized_shifts[time_count]['end_time'] = shift[0].end_time
+                    time_row['end_time'] = shift.end_time
+        organized_shifts.append(time_row)
     return (organized_shifts, locations)
 
 
-def add_user_to_shift(profile, shift):
-    shift.attendees.add(profile)
+def add_user_to_shift(profile, shift, check_capacity=True):
+    """ Signs the profile up for the shift and returns True, or returns False
+    if the shift is full (unless told not to check).
+    """
+    if check_capacity:
+        if not shift.reserve_spot(profile):
+            return False
+    else:
+        shift.attendees.add(profile)
+    finish_adding_user_to_shift(profile, shift)
+    return True
+
+
+def fill_shift_from_waitlist(shift):
+    for profile in shift.fill_from_waitlist():
+        finish_adding_user_to_shift(profile, shift)
+        notify_waitlist_move(shift.event, shift, profile)
+
+
+def finish_adding_user_to_shift(profile, shift):
+    invalidate_progress_rows([profile.uniqname])
     gcal_pref = UserPreference.objects.filter(
                         user=profile,
                         preference_type='google_calendar_add'
@@ -222,6 +227,7 @@ def add_user_to_shift(profile, shift):
 
 def remove_user_from_shift(profile, shift):
     shift.attendees.remove(profile)
+    invalidate_progress_rows([profile.uniqname])
     email_pref = UserPreference.objects.filter(
                         user=profile,
                         preference_type='google_calendar_account'
@@ -239,43 +245,89 @@ def remove_user_from_shift(profile, shift):
     shift.delete_gcal_attendee(email_to_use)
 
 
+def get_progress_preview(summary, num_changed=0, num_deleted=0):
+    """ Returns a message describing what recording the progress in the
+    summary (from CalendarEvent.record_progress) would do.
+    """
+    message = 'Preview only, nothing has been saved. This would add '
+    message += '%d progress item(s)' % (len(summary['created']))
+    if num_changed or num_deleted:
+        message += ', update %d and remove %d' % (num_changed, num_deleted)
+    message += '.'
+    if summary['added_attendees']:
+        message += (' These members would be added to the first shift: ' +
+                    ', '.join([profile.uniqname for profile
+                               in summary['added_attendees']]) + '.')
+    if summary['duplicates']:
+        message += (' These members already have progress or are listed '
+                    'twice, and would be ignored: ' +
+                    ', '.join([profile.uniqname for profile
+                               in summary['duplicates']]) + '.')
+    return message
+
+
+def get_duplicate_warning(duplicates):
+    return ('The following members had progress listed twice, with latter '
+            'listings ignored: ' +
+            ','.join([prof.uniqname for prof in duplicates]) +
+            '. Go to update progress to check that the amount of progress is '
+            'correct')
+
+
 def get_permissions(user):
     return {'can_edit_reports': Permissions.can_process_project_reports(user)}
 
 
-def get_common_context(request):
-    upcoming_html = cache.get('upcoming_events_html', None)
-    tz_now = timezone.localtime(timezone.now())
-    if hasattr(request.user, 'userprofile'):
-        profile = request.user.userprofile
-        gcal_pref = UserPreference.objects.filter(
-                    user=profile,
-                    preference_type='google_calendar_add'
-        )
-        if gcal_pref.exists():
-            use_cal_pref = gcal_pref[0].preference_value
-        else:
-            use_cal_pref = GCAL_USE_PREF['default']
-        show_manual_add_gcal_button = (use_cal_pref != 'always')
-    else:
-        show_manual_add_gcal_button = False
-    if not upcoming_html:
+def get_upcoming_events_html():
+    """ Returns the list of upcoming events, rendered from the upcoming events
+    feed and cached for as long as that version of the feed.
+    """
+    feed = CalendarEvent.get_upcoming_feed()
+    cache_name = 'UPCOMING_EVENTS_HTML' + feed['version']
+    upcoming_html = cache.get(cache_name, None)
+    if upcoming_html is None:
+        now = timezone.localtime(timezone.now())
         upcoming_html = loader.render_to_string(
                     'event_cal/upcoming_events.html',
                     {
-                        'upcoming_events': CalendarEvent.get_upcoming_events(),
-                        'now': tz_now
+                        'upcoming_events': feed['events'],
+                        'now': now
                     }
         )
-        cache.set('upcoming_events_html', upcoming_html)
+        timeout = (feed['expires'] - now).total_seconds()
+        cache.set(cache_name, upcoming_html, max(int(timeout), 1))
+    return upcoming_html
+
+
+def get_show_manual_add_gcal_button(user):
+    """ Returns whether the user has a profile and does not have events
+    added to their calendar automatically.
+    """
+    if not Permissions.get_context(user).has_user_profile:
+        return False
+    gcal_pref = UserPreference.objects.filter(
+                user__user=user,
+                preference_type='google_calendar_add'
+    ).values_list('preference_value', flat=True)
+    if gcal_pref:
+        use_cal_pref = gcal_pref[0]
+    else:
+        use_cal_pref = GCAL_USE_PREF['default']
+    return use_cal_pref != 'always'
+
+
+def get_common_context(request):
+    tz_now = timezone.localtime(timezone.now())
     context_dict = get_message_dict(request)
     context_dict.update({
         'request': request,
         'now': tz_now,
-        'upcoming_events': upcoming_html,
+        'upcoming_events': get_upcoming_events_html(),
         'edit_page': False,
         'main_nav': 'cal',
-        'show_manual_add_gcal_button': show_manual_add_gcal_button,
+        'show_manual_add_gcal_button': get_show_manual_add_gcal_button(
+                                                            request.user
+        ),
     })
     return context_dict
 
@@ -301,41 +353,32 @@ def index(request):
 
 @login_required
 def meeting_sign_in(request, shift_id):
-    shift = get_object_or_404(EventShift, id=shift_id)
+    try:
+        sign_in = EventShift.get_sign_in(shift_id)
+    except EventShift.DoesNotExist:
+        raise Http404
+    shift = sign_in['shift']
     event = shift.event
-    sign_in_sheets = MeetingSignIn.objects.filter(event=event)
-    current_tz = timezone.get_current_timezone()
-    now = timezone.localtime(timezone.now())
-    if sign_in_sheets:
-        sign_in_sheet = sign_in_sheets[0]
-    else:
-        sign_in_sheet = None
+    sign_in_sheet = sign_in['sheet']
 
-    if not shift.can_sign_in():
-        if not event.use_sign_in:
-            request.session['error_message'] = ('Sign-in not available for '
-                                                'this event')
-            return get_previous_page(
-                        request,
-                        alternate='event_cal:event_detail',
-                        args=(unicode(event.id),)
-            )
-        elif shift.is_full():
-            request.session['error_message'] = ('You cannot sign-in; the '
-                                                'event is full')
-            return get_previous_page(
+    # Whether the shift is full is checked by shift.sign_in, under the
+    # shift's lock, so that it is not counted on every request.
+    if not event.use_sign_in:
+        request.session['error_message'] = ('Sign-in not available for '
+                                            'this event')
+        return get_previous_page(
+                    request,
+                    alternate='event_cal:event_detail',
+                    args=(unicode(event.id),)
+        )
+    elif not shift.is_now():
+        request.session['error_message'] = ('You can only sign-in during '
+                                            'the event')
+        return get_previous_page(
                         request,
                         alternate='event_cal:event_detail',
                         args=(unicode(event.id),)
-            )
-        else:
-            request.session['error_message'] = ('You can only sign-in during '
-                                                'the event')
-            return get_previous_page(
-                            request,
-                            alternate='event_cal:event_detail',
-                            args=(unicode(event.id),)
-            )
+        )
 
     if not hasattr(request.user, 'userprofile'):
         request.session['error_message'] = ('You must create a profile before '
@@ -386,7 +429,6 @@ def meeting_sign_in(request, shift_id):
             if not sign_in_sheet:
                 form = MeetingSignInForm(request.POST)
             else:
-                sign_in_sheet = sign_in_sheets[0]
                 form = MeetingSignInForm(
                             request.POST,
                             question_text=sign_in_sheet.quick_question
@@ -395,39 +437,26 @@ def meeting_sign_in(request, shift_id):
                 submitted_code = form.cleaned_data['secret_code']
                 if (not sign_in_sheet or
                    submitted_code == sign_in_sheet.code_phrase):
-                    is_member = profile.is_member()
-                    event_attendees = event.get_attendees_with_progress()
-                    if (is_member and
-                       profile.memberprofile not in event_attendees):
-                        if sign_in_sheet:
-                            user_data = MeetingSignInUserData(
-                                            meeting_data=sign_in_sheet,
-                                            question_response='',
-                                            free_response='',
-                            )
-                            if 'quick_question' in form.cleaned_data:
-                                q_resp = form.cleaned_data['quick_question']
-                                user_data.question_response = q_resp
-                            if 'free_response' in form.cleaned_data:
-                                free_resp = form.cleaned_data['free_response']
-                                user_data.free_response = free_resp
-                                if not user_data.free_response:
-                                    user_data.free_response = 'no response'
-                            user_data.save()
-                        time_d = shift.end_time-shift.start_time
-                        hours = time_d.seconds/3600.0
-                        if event.is_fixed_progress():
-                            hours = 1
-                        p = ProgressItem(
-                                member=profile.memberprofile,
-                                term=AcademicTerm.get_current_term(),
-                                amount_completed=hours,
-                                event_type=event.event_type,
-                                related_event=event,
-                                date_completed=date.today(),
-                                name=event.name
+                    q_resp = form.cleaned_data.get('quick_question', '')
+                    free_resp = form.cleaned_data.get('free_response', '')
+                    if 'free_response' in form.cleaned_data and not free_resp:
+                        free_resp = 'no response'
+                    signed_in = shift.sign_in(
+                            profile,
+                            sign_in['hours'],
+                            sheet=sign_in_sheet,
+                            question_response=q_resp,
+                            free_response=free_resp
+                    )
+                    if signed_in is None:
+                        request.session['error_message'] = ('You cannot '
+                                                            'sign-in; the '
+                                                            'event is full')
+                    elif signed_in:
+                        QuorumTracker.record_sign_in(
+                                    event.id,
+                                    profile.uniqname
                         )
-                        p.save()
                         request.session['success_message'] = ('You were signed'
                                                               ' in '
                                                               'successfully')
@@ -435,7 +464,6 @@ def meeting_sign_in(request, shift_id):
                         request.session['warning_message'] = ('You were '
                                                               'already signed '
                                                               'in')
-                    shift.attendees.add(profile)
                     return get_previous_page(
                                 request,
                                 alternate='event_cal:event_detail',
@@ -451,7 +479,6 @@ def meeting_sign_in(request, shift_id):
             if not sign_in_sheet:
                 form = MeetingSignInForm()
             else:
-                sign_in_sheet = sign_in_sheets[0]
                 form = MeetingSignInForm(
                                 question_text=sign_in_sheet.quick_question
                 )
@@ -496,6 +523,10 @@ def event_detail(request, event_id):
         'can_edit_signin': (not event.can_complete_event() and
                             Permissions.can_edit_event(event, request.user) and
                             event.use_sign_in),
+        'can_track_quorum': (
+                    event.event_type.name == 'Voting Meeting Attendance' and
+                    Permissions.can_view_demographics(request.user)
+        ),
         'subnav': 'list',
         'show_shifts': True,
         'needs_social_media': True,
@@ -549,12 +580,17 @@ def add_to_waitlist(request, shift_id):
                 request.session['error_message'] = 'Shift is for actives only'
             elif not event.allow_overlapping_sign_ups and event.does_shift_overlap_with_users_other_shifts(shift, request.user.userprofile):
                 request.session['error_message'] = 'You are signed up for a shift that overlaps with this one.'
-            else:
-                waitlist = WaitlistSlot(shift=shift, user=profile)
-                waitlist.save()
+            elif shift.join_waitlist(profile):
                 request.session['success_message'] = ('You have successfully '
                                                       'been added to the '
                                                       'waitlist.')
+            elif WaitlistSlot.objects.filter(
+                        shift=shift,
+                        user=profile).exists():
+                request.session['error_message'] = ('You are already on the '
+                                                    'waitlist')
+            else:
+                request.session['error_message'] = 'Shift isn\'t full'
         else:
             request.session['error_message'] = 'This event is members-only'
     else:
@@ -785,8 +821,9 @@ def sign_up(request,  shift_id):
                     request.session['error_message'] = 'Shift is for actives only'
                 elif not event.allow_overlapping_sign_ups and event.does_shift_overlap_with_users_other_shifts(shift, request.user.userprofile):
                     request.session['error_message'] = 'You are signed up for a shift that overlaps with this one.'
+                elif not add_user_to_shift(request.user.userprofile, shift):
+                    request.session['error_message'] = 'Shift is full'
                 else:
-                    add_user_to_shift(request.user.userprofile, shift)
                     request.session['success_message'] = 'You have successfully signed up for the event'
                     if event.preferred_items and event.preferred_items.lstrip() and not event.usercanbringpreferreditem_set.filter(user=profile).exists():
                         request.session['info_message'] = 'Please indicate if you can bring items to the event.'
@@ -857,12 +894,7 @@ def sign_up(request,  shift_id):
 
 def unsign_up_user(shift, profile):
     remove_user_from_shift(profile, shift)
-    waitlist = shift.get_ordered_waitlist()
-    if waitlist.exists():
-        w = waitlist[0]
-        add_user_to_shift(w.user, shift)
-        notify_waitlist_move(shift.event, shift, w.user)
-        w.delete()
+    fill_shift_from_waitlist(shift)
     if profile not in shift.event.get_event_attendees():
         CarpoolPerson.objects.filter(
                 event=shift.event,
@@ -1164,8 +1196,8 @@ def list(request):
         if request.user.userprofile.is_member():
             user_is_member = True
             query_members = Q()
-    if request.method == 'POST':
-        form = EventFilterForm(request.POST)
+    if 'submit' in request.GET:
+        form = EventFilterForm(request.GET)
         query_date = Q()
         if form.is_valid():
             after_date = form.cleaned_data['after_date']
@@ -1215,22 +1247,45 @@ def list(request):
         form = EventFilterForm(initial=initial)
     shifts = EventShift.objects.filter(query_date)
     shifts = shifts.filter(query_location & q_can_attend)
+    # A subquery on the shifts rather than a join, so the events need not be
+    # made distinct.
     events = CalendarEvent.objects.filter(
-                    query_members
-    ).distinct()
-    events = events.filter(eventshift__in=shifts).distinct()
-    events = events.filter(query_event_type)
-    template = loader.get_template('event_cal/list.html')
+                    query_members,
+                    query_event_type,
+                    id__in=shifts.values('event_id')
+    ).order_by('earliest_start', 'id')
+    paginator = Paginator(events, EVENT_LIST_PAGE_SIZE)
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    page_events = page.object_list.prefetch_related(Prefetch(
+                    'eventshift_set',
+                    queryset=EventShift.objects.annotate(
+                                    num_attendees=Count('attendees')
+                    ).order_by('start_time')
+    ))
+    editable_ids = Permissions.get_editable_event_ids(
+                                        page_events,
+                                        request.user
+    )
     packed_events = []
-    for event in events.order_by('earliest_start'):
+    for event in page_events:
         packed_events.append(
                 {
                     'event': event,
-                    'can_edit': Permissions.can_edit_event(event, request.user)
+                    'can_edit': event.id in editable_ids
                 }
         )
+    query_string = request.GET.copy()
+    query_string.pop('page', None)
+    template = loader.get_template('event_cal/list.html')
     context_dict = {
         'events': packed_events,
+        'page': page,
+        'query_string': query_string.urlencode(),
         'user_is_member': user_is_member,
         'has_profile': has_profile,
         'form': form,
@@ -1245,28 +1300,65 @@ def list(request):
     return HttpResponse(template.render(context_dict, request))
 
 
+def get_event_ajax_variant(user, event_id):
+    """ Returns the part of the event popup's cache key that depends on the
+    viewer.
+
+    Viewers see the same popup if they have the same kind of profile, the
+    same rights to the event and the same calendar preference. Those signed
+    up for, waitlisted for or credited with the event also see their own
+    status, so they get a variant of their own.
+
+    Everything here comes from the user's PermissionContext and a few
+    small queries, so that a cached popup can be served without loading the
+    event or building the template context.
+    """
+    if not user.is_authenticated():
+        return 'ANON'
+    permission_context = Permissions.get_context(user)
+    if not permission_context.has_user_profile:
+        return 'NO_PROFILE'
+    member = permission_context.profile
+    flags = [
+        member is not None,
+        member is not None and member.status.name == 'Active',
+        member is not None and member.status.name == 'Electee',
+        member is not None and member.standing.name == 'Undergraduate',
+        member is not None and member.standing.name == 'Graduate',
+        Permissions.can_edit_event_id(event_id, user),
+        Permissions.can_process_project_reports(user),
+        get_show_manual_add_gcal_button(user),
+    ]
+    variant = ''.join(['1' if flag else '0' for flag in flags])
+    involved = EventShift.objects.filter(
+                    Q(attendees__user=user) | Q(waitlistslot__user__user=user),
+                    event_id=event_id
+    ).exists() or (member is not None and ProgressItem.objects.filter(
+                    related_event_id=event_id,
+                    member=member
+    ).exists())
+    if involved:
+        variant += '_%d' % user.id
+    return variant
+
+
 @ajax
 def get_event_ajax(request, event_id):
-    has_profile = False
-    cache_name = 'EVENT_AJAX'+event_id
-    if hasattr(request.user, 'userprofile'):
-        has_profile = True
-        if request.user.userprofile.is_active:
-            cache_name +='ACTIVE'
-        elif request.user.userprofile.is_ugrad:
-            cache_name +='UGRAD_ELECTEE'
-        else:
-            cache_name += 'GRAD_ELECTEE'
-
+    event_id = int(event_id)
+    cache_name = '%s%d_%s_%s' % (
+                    EVENT_AJAX_CACHE_PREFIX,
+                    event_id,
+                    get_event_ajax_version(event_id),
+                    get_event_ajax_variant(request.user, event_id)
+    )
     event_html = cache.get(cache_name, None)
-    if not event_html:
+    count_event_ajax_lookup(event_html is not None)
+    if event_html is None:
         event = get_object_or_404(CalendarEvent, id=event_id)
-        can_edit = Permissions.can_edit_event(event, request.user)
-        
         context_dict = {
             'event': event,
-            'can_edit_event': can_edit,
-            'has_profile': has_profile,
+            'can_edit_event': Permissions.can_edit_event(event, request.user),
+            'has_profile': hasattr(request.user, 'userprofile'),
             'user': request.user,
             'show_shifts': not (
                             event.event_type.name == 'Attended Interviews' or
@@ -1279,16 +1371,40 @@ def get_event_ajax(request, event_id):
                         'event_cal/event.html',
                         context_dict
         )
-        if event.eventshift_set.exclude(max_attendance=None).exists():
-            cache.set('EVENT_AJAX'+event_id, event_html, 60*10)
-        else:
-            cache.set('EVENT_AJAX'+event_id, event_html, 60*60*2)
+        cache.set(
+                cache_name,
+                event_html,
+                event.get_ajax_timeout(event.eventshift_set.all())
+        )
 
     return {
         'fragments': {
-            '#event'+event_id: event_html
+            '#event%d' % event_id: event_html
+        }
+    }
+
+
+def get_upcoming_events_json(request):
+    """ Returns the upcoming events and the meetings going on now as JSON,
+    straight from the upcoming events feed.
+    """
+    feed = CalendarEvent.get_upcoming_feed()
+
+    def get_row(event):
+        return {
+            'id': event['id'],
+            'name': event['name'],
+            'earliest_start': event['earliest_start'].isoformat(),
+            'event_type': event['event_type'],
+            'is_current_meeting': event['is_current_meeting'],
+            'url': reverse('event_cal:event_detail', args=(event['id'],)),
         }
+    data = {
+        'events': [get_row(event) for event in feed['events']],
+        'current_meetings': [get_row(event)
+                             for event in feed['current_meetings']],
     }
+    return HttpResponse(json.dumps(data), content_type='application/json')
 
 
 def my_events(request):
@@ -1586,7 +1702,6 @@ def delete_event(request, event_id):
     if Permissions.can_edit_event(e, request.user) and not e.completed:
         e.delete_gcal_event()
         e.delete()
-        call_command('reset_upcoming_events')
         request.session['success_message'] = 'Event deleted successfully'
         return redirect('event_cal:list')
     else:
@@ -1606,7 +1721,6 @@ def delete_shift(request, shift_id):
             s.delete_gcal_event_shift()
             s.delete()
             e.save()
-            call_command('reset_upcoming_events')
             request.session['success_message'] = 'Event shift deleted successfully'
         else:
             request.session['error_message'] = ('Shifts can only be deleted '
@@ -1748,13 +1862,7 @@ def edit_event(request, event_id):
                 request.session['success_message'] = ('Event updated '
                                                       'successfully')
                 for shift in shifts:
-                    waitlist = shift.get_ordered_waitlist()
-                    for w in waitlist:
-                        if shift.is_full():
-                            break
-                        add_user_to_shift(w.user, shift)
-                        notify_waitlist_move(event, shift, w.user)
-                        w.delete()
+                    fill_shift_from_waitlist(shift)
                 return redirect('event_cal:event_detail', event_id)
             else:
                 request.session['error_message'] = messages.SHIFT_ERRORS
@@ -1815,59 +1923,47 @@ def update_completed_event(request, event_id):
                     prefix='update_event',
                     queryset=ProgressItem.objects.filter(related_event=e)
         )
-        if formset.is_valid():
+        if not formset.is_valid():
+            request.session['error_message'] = messages.GENERIC_SUBMIT_ERROR
+        elif 'preview' in request.POST:
             instances = formset.save(commit=False)
-            for obj in formset.deleted_objects:
-                obj.delete()
-            first_shift = e.eventshift_set.all()[0]
-            duplicate_progress = set()
-            instances_list = [item[0] for item in formset.changed_objects]
-            for instance in instances:
-                if not instance.member.is_member():
-                    continue
-                if instance not in instances_list:
-                    # double check they don't already have progress?
-                    if not e.eventshift_set.filter(
-                            attendees=instance.member
-                            ).exists():
-                        first_shift.attendees.add(instance.member)
-                        first_shift.save()
-                    if ProgressItem.objects.filter(
-                            related_event=e,
-                            member=instance.member
-                            ).exists():
-                        duplicate_progress |= set([instance.member])
-                        continue
-                    instance.term = AcademicTerm.get_current_term()
-                    instance.event_type = e.event_type
-                    instance.date_completed = date.today()
-                    instance.related_event = e
-                    instance.name = e.name
-                if is_fixed:
-                    instance.amount_completed = 1
-                instance.save()
-            for instance in formset.deleted_objects:
-                for shift in e.eventshift_set.filter(
-                                attendees=instance.member
-                        ):
-                    shift.attendees.remove(instance.member)
-                    shift.save()
-
-            if duplicate_progress:
-                request.session['warning_message'] = (
-                                'The following members had progress listed '
-                                'twice, with latter listings ignored: ' +
-                                ','.join(
-                                    [prof.uniqname for prof
-                                     in duplicate_progress]
-                                ) +
-                                '. Go to update progress to check that the '
-                                'amount of progress is correct')
+            changed = [item[0] for item in formset.changed_objects]
+            summary = e.record_progress(
+                            [i for i in instances if i not in changed],
+                            dry_run=True
+            )
+            request.session['info_message'] = get_progress_preview(
+                                                    summary,
+                                                    len(changed),
+                                                    len(formset.deleted_objects)
+            )
+        else:
+            instances = formset.save(commit=False)
+            changed = [item[0] for item in formset.changed_objects]
+            with transaction.atomic():
+                for obj in formset.deleted_objects:
+                    obj.delete()
+                for instance in changed:
+                    if is_fixed:
+                        instance.amount_completed = 1
+                    instance.save()
+                summary = e.record_progress(
+                                [i for i in instances if i not in changed]
+                )
+                e.remove_attendees(EventShift.attendees.through.objects.filter(
+                        eventshift__event=e,
+                        userprofile__in=[
+                            obj.member_id for obj in formset.deleted_objects
+                        ]
+                ))
+            ElecteeGroup.update_group_points(e.term)
+            if summary['duplicates']:
+                request.session['warning_message'] = get_duplicate_warning(
+                                                        summary['duplicates']
+                )
             request.session['success_message'] = ('Event and progress updated '
                                                   'successfully')
             return redirect('event_cal:event_detail', event_id)
-        else:
-            request.session['error_message'] = messages.GENERIC_SUBMIT_ERROR
     else:
         formset = form_type(
                     prefix='update_event',
@@ -1882,6 +1978,7 @@ def update_completed_event(request, event_id):
         'subnav': 'list',
         'has_files': False,
         'submit_name': 'Update Event',
+        'preview_name': 'Preview',
         'back_button': {
                 'link': reverse('event_cal:event_detail', args=[event_id]),
                 'text': 'To  %s Page' % (e.name)
@@ -1932,89 +2029,55 @@ def complete_event(request, event_id):
                     prefix=form_prefix,
                     queryset=ProgressItem.objects.none()
         )
-        if formset.is_valid():
+        if not formset.is_valid():
+            request.session['error_message'] = messages.GENERIC_SUBMIT_ERROR
+        elif 'preview' in request.POST:
+            summary = e.record_progress(
+                            formset.save(commit=False),
+                            dry_run=True
+            )
+            request.session['info_message'] = get_progress_preview(summary)
+        else:
             instances = formset.save(commit=False)
             for obj in formset.deleted_objects:
                 obj.delete()
-            first_shift = e.eventshift_set.all()[0]
-            duplicate_progress = set()
-            for instance in instances:
-                if not instance.member.is_member():
-                    continue
-                # double check they don't already have progress?
-                if not e.eventshift_set.filter(
-                            attendees=instance.member
-                        ).exists():
-                    first_shift.attendees.add(instance.member)
-                    first_shift.save()
-                if ProgressItem.objects.filter(
-                            related_event=e,
-                            member=instance.member
-                        ).exists():
-                    duplicate_progress |= set([instance.member])
-                    continue
-                instance.term = AcademicTerm.get_current_term()
-                instance.event_type = e.event_type
-                instance.date_completed = date.today()
-                instance.related_event = e
-                instance.name = e.name
-                if is_fixed:
-                    instance.amount_completed = 1
-                instance.save()
-            confirmed_attendees = MemberProfile.objects.filter(
-                                                progressitem__related_event=e
-            )
-            for shift in e.eventshift_set.all():
-                shift.waitlistslot_set.all().delete()
-                for attendee in shift.attendees.exclude(
-                                    pk__in=confirmed_attendees
-                                ):
-                    if attendee.is_member():
-                        shift.attendees.remove(attendee)
-                shift.save()
-            e.completed = True
-            e.save()
-            if duplicate_progress:
-                request.session['warning_message'] = (
-                                    'The following members had progress '
-                                    'listed twice, with latter listings '
-                                    'ignored: ' +
-                                    ','.join(
-                                        [prof.uniqname for prof
-                                         in duplicate_progress]
-                                        ) +
-                                    '. Go to update progress to check that '
-                                    'the amount of progress is correct')
+            with transaction.atomic():
+                summary = e.record_progress(instances)
+                e.remove_unconfirmed_attendees()
+                e.completed = True
+                e.save()
+            ElecteeGroup.update_group_points(e.term)
+            if summary['duplicates']:
+                request.session['warning_message'] = get_duplicate_warning(
+                                                        summary['duplicates']
+                )
             request.session['success_message'] = ('Event and progress '
                                                   'updated successfully')
             request.session['project_report_event'] = event_id
             return redirect('event_cal:event_project_report', event_id)
-        else:
-            request.session['error_message'] = messages.GENERIC_SUBMIT_ERROR
     else:
         # create initial
         initial = []
         attendees = UserProfile.objects.filter(
                         event_attendee__event=e
         ).distinct()
+        attendance = CalendarEvent.get_attendance_by_attendee([e])
+        with_progress = set(ProgressItem.objects.filter(
+                                related_event=e
+                        ).values_list('member_id', flat=True))
         for attendee in attendees.order_by('last_name'):
             if not attendee.is_member():
                 continue
-            if ProgressItem.objects.filter(
-                                related_event=e,
-                                member=attendee.memberprofile
-                    ).exists():
+            if attendee.uniqname in with_progress:
                 continue
             if is_fixed:
                 initial.append({'member': attendee.memberprofile})
             else:
+                hours = attendance[(attendee.uniqname, e.id)]['hours']
                 initial.append(
                         {
                             'member': attendee.memberprofile,
-                            'amount_completed': round(
-                                    e.get_attendee_hours_at_event(attendee),
-                                    2
-                            )
+                            'amount_completed': round(hours, 2)
                         }
                 )
         form_type.extra = len(initial)+1
@@ -2030,6 +2093,7 @@ def complete_event(request, event_id):
         'subnav': 'list',
         'has_files': False,
         'submit_name': 'Complete Event',
+        'preview_name': 'Preview',
         'back_button': {
                 'link': reverse('event_cal:event_detail', args=[event_id]),
                 'text': 'To  %s Page' % (e.name)
@@ -2063,7 +2127,7 @@ def generate_announcements(request):
     context_dict = {
         'announcement_parts': announcement_parts,
         'subnav': 'admin',
-        'announcement_events': CalendarEvent.get_upcoming_events(True),
+        'announcement_events': CalendarEvent.get_upcoming_events(),
         }
     context_dict.update(get_permissions(request.user))
     context_dict.update(get_common_context(request))
@@ -2653,6 +2717,11 @@ def create_electee_interviews(request):
             active_event.save()
             electee_event.event_class = ec
             electee_event.save()
+            tz = timezone.get_current_timezone()
+            electee_shifts = []
+            active_shifts = []
+            # Pairs of indices into electee_shifts for two-part interviews.
+            pairings = []
             for shift_form in formset:
                 if not shift_form.is_valid() or not shift_form.has_changed():
                     # if it hasn't changed, then it's an extra blank form
@@ -2667,6 +2736,7 @@ def create_electee_interviews(request):
                 )
                 locations = shift_form.cleaned_data['locations'].split(',')
                 num_parts = shift_form.cleaned_data['number_of_parts']
+                interview_type = shift_form.cleaned_data['interview_type']
                 odd_shift = False
                 alternate_last = (len(locations) % num_parts) == 1
 
@@ -2686,67 +2756,62 @@ def create_electee_interviews(request):
                             part = 1 if odd_shift else 2
                         else:
                             part = (idx % num_parts)+1
-                        electee_shift = EventShift()
-                        tz = timezone.get_current_timezone()
-                        electee_shift.start_time = timezone.make_aware(
-                                                            start_time,
-                                                            tz
-                        )
-                        electee_shift.end_time = timezone.make_aware(
-                                                            mid_time,
-                                                            tz
-                        )
                         if num_parts > 1:
-                            electee_shift.location = location.lstrip() + ' (Part '+unicode(part)+')'
-                        else:
-                            electee_shift.location = location.lstrip()
-                        interview_type = shift_form.cleaned_data['interview_type']
-                        if interview_type == 'U' or interview_type == 'UI':
-                            electee_shift.ugrads_only = True
-                        elif interview_type == 'G' or interview_type == 'GI':
-                            electee_shift.grads_only = True
-                        electee_shift.max_attendance = 1
-                        electee_shift.electees_only = True
-                        electee_shift.event = electee_event
-                        electee_shift.save()
-                        electee_shift_id = electee_shift.id
-                        active_shift = electee_shift
-                        active_shift.pk = None
-                        active_shift.save()
-                        active_shift.max_attendance = 2
-                        active_shift.electees_only = False
-                        active_shift.actives_only = True
-                        active_shift.event = active_event
-                        if interview_type == 'U':
-                            active_shift.ugrads_only = True
-                            active_shift.grads_only = False
-                        elif interview_type == 'G':
-                            active_shift.grads_only = True
-                            active_shift.ugrads_only = False
+                            location = location.lstrip() + ' (Part '+unicode(part)+')'
                         else:
-                            active_shift.grads_only = False
-                            active_shift.ugrads_only = False
-                        active_shift.save()
-                        interview_shift = InterviewShift()
-                        interview_shift.interviewer_shift = active_shift
-                        electee_shift = EventShift.objects.get(
-                                                    id=electee_shift_id
+                            location = location.lstrip()
+                        shift_fields = {
+                            'start_time': timezone.make_aware(start_time, tz),
+                            'end_time': timezone.make_aware(mid_time, tz),
+                            'location': location,
+                        }
+                        electee_shift = EventShift(
+                                event=electee_event,
+                                max_attendance=1,
+                                electees_only=True,
+                                ugrads_only=interview_type in ['U', 'UI'],
+                                grads_only=interview_type in ['G', 'GI'],
+                                **shift_fields
+                        )
+                        active_shift = EventShift(
+                                event=active_event,
+                                max_attendance=2,
+                                actives_only=True,
+                                ugrads_only=interview_type == 'U',
+                                grads_only=interview_type == 'G',
+                                **shift_fields
                         )
-                        interview_shift.interviewee_shift = electee_shift
-                        interview_shift.term = active_event.term
-                        interview_shift.save()
                         if num_parts > 1:
                             if odd_shift:
-                                start_shifts.append(electee_shift)
+                                start_shifts.append(len(electee_shifts))
                             else:
-                                end_shifts.append(electee_shift)
+                                end_shifts.append(len(electee_shifts))
+                        electee_shifts.append(electee_shift)
+                        active_shifts.append(active_shift)
                     if num_parts > 1 and not odd_shift:
                         for idx, start_shift in enumerate(start_shifts):
-                            pairing = InterviewPairing(
-                                        first_shift=start_shift,
-                                        second_shift=end_shifts[idx-1]
-                            )
-                            pairing.save()
+                            pairings.append((start_shift, end_shifts[idx-1]))
+            with transaction.atomic():
+                EventShift.create_for_event(electee_event, electee_shifts)
+                EventShift.create_for_event(active_event, active_shifts)
+                InterviewShift.objects.bulk_create([
+                    InterviewShift(
+                            interviewer_shift=active_shift,
+                            interviewee_shift=electee_shift,
+                            term=active_event.term
+                    )
+                    for electee_shift, active_shift in zip(
+                                                    electee_shifts,
+                                                    active_shifts
+                    )
+                ])
+                InterviewPairing.objects.bulk_create([
+                    InterviewPairing(
+                            first_shift=electee_shifts[first],
+                            second_shift=electee_shifts[second]
+                    )
+                    for first, second in pairings
+                ])
 
             request.session['success_message'] = 'Event created successfully'
             active_event.add_event_to_gcal()
@@ -2817,12 +2882,29 @@ def interview_view_electees(request, event_id):
         return get_previous_page(request, alternate='event_cal:index')
     request.session['current_page'] = request.path
     shifts = event.eventshift_set.order_by('start_time')
-    is_two_part = False
-    if shifts[0].pairing_first.exists() or shifts[0].pairing_second.exists():
-        is_two_part = True
+    is_two_part = InterviewPairing.objects.filter(
+                            first_shift__event=event
+    ).exists()
+    interviewer_lookups = [
+        'shift_interviewee__interviewer_shift__event',
+        'shift_interviewee__interviewer_shift__attendees__memberprofile',
+    ]
+    if is_two_part:
         shifts = InterviewPairing.objects.filter(
             first_shift__event=event
-        ).distinct().order_by('first_shift__start_time')
+        ).distinct().order_by('first_shift__start_time').prefetch_related(
+            'first_shift__event',
+            'first_shift__attendees__memberprofile',
+            'second_shift',
+            *(['first_shift__' + lookup for lookup in interviewer_lookups] +
+              ['second_shift__' + lookup for lookup in interviewer_lookups])
+        )
+    else:
+        shifts = shifts.prefetch_related(
+                            'event',
+                            'attendees__memberprofile',
+                            *interviewer_lookups
+        )
     organized_shifts, locations = organize_shifts_interview(shifts, is_two_part)
 
     context_dict = {
@@ -2860,8 +2942,12 @@ def interview_view_actives(request, event_id):
         request.session['error_message'] = messages.NOT_INTERVIEW
         return get_previous_page(request, alternate='event_cal:index')
     request.session['current_page'] = request.path
-    request.session['current_page'] = request.path
-    shifts = event.eventshift_set.order_by('start_time')
+    shifts = event.eventshift_set.order_by('start_time').prefetch_related(
+                    'event',
+                    'attendees__memberprofile',
+                    'shift_interviewer__interviewee_shift__attendees__'
+                    'memberprofile',
+    )
 
     organized_shifts, locations = organize_shifts_interview(shifts, False)
     context_dict = {
@@ -2929,14 +3015,16 @@ def sign_up_paired(request, shift_id):
                       not profile.is_active()):
                     has_error = True
                     ERROR_MSG = SHIFT_ACTIVES_ONLY
-                else:
-                    add_user_to_shift(
+                elif not add_user_to_shift(
                                 request.user.userprofile,
-                                shift.first_shift
-                    )
+                                shift.first_shift):
+                    has_error = True
+                    ERROR_MSG = messages.SHIFT_FULL
+                else:
                     add_user_to_shift(
                                 request.user.userprofile,
-                                shift.second_shift
+                                shift.second_shift,
+                                check_capacity=False
                     )
                     request.session['success_message'] = EVT_SIGNUP_SUCCESS
                     can_bring = event.usercanbringpreferreditem_set.filter(
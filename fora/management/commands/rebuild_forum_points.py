@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from fora.models import ForumUserPoints
+
+
+class Command(BaseCommand):
+    help = ('Recounts the message vote totals and forum points from the '
+            'messages and message points.')
+
+    def handle(self, *args, **options):
+        ForumUserPoints.rebuild()
+        self.stdout.write('Forum points rebuilt.')
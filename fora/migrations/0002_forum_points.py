@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:57
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def count_points(apps, schema_editor):
+    ForumMessage = apps.get_model('fora', 'ForumMessage')
+    ForumUserPoints = apps.get_model('fora', 'ForumUserPoints')
+    MessagePoint = apps.get_model('fora', 'MessagePoint')
+    votes = MessagePoint.objects.values_list(
+                                    'message',
+                                    'plus_point'
+    ).annotate(count=Count('id'))
+    message_votes = {}
+    for message_id, plus_point, count in votes:
+        message_votes.setdefault(message_id, [0, 0])[0 if plus_point else 1] = count
+    for message_id, (upvotes, downvotes) in message_votes.items():
+        ForumMessage.objects.filter(id=message_id).update(
+                    upvotes=upvotes,
+                    downvotes=downvotes,
+                    score=upvotes - downvotes
+        )
+    totals = {}
+
+    def add(member_id, field, amount):
+        member_totals = totals.setdefault(member_id, {})
+        member_totals[field] = member_totals.get(field, 0) + amount
+    messages = ForumMessage.objects.values('creator', 'hidden').annotate(
+                                    count=Count('id'),
+                                    upvote_total=Sum('upvotes'),
+                                    downvote_total=Sum('downvotes')
+    )
+    for row in messages:
+        add(row['creator'], 'downvotes_received', row['downvote_total'])
+        if not row['hidden']:
+            add(row['creator'], 'posts', row['count'])
+            add(row['creator'], 'upvotes_received', row['upvote_total'])
+    downvoters = MessagePoint.objects.filter(
+                                    plus_point=False
+    ).values_list('user').annotate(count=Count('id'))
+    for member_id, count in downvoters:
+        add(member_id, 'downvotes_given', count)
+    ForumUserPoints.objects.bulk_create([
+        ForumUserPoints(member_id=member_id, **member_totals)
+        for member_id, member_totals in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mig_main', '0015_outgoingemail'),
+        ('fora', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForumUserPoints',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='mig_main.MemberProfile')),
+                ('posts', models.IntegerField(default=0)),
+                ('upvotes_received', models.IntegerField(default=0)),
+                ('downvotes_received', models.IntegerField(default=0)),
+                ('downvotes_given', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='forummessage',
+            name='downvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='forummessage',
+            name='upvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_points, migrations.RunPython.noop),
+    ]
@@ -1,32 +1,26 @@
 from math import ceil
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
 from django.core.urlresolvers import reverse
 
 from mig_main.models import MemberProfile
 from mig_main.templatetags.my_markdown import my_markdown
 
+# Everyone starts out with this many forum points.
+FORUM_STARTING_POINTS = 2
 
 # Create your models here.
 def get_user_points(memberprofile):
     """
-    Calculates the points associated with a particular user. This is based
+    Returns the points associated with a particular user. This is based
     on the posts they've created, the number of up and down votes their posts
     have received, and the number of downcvotes they themselves have given.
     """
-    point_objects = MessagePoint.objects.filter(message__creator=memberprofile)
-    plus_points = point_objects.filter(plus_point=True, message__hidden=False)
-    minus_points = point_objects.filter(plus_point=False)
-    votes_count = 2*plus_points.count() - minus_points.count()
-    spent_downvotes = MessagePoint.objects.filter(
-                                user=memberprofile,
-                                plus_point=False
-    ).count()
-    posts_created = ForumMessage.objects.filter(
-                            creator=memberprofile,
-                            hidden=False
-    ).count()
-    return 2 + posts_created + votes_count - spent_downvotes
+    return ForumUserPoints.get_points_by_member([memberprofile.pk]).get(
+                                                        memberprofile.pk,
+                                                        FORUM_STARTING_POINTS
+    )
 
 
 class Forum(models.Model):
@@ -96,38 +90,83 @@ class ForumMessage(models.Model):
     last_modified = models.DateTimeField(auto_now=True)
     score = models.IntegerField(default=0)
     hidden = models.BooleanField(default=False)
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
 
-    def assemble_replies_helper(self, depth):
-        """ Helper function for recursively assembling a dictionary of
-        the replies (and their replies...) to a message.
-
-        Depth is increased in increments of ten as it is used to create
-        the horizontal offset in the page.
+    def save(self, *args, **kwargs):
+        """ Saves the message and keeps its creator's forum points in step
+        with it being posted, hidden or shown again.
         """
+        previous = None
+        if self.pk:
+            previous = ForumMessage.objects.filter(pk=self.pk).values(
+                                                    'hidden',
+                                                    'upvotes'
+            ).first()
+        super(ForumMessage, self).save(*args, **kwargs)
+        if not previous:
+            if not self.hidden:
+                ForumUserPoints.adjust(self.creator_id, posts=1)
+        elif previous['hidden'] != self.hidden:
+            sign = -1 if self.hidden else 1
+            ForumUserPoints.adjust(
+                        self.creator_id,
+                        posts=sign,
+                        upvotes_received=sign * previous['upvotes']
+            )
 
-        output = [
-                    {
-                        'reply': self,
-                        'depth': depth,
-                        'user_points': get_user_points(self.creator),
-                        'comment_points': self.get_net_points()
-                    }
-        ]
-        visible_replies = self.replies.filter(hidden=False)
-        for reply in visible_replies.order_by('time_created'):
-            output += reply.assemble_replies_helper(depth+10)
-        return output
+    def delete(self, *args, **kwargs):
+        """ Deletes the message, along with the points given to it (and the
+        replies to it), taking them back out of the forum points.
+        """
+        for point in MessagePoint.objects.filter(message=self):
+            point.delete()
+        for reply in self.replies.all():
+            reply.delete()
+        if not self.hidden:
+            ForumUserPoints.adjust(self.creator_id, posts=-1)
+        super(ForumMessage, self).delete(*args, **kwargs)
 
     def assemble_replies(self):
         """ Return a dictionary of the nested replies to this message.
+
+        The visible messages of the thread are loaded in one query and the
+        tree is assembled in memory. Depth is increased in increments of ten
+        as it is used to create the horizontal offset in the page.
         """
         if self.hidden:
             return []
-        return self.assemble_replies_helper(0)
+        messages = ForumMessage.objects.filter(
+                            forum_thread_id=self.forum_thread_id,
+                            hidden=False
+        ).select_related('creator').order_by('time_created', 'id')
+        replies = {}
+        for message in messages:
+            replies.setdefault(message.in_reply_to_id, []).append(message)
+        user_points = ForumUserPoints.get_points_by_member(
+                            set(m.creator_id for m in messages)
+        )
+        output = []
+        stack = [(self, 0)]
+        while stack:
+            message, depth = stack.pop()
+            output.append({
+                'reply': message,
+                'depth': depth,
+                'user_points': user_points.get(
+                                    message.creator_id,
+                                    FORUM_STARTING_POINTS
+                ),
+                'comment_points': message.get_net_points()
+            })
+            stack.extend(
+                (reply, depth+10)
+                for reply in reversed(replies.get(message.id, []))
+            )
+        return output
 
     def get_net_points(self):
-        return (self.messagepoint_set.filter(plus_point=True).count() -
-                self.messagepoint_set.filter(plus_point=False).count())
+        return self.score
 
     def get_upvoters(self):
         """ Returns a queryset of those who upvoted the post.
@@ -150,7 +189,184 @@ class ForumMessage(models.Model):
 
 class MessagePoint(models.Model):
     """ An up or downvote on a message.
+
+    Saving or deleting a point updates the message's vote totals and the
+    forum points of the message's creator (and of a downvoter).
     """
     message = models.ForeignKey(ForumMessage)
     user = models.ForeignKey('mig_main.MemberProfile')
     plus_point = models.BooleanField(default=False)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.pk:
+                previous = MessagePoint.objects.get(pk=self.pk)
+                previous.update_totals(-1)
+            super(MessagePoint, self).save(*args, **kwargs)
+            self.update_totals(1)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            self.update_totals(-1)
+            super(MessagePoint, self).delete(*args, **kwargs)
+
+    def update_totals(self, sign):
+        """ Adds the point to (sign 1) or takes it out of (sign -1) the
+        message's totals and the users' forum points.
+        """
+        messages = ForumMessage.objects.filter(id=self.message_id)
+        if self.plus_point:
+            messages.update(
+                        upvotes=F('upvotes') + sign,
+                        score=F('score') + sign
+            )
+            if not self.message.hidden:
+                ForumUserPoints.adjust(
+                            self.message.creator_id,
+                            upvotes_received=sign
+                )
+        else:
+            messages.update(
+                        downvotes=F('downvotes') + sign,
+                        score=F('score') - sign
+            )
+            ForumUserPoints.adjust(
+                        self.message.creator_id,
+                        downvotes_received=sign
+            )
+            ForumUserPoints.adjust(self.user_id, downvotes_given=sign)
+
+    @classmethod
+    def cast_vote(cls, user, message, plus_point):
+        """ Records the user's up (or down) vote on the message, replacing
+        a vote the other way. Returns False if the user had already voted
+        that way.
+
+        The message's vote totals are refreshed afterwards.
+        """
+        with transaction.atomic():
+            existing = list(cls.objects.filter(user=user, message=message))
+            if any(point.plus_point == plus_point for point in existing):
+                return False
+            for point in existing:
+                point.message = message
+                point.delete()
+            cls(user=user, message=message, plus_point=plus_point).save()
+        message.refresh_from_db(fields=['upvotes', 'downvotes', 'score'])
+        return True
+
+    @classmethod
+    def withdraw_vote(cls, user, message, plus_point):
+        """ Removes the user's up (or down) vote on the message, if any.
+
+        The message's vote totals are refreshed afterwards.
+        """
+        with transaction.atomic():
+            for point in cls.objects.filter(
+                                    user=user,
+                                    message=message,
+                                    plus_point=plus_point):
+                point.message = message
+                point.delete()
+        message.refresh_from_db(fields=['upvotes', 'downvotes', 'score'])
+
+
+class ForumUserPoints(models.Model):
+    """ The running totals behind a member's forum points.
+
+    These are kept up to date by the messages and message points as they
+    change, rather than being counted each time the points are shown.
+    """
+    member = models.OneToOneField(
+                        'mig_main.MemberProfile',
+                        primary_key=True
+    )
+    posts = models.IntegerField(default=0)
+    upvotes_received = models.IntegerField(default=0)
+    downvotes_received = models.IntegerField(default=0)
+    downvotes_given = models.IntegerField(default=0)
+
+    def get_points(self):
+        return (FORUM_STARTING_POINTS + self.posts +
+                2*self.upvotes_received - self.downvotes_received -
+                self.downvotes_given)
+
+    @classmethod
+    def get_points_by_member(cls, member_ids):
+        """ Returns a dictionary of the forum points of the given members,
+        leaving out those without any forum activity.
+        """
+        return {
+            user_points.member_id: user_points.get_points()
+            for user_points in cls.objects.filter(member_id__in=member_ids)
+        }
+
+    @classmethod
+    def adjust(cls, member_id, **changes):
+        """ Adds the changes to the member's totals, starting them if need
+        be.
+        """
+        updates = {
+            field: F(field) + change
+            for field, change in changes.iteritems()
+        }
+        if cls.objects.filter(member_id=member_id).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(member_id=member_id, **changes)
+        except IntegrityError:
+            cls.objects.filter(member_id=member_id).update(**updates)
+
+    @classmethod
+    def rebuild(cls):
+        """ Recounts the message vote totals and every member's forum points
+        from the messages and message points.
+        """
+        with transaction.atomic():
+            ForumMessage.objects.update(upvotes=0, downvotes=0, score=0)
+            cls.objects.all().delete()
+            votes = MessagePoint.objects.values_list(
+                                    'message',
+                                    'plus_point'
+            ).annotate(count=Count('id'))
+            message_votes = {}
+            for message_id, plus_point, count in votes:
+                message_votes.setdefault(
+                            message_id,
+                            [0, 0]
+                )[0 if plus_point else 1] = count
+            for message_id, (upvotes, downvotes) in message_votes.iteritems():
+                ForumMessage.objects.filter(id=message_id).update(
+                            upvotes=upvotes,
+                            downvotes=downvotes,
+                            score=upvotes - downvotes
+                )
+            totals = {}
+
+            def add(member_id, field, amount):
+                member_totals = totals.setdefault(member_id, {})
+                member_totals[field] = member_totals.get(field, 0) + amount
+            messages = ForumMessage.objects.values(
+                                    'creator',
+                                    'hidden'
+            ).annotate(
+                        count=Count('id'),
+                        upvote_total=Sum('upvotes'),
+                        downvote_total=Sum('downvotes')
+            )
+            for row in messages:
+                creator = row['creator']
+                add(creator, 'downvotes_received', row['downvote_total'])
+                if not row['hidden']:
+                    add(creator, 'posts', row['count'])
+                    add(creator, 'upvotes_received', row['upvote_total'])
+            downvoters = MessagePoint.objects.filter(
+                                    plus_point=False
+            ).values_list('user').annotate(count=Count('id'))
+            for member_id, count in downvoters:
+                add(member_id, 'downvotes_given', count)
+            cls.objects.bulk_create([
+                cls(member_id=member_id, **member_totals)
+                for member_id, member_totals in totals.iteritems()
+            ])
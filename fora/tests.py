@@ -1,3 +1,74 @@
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
 from django.test import TestCase
 
-# Create your tests here.
+from fora.models import Forum, ForumMessage
+from mig_main.models import (
+            AcademicTerm,
+            MemberProfile,
+            ShirtSize,
+            Standing,
+            Status,
+            TBPChapter,
+)
+from mig_main.tests.factories import AcademicTermFactory, TBPChapterFactory,\
+                            StandingFactory, StatusFactory, ShirtSizeFactory,\
+                            CurrentTermFactory, MemberProfileFactory
+
+
+def setUpModule():
+    AcademicTermFactory.create_batch(18)
+    TBPChapterFactory.create_batch(3)
+    StandingFactory.create_batch(3)
+    StatusFactory.create_batch(2)
+    ShirtSizeFactory.create_batch(3)
+    CurrentTermFactory()
+
+
+def tearDownModule():
+    MemberProfile.objects.all().delete()
+    AcademicTerm.objects.all().delete()
+    ShirtSize.objects.all().delete()
+    Status.objects.all().delete()
+    Standing.objects.all().delete()
+    TBPChapter.objects.all().delete()
+    User.objects.all().delete()
+
+
+class AddCommentTestCase(TestCase):
+    def setUp(self):
+        self.member = MemberProfileFactory()
+        self.forum = Forum.objects.create(name='General')
+        self.client.force_login(self.member.user)
+
+    def post_comment(self, url, title):
+        return self.client.post(
+                    url,
+                    {
+                        'title': title,
+                        'content': 'Some content',
+                        'upvotes': 50,
+                        'downvotes': 3,
+                    }
+        )
+
+    def test_posted_votes_are_ignored(self):
+        response = self.post_comment(
+                        reverse('fora:create_thread', args=[self.forum.id]),
+                        'New thread'
+        )
+        self.assertEqual(response.status_code, 302)
+        thread_post = ForumMessage.objects.get(title='New thread')
+        self.assertEqual(thread_post.upvotes, 0)
+        self.assertEqual(thread_post.downvotes, 0)
+
+        response = self.post_comment(
+                        reverse('fora:add_comment',
+                                args=[self.forum.id, thread_post.id]),
+                        'A reply'
+        )
+        self.assertEqual(response.status_code, 302)
+        reply = ForumMessage.objects.get(title='A reply')
+        self.assertEqual(reply.in_reply_to, thread_post)
+        self.assertEqual(reply.upvotes, 0)
+        self.assertEqual(reply.downvotes, 0)
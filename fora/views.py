@@ -92,13 +92,30 @@ def view_thread(request, thread_id):
                         'time_created',
                         'last_modified',
                         'score',
-                        'hidden'
+                        'hidden',
+                        'upvotes',
+                        'downvotes'
                     )
     )
+    upvoted_ids = set()
+    downvoted_ids = set()
+    if (active_thread and hasattr(request.user, 'userprofile') and
+       request.user.userprofile.is_member()):
+        votes = MessagePoint.objects.filter(
+                        user_id=request.user.userprofile.uniqname,
+                        message__forum_thread=active_thread
+        ).values_list('message_id', 'plus_point')
+        for message_id, plus_point in votes:
+            if plus_point:
+                upvoted_ids.add(message_id)
+            else:
+                downvoted_ids.add(message_id)
     context_dict = {
             'fora': fora,
             'active_thread': active_thread,
             'form': reply_form(),
+            'upvoted_ids': upvoted_ids,
+            'downvoted_ids': downvoted_ids,
         }
     context_dict.update(get_common_context(request))
     context_dict.update(get_permissions(request.user))
@@ -191,7 +208,7 @@ def upvote_comment(request, comment_id):
     message = get_object_or_404(ForumMessage, id=comment_id)
     profile = request.user.userprofile.memberprofile
 
-    if profile in message.get_upvoters():
+    if not MessagePoint.cast_vote(profile, message, True):
         request.session['error_message'] = 'You have already upvoted this post'
         return {
             'fragments': {
@@ -202,14 +219,6 @@ def upvote_comment(request, comment_id):
     ''' % (request.session.pop('error_message'))
             }
         }
-    existing_downvotes = MessagePoint.objects.filter(
-                                    user=profile,
-                                    message=message,
-                                    plus_point=False
-    )
-    existing_downvotes.delete()
-    upvote = MessagePoint(user=profile, message=message, plus_point=True)
-    upvote.save()
     return {
             'fragments': {
                     '#upvote'+comment_id: r'''
@@ -261,12 +270,7 @@ def withdraw_upvote(request, comment_id):
         }
     message = get_object_or_404(ForumMessage, id=comment_id)
     profile = request.user.userprofile.memberprofile
-    existing_upvotes = MessagePoint.objects.filter(
-                            user=profile,
-                            message=message,
-                            plus_point=True
-    )
-    existing_upvotes.delete()
+    MessagePoint.withdraw_vote(profile, message, True)
 
     return {
         'fragments': {
@@ -318,12 +322,7 @@ def withdraw_downvote(request, comment_id):
         }
     message = get_object_or_404(ForumMessage, id=comment_id)
     profile = request.user.userprofile.memberprofile
-    existing_downvotes = MessagePoint.objects.filter(
-                                user=profile,
-                                message=message,
-                                plus_point=False
-    )
-    existing_downvotes.delete()
+    MessagePoint.withdraw_vote(profile, message, False)
 
     return {
         'fragments': {
@@ -386,7 +385,7 @@ def downvote_comment(request, comment_id):
     ''' % (request.session.pop('error_message'))
             }
         }
-    if profile in message.get_downvoters():
+    if not MessagePoint.cast_vote(profile, message, False):
         request.session['error_message'] = ('You have already downvoted '
                                             'this post')
         return {
@@ -398,18 +397,6 @@ def downvote_comment(request, comment_id):
     ''' % (request.session.pop('error_message'))
             }
         }
-    existing_upvotes = MessagePoint.objects.filter(
-                            user=profile,
-                            message=message,
-                            plus_point=True
-    )
-    existing_upvotes.delete()
-    downvote = MessagePoint(
-                    user=profile,
-                    message=message,
-                    plus_point=False
-    )
-    downvote.save()
     return {
         'fragments': {
             '#downvote'+comment_id: r'''
@@ -512,7 +499,9 @@ def add_comment(request, forum_id, reply_to_id):
                             'time_created',
                             'last_modified',
                             'score',
-                            'hidden'
+                            'hidden',
+                            'upvotes',
+                            'downvotes'
                         )
     )
     form = AddCommentForm(request.POST or None)
@@ -238,7 +238,11 @@ class BaseProjectReportHeaderForm(forms.ModelForm):
             'finished_processing',
             'finished_photos',
             'last_processed',
-            'last_photo'
+            'last_photo',
+            'compilation_status',
+            'compilation_started',
+            'compilation_finished',
+            'compilation_errors',
         ]
 
 
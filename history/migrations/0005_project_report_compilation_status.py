@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:28
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('history', '0004_auto_20161020_1929'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectreportheader',
+            name='compilation_errors',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='projectreportheader',
+            name='compilation_finished',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='projectreportheader',
+            name='compilation_started',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='projectreportheader',
+            name='compilation_status',
+            field=models.CharField(choices=[(b'N', b'Not compiled'), (b'R', b'Compiling'), (b'D', b'Compiled'), (b'F', b'Compiled with errors')], default=b'N', max_length=1),
+        ),
+    ]
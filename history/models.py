@@ -1,17 +1,22 @@
+import hashlib
 import json
 import os
 import sys
 import subprocess
 from datetime import date, timedelta
 from decimal import Decimal
+from multiprocessing.pool import ThreadPool
+from threading import Thread
 from numpy import std, median, mean
 import tweepy
 
+from django.core.cache import cache
 from django.core.files import File
 from django.core.urlresolvers import reverse
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models
 from django.db.models import Q
+from django.utils import timezone
 from localflavor.us.models import PhoneNumberField
 from stdimage import StdImageField
 
@@ -131,6 +136,42 @@ large number of members.
 \newevenside
 '''
 
+TEX_DIRECTORY = '/tmp/'
+TEX_COMMAND = 'xelatex -interaction=nonstopmode %(file_name)s'
+# How many documents are typeset at once.
+TEX_WORKERS = 4
+
+
+def run_xelatex(file_name):
+    """ Typesets the .tex file with xelatex, running it a second time if the
+    first run succeeds so that references and the table of contents are
+    filled in. Returns the return code and the output of the last run.
+
+    This does not touch the database, so it can be run from any thread.
+    """
+    cmd = (TEX_COMMAND % {'file_name': file_name}).split(' ')
+    for run in range(2):
+        p = subprocess.Popen(
+                        cmd,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        cwd=TEX_DIRECTORY
+        )
+        p_data = p.communicate()
+        if p.returncode != 0:
+            break
+    return p.returncode, p_data[0]
+
+
+def get_tex_error(report, returncode, output):
+    error_ind = output.find('!')
+    err_txt = output[(error_ind-100):(error_ind+250)]
+    return {
+        'report': report,
+        'error_code': returncode,
+        'err': '...' + err_txt + '...'
+    }
+
 
 def pack_officers_for_term(term):
     """
@@ -484,6 +525,31 @@ class CompiledProjectReport(models.Model):
                     ' Project Reports for ' +
                     unicode(self.associated_officer))
 
+    @classmethod
+    def save_compiled_pdf(cls, file_name, term, officer=None):
+        """ Stores the compiled pdf as the term's project reports for the
+        officer, or as the term's full project report if no officer is given,
+        replacing any previous version.
+        """
+        is_full = officer is None
+        comp_proj = cls.objects.filter(term=term, is_full=is_full)
+        if not is_full:
+            comp_proj = comp_proj.filter(associated_officer=officer)
+        if comp_proj.exists():
+            c = comp_proj[0]
+        else:
+            if is_full:
+                officer = OfficerPosition.objects.get(name='Secretary')
+            c = cls(
+                    term=term,
+                    associated_officer=officer,
+                    is_full=is_full
+            )
+            c.save()
+        new_f = open(file_name, 'r')
+        c.pdf_file.save('compiled_report_%d.pdf' % c.id, File(new_f), True)
+        new_f.close()
+
 
 class NonEventProject(models.Model):
     """
@@ -729,15 +795,93 @@ class ProjectReport(models.Model):
         else:
             return None
 
+    def get_tex_hash(self):
+        """ Returns a hash of everything that goes into the report's LaTeX:
+        the report itself, its events or NonEventProjects, their shifts,
+        leaders and attendees (and which shifts the attendees are on, which
+        sets non-members' hours), and the photos.
+
+        Gathering this takes a handful of queries, far fewer than rendering
+        the report does.
+        """
+        events = self.calendarevent_set.all()
+        neps = self.noneventproject_set.all()
+        member_fields = ('uniqname', 'first_name', 'last_name',
+                         'nickname', 'maiden_name')
+        content = [
+            [unicode(getattr(self, field.attname))
+             for field in self._meta.fields],
+            list(events.order_by('id').values_list(
+                            'id',
+                            'description',
+                            'event_type'
+            )),
+            list(EventShift.objects.filter(event__in=events).order_by(
+                            'id').values_list('id', 'start_time', 'end_time')),
+            list(EventShift.attendees.through.objects.filter(
+                            eventshift__event__in=events
+            ).order_by('eventshift', 'userprofile').values_list(
+                            'eventshift',
+                            'userprofile'
+            )),
+            list(MemberProfile.objects.filter(
+                            event_leader__in=events
+            ).order_by('uniqname').values_list('init_term', *member_fields)),
+            list(ProgressItem.objects.filter(
+                            related_event__in=events
+            ).order_by('id').values_list(
+                            'related_event',
+                            'amount_completed',
+                            'member__init_term',
+                            *['member__' + field for field in member_fields]
+            )),
+            list(UserProfile.objects.filter(
+                            event_attendee__event__in=events
+            ).order_by('uniqname').values_list(*member_fields).distinct()),
+            list(neps.order_by('id').values_list(
+                            'id',
+                            'description',
+                            'start_date',
+                            'end_date'
+            )),
+            list(MemberProfile.objects.filter(
+                            non_event_project_leader__in=neps
+            ).order_by('uniqname').values_list('init_term', *member_fields)),
+            list(UserProfile.objects.filter(
+                            noneventprojectparticipant__project__in=neps
+            ).order_by('uniqname').values_list(
+                            'noneventprojectparticipant__hours',
+                            *member_fields
+            )),
+            list(EventPhoto.objects.filter(project_report=self).order_by(
+                            'id').values_list('id', 'photo', 'caption')),
+        ]
+        return hashlib.sha1(unicode(content).encode('utf8')).hexdigest()
+
+    def get_tex_fragment(self):
+        """ Returns the report's LaTeX, as print_to_tex does, rendering and
+        escaping it only if its contents changed since it was last rendered.
+        """
+        cache_key = 'PROJECT_REPORT_TEX_%d_%s' % (self.id, self.get_tex_hash())
+        tex_code = cache.get(cache_key, None)
+        if tex_code is None:
+            tex_code = self.print_to_tex()
+            if not (tex_code == 0 or tex_code == -1):
+                cache.set(cache_key, tex_code, None)
+        return tex_code
+
+    def get_tex_file_name(self):
+        return '%sproject_report%d.tex' % (TEX_DIRECTORY, self.id)
+
     def write_tex_file(self):
         """
         Writes the project report to a .tex file.
         """
-        f = open('/tmp/project_report%d.tex' % (self.id), 'w')
-        tex_code = self.print_to_tex()
+        tex_code = self.get_tex_fragment()
         if tex_code == 0 or tex_code == -1:
             sys.stderr.write('Error printing project report: %d (Error %d)'% (self.id, tex_code))
             return -1
+        f = open(self.get_tex_file_name(), 'w')
         f.write(tex_code.encode('utf8'))
         f.close()
 
@@ -1088,7 +1232,20 @@ class ProjectReportHeader(models.Model):
 
     It contains the information needed to compile the physical project report
     information from the individual event summaries.
+
+    Compiling runs in the background (see start_compilation); its progress is
+    kept here so that any web server process can report on it.
     """
+    COMPILATION_STATUS_CHOICES = [
+        ('N', 'Not compiled'),
+        ('R', 'Compiling'),
+        ('D', 'Compiled'),
+        ('F', 'Compiled with errors'),
+    ]
+    # A compilation still marked as running after this long is assumed to
+    # have died with its server process and may be started again.
+    COMPILATION_TIMEOUT = timedelta(hours=1)
+
     executive_summary = models.TextField()
     preparer = models.ForeignKey('mig_main.MemberProfile')
     preparer_title = models.CharField(max_length=128)
@@ -1099,16 +1256,86 @@ class ProjectReportHeader(models.Model):
     last_processed = models.PositiveIntegerField(default=0)
     last_photo = models.PositiveIntegerField(default=0)
 
+    compilation_status = models.CharField(
+                            max_length=1,
+                            choices=COMPILATION_STATUS_CHOICES,
+                            default='N'
+    )
+    compilation_started = models.DateTimeField(null=True, blank=True)
+    compilation_finished = models.DateTimeField(null=True, blank=True)
+    compilation_errors = models.TextField(blank=True)
+
     def get_project_reports(self):
         return ProjectReport.objects.filter(term__in=self.terms.all())
 
+    def is_compiling(self):
+        return (self.compilation_status == 'R' and
+                self.compilation_started > (timezone.now() -
+                                            self.COMPILATION_TIMEOUT))
+
+    def get_compilation_errors(self):
+        """ Returns the errors from the last compilation as a list of
+        dictionaries with the report, error code and error text.
+        """
+        if not self.compilation_errors:
+            return []
+        return json.loads(self.compilation_errors)
+
+    def start_compilation(self):
+        """ Starts compiling the project reports in a background thread and
+        returns True, or returns False if they are already being compiled.
+
+        The status is claimed with a single conditional update so that two
+        clicks on the button can't start two compilations.
+        """
+        now = timezone.now()
+        not_running = (~Q(compilation_status='R') |
+                       Q(compilation_started__lt=now-self.COMPILATION_TIMEOUT))
+        started = ProjectReportHeader.objects.filter(
+                                        not_running,
+                                        id=self.id
+        ).update(
+                compilation_status='R',
+                compilation_started=now,
+                compilation_finished=None,
+                compilation_errors=''
+        )
+        if not started:
+            return False
+        thread = Thread(target=self.compile_reports)
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def compile_reports(self):
+        """ Compiles the project reports and records the outcome. This is what
+        the background thread runs.
+        """
+        try:
+            errors = self.write_tex_files()
+        except Exception, err:
+            errors = [{'report': 'Full', 'error_code': -1, 'err': str(err)}]
+        try:
+            ProjectReportHeader.objects.filter(id=self.id).update(
+                    compilation_status='F' if errors else 'D',
+                    compilation_finished=timezone.now(),
+                    compilation_errors=json.dumps(errors)
+            )
+        finally:
+            # The thread has its own database connection.
+            connection.close()
+
     def write_tex_files(self):
-        f = open('/tmp/Project_Report_Final_%d.tex' % (self.id), 'w')
+        """ Writes the full report and the per-officer summaries as .tex
+        files, typesets them and saves the resulting pdfs as
+        CompiledProjectReports. Returns the errors from any that failed.
+
+        Each project report's LaTeX is only rendered again if the report
+        changed, and the documents are typeset TEX_WORKERS at a time.
+        """
         errors = []
         terms = self.terms.all().order_by('year').values('year').distinct()
         years = '--'.join([str(term['year']) for term in terms])
-        print years
-        print self.preparer_title
         output_string = RAW_HEADER_STRING % {
             'exec_summary': self.executive_summary,
             'preparer_name': self.preparer.get_firstlast_name(),
@@ -1143,7 +1370,7 @@ class ProjectReportHeader(models.Model):
         projects = self.get_project_reports().order_by(
                                                 'target_audience',
                                                 'planning_start_date'
-        )
+        ).select_related('term')
         for project in projects.distinct():
             has_events = project.calendarevent_set.exists()
             has_nep = project.noneventproject_set.exists()
@@ -1155,143 +1382,68 @@ class ProjectReportHeader(models.Model):
                 ''' % (previous_category)
             project.write_tex_file()
             asc_off = project.get_associated_officer()
-            if asc_off not in officer_files:
-                officer_files[asc_off] = {}
-            if project.term not in officer_files[asc_off]:
-                tmp_file = open(
-                        '/tmp/officer_proj_report_%s_%s.tex' % (
-                                        project.get_associated_officer().id,
-                                        project.term.id
-                        ),
-                        'w'
-                )
-                officer_files[asc_off][project.term] = tmp_file
-                header_string = officer_sheet_header % {
+            if (asc_off, project.term) not in officer_files:
+                officer_files[(asc_off, project.term)] = [
+                    officer_sheet_header % {
                             'officer': asc_off.name,
                             'term': unicode(project.term)
-                }
-                officer_files[asc_off][project.term].write(
-                                            header_string.encode('utf8')
-                )
-            officer_files[asc_off][project.term].write((
-                r'''\input{/tmp/project_report%d.tex}%% %s
+                    }
+                ]
+            officer_files[(asc_off, project.term)].append(
+                r'''\input{%s}%% %s
                 \FloatBarrier\newpage\clearpage
-                ''' % (project.id, project.name)).encode('utf8'))
+                ''' % (project.get_tex_file_name(), project.name))
 
-            output_string += r'''\input{/tmp/project_report%d.tex}%% %s
-            \FloatBarrier\newpage\clearpage''' % (project.id, project.name)
+            output_string += r'''\input{%s}%% %s
+            \FloatBarrier\newpage\clearpage''' % (
+                                                project.get_tex_file_name(),
+                                                project.name
+            )
         output_string += r'''\end{document}'''
-        cmd = 'xelatex -interaction=nonstopmode %(file_name)s'
-        current_dir = os.getcwd()
-        os.chdir('/tmp/')
-        for officer in officer_files:
-            for term in officer_files[officer]:
-                end_doc = r'''\end{document}'''.encode('utf8')
-                officer_files[officer][term].write(end_doc)
-                officer_files[officer][term].close()
-                new_cmd = cmd % {
-                    'file_name': '/tmp/officer_proj_report_%d_%d.tex' % (
-                                        officer.id,
-                                        term.id
-                    )
-                }
-                print 'executing: ' + new_cmd
-                p = subprocess.Popen(
-                                new_cmd.split(' '),
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE
-                )
-                p_data = p.communicate()
-                if p.returncode == 0:
-                    p = subprocess.Popen(
-                                    new_cmd.split(' '),
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE
-                    )
-                    p_data = p.communicate()
-                    print 'officer compilation successful'
-                    comp_proj = CompiledProjectReport.objects.filter(
-                                    term=term,
-                                    associated_officer=officer,
-                                    is_full=False,
-                    )
-                    if comp_proj.exists():
-                        c = CompiledProjectReport.objects.get(
-                                    term=term,
-                                    associated_officer=officer,
-                                    is_full=False
-                        )
-                    else:
-                        c = CompiledProjectReport(
-                                term=term,
-                                associated_officer=officer,
-                                is_full=False
-                        )
-                        c.save()
-                    new_f = open(
-                            './officer_proj_report_%d_%d.pdf' % (officer.id,
-                                                                 term.id),
-                            'r'
-                    )
-                    c.pdf_file.save('compiled_report_%d.pdf' % c.id,
-                                    File(new_f),
-                                    True
-                                    )
-                else:
-                    ind_error = {
-                        'report': officer.name,
-                        'error_code': p.returncode
-                    }
-                    error_ind = p_data[0].find('!')
-                    err_txt = p_data[0][(error_ind-100):(error_ind+250)]
-                    ind_error['err'] = '...' + err_txt + '...'
-                    errors.append(ind_error)
-
-        f.write(output_string.encode('utf8'))
-        f.close()
-        new_cmd = cmd % {
-                    'file_name': '/tmp/Project_Report_Final_%d.tex' % (self.id)
-        }
-        p = subprocess.Popen(
-                        new_cmd.split(' '),
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE
-        )
-        p_data = p.communicate()
-        if p.returncode == 0:
-            p = subprocess.Popen(
-                            new_cmd.split(' '),
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE
+        documents = []
+        for (officer, term), officer_strings in officer_files.iteritems():
+            officer_strings.append(r'''\end{document}''')
+            documents.append((
+                    officer,
+                    term,
+                    'officer_proj_report_%d_%d' % (officer.id, term.id),
+                    ''.join(officer_strings)
+            ))
+        documents.append((
+                None,
+                max(self.terms.all()),
+                'Project_Report_Final_%d' % (self.id),
+                output_string
+        ))
+        for officer, term, name, tex_code in documents:
+            f = open(TEX_DIRECTORY + name + '.tex', 'w')
+            f.write(tex_code.encode('utf8'))
+            f.close()
+        pool = ThreadPool(TEX_WORKERS)
+        try:
+            results = pool.map(
+                    run_xelatex,
+                    [TEX_DIRECTORY + document[2] + '.tex'
+                     for document in documents]
             )
-            p.communicate()
-            print 'full compilation successful'
-            comp_proj = CompiledProjectReport.objects.filter(
-                                term=max(self.terms.all()),
-                                is_full=True
+        finally:
+            pool.close()
+            pool.join()
+        for (officer, term, name, tex_code), result in zip(documents,
+                                                           results):
+            returncode, output = result
+            if returncode != 0:
+                errors.append(get_tex_error(
+                        officer.name if officer else 'Full',
+                        returncode,
+                        output
+                ))
+                continue
+            CompiledProjectReport.save_compiled_pdf(
+                        TEX_DIRECTORY + name + '.pdf',
+                        term,
+                        officer
             )
-            if comp_proj.exists():
-                c = CompiledProjectReport.objects.get(
-                            term=max(self.terms.all()),
-                            is_full=True
-                )
-            else:
-                secretary = OfficerPosition.objects.get(name='Secretary')
-                c = CompiledProjectReport(
-                            term=max(self.terms.all()),
-                            is_full=True,
-                            associated_officer=secretary
-                )
-                c.save()
-            new_f = open('./Project_Report_Final_%d.pdf' % (self.id), 'r')
-            c.pdf_file.save('compiled_report_%d.pdf' % c.id, File(new_f), True)
-        else:
-            ind_error = {'report': 'Full', 'error_code': p.returncode}
-            error_ind = p_data[0].find('!')
-            err_txt = p_data[0][(error_ind-100):(error_ind+250)]
-            ind_error['err'] = '...' + err_txt + '...'
-            errors.append(ind_error)
-        os.chdir(current_dir)
         return errors
 
 
@@ -34,6 +34,9 @@ urlpatterns = [
     url(r'^compile_reports/(?P<prh_id>\d+)/$',
         views.compile_project_reports,
         name='compile_project_reports'),
+    url(r'^compile_reports/(?P<prh_id>\d+)/status/$',
+        views.get_compilation_status,
+        name='get_compilation_status'),
     url(r'^edit_stories/$',
         views.edit_articles,
         name='edit_articles'),
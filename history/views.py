@@ -8,6 +8,8 @@ from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.template import loader
 
+from django_ajax.decorators import ajax
+
 from history.forms import (
             ArticleForm,
             WebArticleForm,
@@ -536,16 +538,33 @@ def process_project_report_photos(request, prh_id, pr_id):
 
 
 def compile_project_reports(request, prh_id):
-    """ Runs the actual compilation of the project reports. Generates a pdf.
+    """ Starts compiling the project reports into pdfs in the background. The
+    compilation manager shows how it is going.
     """
     if not Permissions.can_process_project_reports(request.user):
         raise PermissionDenied()
     prh = get_object_or_404(ProjectReportHeader, id=prh_id)
-    errors = prh.write_tex_files()
-    if errors:
-        error_message = 'The following reports had the following error codes:'
-        for error in errors:
-            error_message = (error_message + '\n' +
-                             error['report'] + ': %d' % (error['error_code']))
-        request.session['error_message'] = unicode(errors)
+    if request.method == 'POST':
+        if prh.start_compilation():
+            request.session['success_message'] = ('Compiling the project '
+                                                  'reports, this takes a few '
+                                                  'minutes.')
+        else:
+            request.session['warning_message'] = ('The project reports are '
+                                                  'already being compiled.')
     return redirect('history:process_project_report_compilation')
+
+
+@ajax
+def get_compilation_status(request, prh_id):
+    if not Permissions.can_process_project_reports(request.user):
+        return {}
+    prh = get_object_or_404(ProjectReportHeader, id=prh_id)
+    return {
+        'fragments': {
+            '#compilation-status-%d' % (prh.id): loader.render_to_string(
+                                'history/project_report_compilation_status.html',
+                                {'pr': prh}
+            )
+        }
+    }
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mig_main', '0015_outgoingemail'),
+        ('event_cal', '0024_googlecalendarchange'),
+        ('member_resources', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuorumMember',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active', models.CharField(choices=[(b'Yes', b'Yes'), (b'If present', b'If present'), (b'Confirm Manually', b'Confirm Manually'), (b'No', b'No'), (b'Electee', b'Electee')], max_length=16)),
+                ('alumni', models.CharField(choices=[(b'Yes', b'Yes'), (b'Maybe', b'Maybe'), (b'No', b'No')], max_length=8)),
+                ('present', models.BooleanField(default=False)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mig_main.MemberProfile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuorumTracker',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_elections', models.BooleanField(default=False)),
+                ('time_started', models.DateTimeField(auto_now_add=True)),
+                ('num_actives', models.PositiveIntegerField(default=0)),
+                ('num_actives_present', models.PositiveIntegerField(default=0)),
+                ('num_present', models.PositiveIntegerField(default=0)),
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='event_cal.CalendarEvent')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='quorummember',
+            name='tracker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='member_resources.QuorumTracker'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='quorummember',
+            unique_together=set([('tracker', 'member')]),
+        ),
+    ]
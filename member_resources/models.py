@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 
 from django.core.validators import RegexValidator
+
+from mig_main.models import invalidate_membership
 # Create your models here
 
 class MemberList(models.Model):
@@ -12,6 +15,14 @@ class MemberList(models.Model):
                                 message="Uniqnames must be 3-8 characters, all letters")])
     def __unicode__(self):
         return self.uniqname
+
+    def save(self, *args, **kwargs):
+        super(MemberList, self).save(*args, **kwargs)
+        invalidate_membership()
+
+    def delete(self, *args, **kwargs):
+        super(MemberList, self).delete(*args, **kwargs)
+        invalidate_membership()
                                 
 class ActiveList(MemberList):
     pass
@@ -24,3 +35,83 @@ class UndergradElecteeList(MemberList):
 
 class ProjectLeaderList(models.Model):
     member_profile = models.ForeignKey('mig_main.MemberProfile')
+
+
+QUORUM_ACTIVE_CHOICES = (
+    ('Yes', 'Yes'),
+    ('If present', 'If present'),
+    ('Confirm Manually', 'Confirm Manually'),
+    ('No', 'No'),
+    ('Electee', 'Electee'),
+)
+QUORUM_ALUMNI_CHOICES = (
+    ('Yes', 'Yes'),
+    ('Maybe', 'Maybe'),
+    ('No', 'No'),
+)
+
+
+class QuorumTracker(models.Model):
+    """ The eligible voters for a voting meeting, computed once when the
+    meeting starts, with running counts that are updated as members sign in.
+    """
+    event = models.OneToOneField('event_cal.CalendarEvent')
+    is_elections = models.BooleanField(default=False)
+    time_started = models.DateTimeField(auto_now_add=True)
+    # Members who count toward quorum: 'Yes' actives, plus 'If present'
+    # actives once they sign in.
+    num_actives = models.PositiveIntegerField(default=0)
+    num_actives_present = models.PositiveIntegerField(default=0)
+    num_present = models.PositiveIntegerField(default=0)
+
+    def __unicode__(self):
+        return unicode(self.event)
+
+    def get_counts(self):
+        return {
+            'num_actives': self.num_actives,
+            'num_actives_present': self.num_actives_present,
+            'num_present': self.num_present,
+            'quorum': self.num_actives/2 + 1,
+        }
+
+    @classmethod
+    def record_sign_in(cls, event_id, uniqname):
+        """ Marks the member present at the event's meeting and updates the
+        counts, if the meeting is being tracked. Returns whether the member
+        was newly marked present.
+
+        The update from absent to present is what guards the counts, so
+        repeated or concurrent sign-ins are only counted once.
+        """
+        with transaction.atomic():
+            quorum_members = QuorumMember.objects.filter(
+                                    tracker__event_id=event_id,
+                                    member_id=uniqname,
+            )
+            row = quorum_members.values('tracker_id', 'active').first()
+            if not row:
+                return False
+            if not quorum_members.filter(present=False).update(present=True):
+                return False
+            changes = {'num_present': F('num_present') + 1}
+            if row['active'] in ('Yes', 'If present'):
+                changes['num_actives_present'] = F('num_actives_present') + 1
+            if row['active'] == 'If present':
+                changes['num_actives'] = F('num_actives') + 1
+            cls.objects.filter(id=row['tracker_id']).update(**changes)
+        return True
+
+
+class QuorumMember(models.Model):
+    tracker = models.ForeignKey(QuorumTracker)
+    member = models.ForeignKey('mig_main.MemberProfile')
+    active = models.CharField(max_length=16, choices=QUORUM_ACTIVE_CHOICES)
+    alumni = models.CharField(max_length=8, choices=QUORUM_ALUMNI_CHOICES)
+    present = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('tracker', 'member')
+
+    def __unicode__(self):
+        return unicode(self.member)
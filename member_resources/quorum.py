@@ -2,35 +2,13 @@ from time import sleep
 
 from django.core.mail import send_mail
 from datetime import date
+from django.db import transaction
 from django.db.models import Q
-from django.http import HttpResponse
 from django.utils import timezone
-from history.models import Distinction, Officer
-from requirements.models import (
-                    ProgressItem,
-                    DistinctionType,
-                    Requirement,
-                    EventCategory
-)
+from member_resources.models import QuorumMember, QuorumTracker
+from requirements.models import ProgressItem, DistinctionType
 from mig_main.models import AcademicTerm, MemberProfile
-from mig_main.utility import UnicodeWriter
-
-
-def get_active_members(term):
-    members = MemberProfile.get_actives()
-    terms = [term, term.get_previous_full_term()]
-    officer_terms = Officer.objects.filter(term__in=[term])
-    distinctions = Distinction.objects.filter(term__in=terms)
-    query_active_status = Q(distinction__in=distinctions)
-    query_initiated_last_term = Q(init_term=term.get_previous_full_term())
-    query_officer = Q(officer__in=officer_terms)
-    query_alumni = (Q(standing__name='Alumni') |
-                    Q(expect_grad_date__lt=date.today()))
-    query = query_officer | (
-            (query_active_status | query_initiated_last_term) & ~query_alumni
-    )
-
-    return members.filter(query).distinct()
+from mig_main.utility import get_csv_response, iterate_in_chunks
 
 
 def get_members_who_graduated():
@@ -39,170 +17,243 @@ def get_members_who_graduated():
     return members.filter(expect_grad_date__lt=date.today()).distinct()
 
 
-def get_active_members_who_came_to_something(term):
-    members = get_active_members(term)
-    progress_items = ProgressItem.objects.filter(
-                                    term=term,
-                                    event_type__name='Meeting Attendance'
-    )
-    return members.filter(progressitem__in=progress_items).distinct()
+def get_uniqnames(queryset):
+    return set(queryset.values_list('uniqname', flat=True))
+
 
+def get_status_sets(term, is_last_voting_meeting=False):
+    """ Returns a dictionary of the sets of uniqnames that determine the
+    active status of members for taking quorum:
 
-def get_active_members_only_if_they_come(term, is_last_voting_meeting=False):
+    'active' -- officers this term, and non-alumni with a distinction from
+    this or last term or who were initiated last term.
+    'actual_active' -- the active members who have come to a meeting this
+    term.
+    'potential_active' -- the members who will be active if they come to
+    the meeting: actives who have not yet come to one, and inactives for
+    whom the meeting would complete the Active distinction.
+    'graduated' -- non-alumni whose graduation date has passed.
+
+    Each underlying condition is a single query over the actives, the rest
+    is set arithmetic.
+    """
     members = MemberProfile.get_actives()
-    terms = [term, term.get_previous_full_term()]
-    officer_terms = Officer.objects.filter(term__in=[term])
-    distinctions = Distinction.objects.filter(term__in=terms)
-    query_active_status = Q(distinction__in=distinctions)
-    query_initiated_last_term = Q(init_term=term.get_previous_full_term())
-    query_officer = Q(officer__in=officer_terms)
-    query_alumni = (Q(standing__name='Alumni') |
-                    Q(expect_grad_date__lt=date.today()))
-    query_all_active = query_officer | (
-            (query_active_status | query_initiated_last_term) & ~ query_alumni
+    previous_term = term.get_previous_full_term()
+    officers = get_uniqnames(members.filter(officer__term=term))
+    with_distinction = get_uniqnames(
+            members.filter(distinction__term__in=[term, previous_term])
     )
-    progress_items = ProgressItem.objects.filter(
-                                    term=term,
-                                    event_type__name='Meeting Attendance'
+    initiated_last_term = get_uniqnames(
+            members.filter(init_term=previous_term)
     )
-    query_actives_absent_now = ~Q(progressitem__in=progress_items)
-    # figure out actives will gain status if they have the meeting credit
-
-    query_inactives_need_meeting = (
-        ~query_officer & ~query_active_status & ~query_initiated_last_term & ~query_alumni
+    alumni = get_uniqnames(
+            members.filter(
+                    Q(standing__name='Alumni') |
+                    Q(expect_grad_date__lt=date.today())
+            )
     )
-    query = (query_all_active & query_actives_absent_now)
-    set1 = set(members.filter(query).distinct()[:])
-    active_dist = DistinctionType.objects.get(name='Active')
-    temp_active_ok = not is_last_voting_meeting
-    set2 = set(
+    came_to_meeting = get_uniqnames(
             members.filter(
-                    query_inactives_need_meeting).distinct()[:]
-        ).intersection(
-            set(
-                active_dist.get_actives_with_status(
-                                            term,
-                                            temp_active_ok=temp_active_ok
-                )
+                    progressitem__term=term,
+                    progressitem__event_type__name='Meeting Attendance'
             )
+    )
+    active = officers | ((with_distinction | initiated_last_term) - alumni)
+    inactives_need_meeting = get_uniqnames(members) - (
+            officers | with_distinction | initiated_last_term | alumni
+    )
+    potential_active = active - came_to_meeting
+    if inactives_need_meeting:
+        active_dist = DistinctionType.objects.get(name='Active')
+        potential_active |= inactives_need_meeting & set(
+                member.uniqname
+                for member in active_dist.get_actives_with_status(
+                            term,
+                            temp_active_ok=not is_last_voting_meeting
+                )
         )
+    return {
+        'active': active,
+        'actual_active': active & came_to_meeting,
+        'potential_active': potential_active,
+        'graduated': get_uniqnames(get_members_who_graduated()),
+    }
+
+
+def get_member_statuses(term, is_last_voting_meeting=False,
+                        include_electees=False):
+    """ Yields a (member, active, alumni) tuple for each active member, and
+    optionally each electee, with the text of their active and alumni status
+    for the quorum spreadsheet.
+
+    The status sets are loaded once up front as uniqnames, and the members
+    themselves are read in chunks.
+    """
+    status_sets = get_status_sets(
+                        term,
+                        is_last_voting_meeting=is_last_voting_meeting
+    )
+    all_actives = MemberProfile.get_actives().select_related('standing')
+    for member_chunk in iterate_in_chunks(all_actives):
+        for m in member_chunk:
+            if m.uniqname in status_sets['potential_active']:
+                active = 'If present'
+            elif m.uniqname in status_sets['actual_active']:
+                active = 'Yes'
+            elif m.standing.name == 'Alumni':
+                active = 'Confirm Manually'
+            else:
+                active = 'No'
+            if m.uniqname in status_sets['graduated']:
+                alum_text = 'Maybe'
+            elif m.standing.name == 'Alumni':
+                alum_text = 'Yes'
+            else:
+                alum_text = 'No'
+            yield m, active, alum_text
+    if not include_electees:
+        return
+    for member_chunk in iterate_in_chunks(MemberProfile.get_electees()):
+        for m in member_chunk:
+            yield m, 'Electee', 'No'
 
-    return list(set1.union(set2))
+
+QUORUM_HEADER = [
+        'First Name',
+        'Last Name',
+        'uniqname',
+        'Active?',
+        'Alumni?',
+        'Present'
+]
+
+
+def get_quorum_rows(term, is_last_voting_meeting=False,
+                    include_electees=False):
+    """ Yields the rows of the member status spreadsheet used for taking
+    quorum, starting with the header.
+    """
+    yield QUORUM_HEADER
+    for m, active, alum_text in get_member_statuses(
+                            term,
+                            is_last_voting_meeting=is_last_voting_meeting,
+                            include_electees=include_electees):
+        yield [m.first_name, m.last_name, m.uniqname, active, alum_text, '']
 
 
 def get_quorum_list():
     term = AcademicTerm.get_current_term()
-    all_actives = MemberProfile.get_actives()
-    active_actives = get_active_members(term)
-    members_who_graduated = get_members_who_graduated()
-    actual_actives = get_active_members_who_came_to_something(term)
-    potential_actives = get_active_members_only_if_they_come(term)
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="MemberStatus.csv"'
-
-    writer = UnicodeWriter(response)
-    writer.writerow([
-            'First Name',
-            'Last Name',
-            'uniqname',
-            'Active?',
-            'Alumni?',
-            'Present'
-    ])
-    for m in all_actives:
-        if m in potential_actives:
-            active = 'If present'
-        elif m in actual_actives:
-            active = 'Yes'
-        elif m.standing.name == 'Alumni':
-            active = 'Confirm Manually'
-        else:
-            active = 'No'
-        if m in members_who_graduated:
-            alum_text = 'Maybe'
-        elif m.standing.name == 'Alumni':
-            alum_text = 'Yes'
-        else:
-            alum_text = 'No'
-        writer.writerow([
-                m.first_name,
-                m.last_name,
-                m.uniqname,
-                active,
-                alum_text,
-                ''
-        ])
-    return response
+    return get_csv_response('MemberStatus.csv', get_quorum_rows(term))
 
 
 def get_quorum_list_elections():
     term = AcademicTerm.get_current_term()
-    all_actives = MemberProfile.get_actives()
-    electees = MemberProfile.get_electees()
-    active_actives = get_active_members(term)
-    members_who_graduated = get_members_who_graduated()
-    actual_actives = get_active_members_who_came_to_something(term)
-    potential_actives = get_active_members_only_if_they_come(
-                                            term,
-                                            is_last_voting_meeting=True
+    return get_csv_response(
+                'MemberStatus.csv',
+                get_quorum_rows(
+                        term,
+                        is_last_voting_meeting=True,
+                        include_electees=True
+                )
     )
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="MemberStatus.csv"'
-
-    writer = UnicodeWriter(response)
-    writer.writerow([
-            'First Name',
-            'Last Name',
-            'uniqname',
-            'Active?',
-            'Alumni?',
-            'Present'
-    ])
-    for m in all_actives:
-        if m in potential_actives:
-            active = 'If present'
-        elif m in actual_actives:
-            active = 'Yes'
-        elif m.standing.name == 'Alumni':
-            active = 'Confirm Manually'
-        else:
-            active = 'No'
-        if m in members_who_graduated:
-            alum_text = 'Maybe'
-        elif m.standing.name == 'Alumni':
-            alum_text = 'Yes'
-        else:
-            alum_text = 'No'
-        writer.writerow([
-                m.first_name,
-                m.last_name,
-                m.uniqname,
+
+
+def start_quorum_tracker(event, is_elections=False, restart=False):
+    """ Returns the quorum tracker for the voting meeting, computing the
+    members' statuses and who has already signed in if it is new (or if
+    restart is given, or the meeting was being tracked in the other mode).
+
+    From then on the tracker is kept up to date by each sign-in, so the
+    live counts and the final spreadsheet never recompute eligibility.
+    Sign-ins that arrive while a new tracker's rows are being built cannot
+    see them yet, so they are recounted once the rows are saved.
+    """
+    with transaction.atomic():
+        trackers = QuorumTracker.objects.filter(event=event)
+        if not restart:
+            trackers = trackers.exclude(is_elections=is_elections)
+        trackers.delete()
+        tracker, created = QuorumTracker.objects.get_or_create(
+                                    event=event,
+                                    defaults={'is_elections': is_elections}
+        )
+        if not created:
+            return tracker
+        present = set(
+                ProgressItem.objects.filter(
+                        related_event=event
+                ).values_list('member_id', flat=True)
+        )
+        quorum_members = []
+        for m, active, alum_text in get_member_statuses(
+                            event.term,
+                            is_last_voting_meeting=tracker.is_elections,
+                            include_electees=tracker.is_elections):
+            is_present = m.uniqname in present
+            if is_present:
+                tracker.num_present += 1
+            if active == 'Yes' or (active == 'If present' and is_present):
+                tracker.num_actives += 1
+                if is_present:
+                    tracker.num_actives_present += 1
+            quorum_members.append(QuorumMember(
+                                    tracker=tracker,
+                                    member=m,
+                                    active=active,
+                                    alumni=alum_text,
+                                    present=is_present
+            ))
+        QuorumMember.objects.bulk_create(quorum_members, batch_size=500)
+        tracker.save()
+    missed = set(
+            ProgressItem.objects.filter(
+                    related_event=event
+            ).values_list('member_id', flat=True)
+    ) - present
+    for uniqname in missed:
+        QuorumTracker.record_sign_in(event.id, uniqname)
+    if missed:
+        tracker.refresh_from_db()
+    return tracker
+
+
+def get_tracker_rows(tracker):
+    """ Yields the rows of the member status spreadsheet from the tracker,
+    starting with the header, with the members who signed in marked
+    present.
+    """
+    yield QUORUM_HEADER
+    quorum_members = tracker.quorummember_set.order_by('id').values_list(
+                                    'member__first_name',
+                                    'member__last_name',
+                                    'member_id',
+                                    'active',
+                                    'alumni',
+                                    'present'
+    )
+    for first_name, last_name, uniqname, active, alum_text, present in (
+                                            quorum_members.iterator()):
+        yield [
+                first_name,
+                last_name,
+                uniqname,
                 active,
                 alum_text,
-                ''
-        ])
-    for m in electees:
-        writer.writerow([
-                m.first_name,
-                m.last_name,
-                m.uniqname,
-                'Electee',
-                'No',
-                ''
-        ])
-    return response
-
-    
+                'Yes' if present else ''
+        ]
+
+
+def get_tracker_list(tracker):
+    return get_csv_response('MemberStatus.csv', get_tracker_rows(tracker))
+
+
 def email_active_status(meeting, is_elections):
     term = AcademicTerm.get_current_term()
-    all_actives = MemberProfile.get_actives()
-    active_actives = get_active_members(term)
-    members_who_graduated = get_members_who_graduated()
-    actual_actives = get_active_members_who_came_to_something(term)
-    potential_actives = get_active_members_only_if_they_come(
-                            term,
-                            is_last_voting_meeting=is_elections
-    )
+    all_actives = MemberProfile.get_actives().select_related('standing')
+    status_sets = get_status_sets(term, is_last_voting_meeting=is_elections)
+    members_who_graduated = status_sets['graduated']
+    actual_actives = status_sets['actual_active']
+    potential_actives = status_sets['potential_active']
     body_template = r'''Hi %(member)s,
 This is a friendly reminder that we have a critical voting meeting -
 %(name)s - %(date)s
@@ -237,14 +288,14 @@ The TBP Website'''
         sleep(1)
         short_code = 'active'
         status_code = ''
-        if m in potential_actives:
+        if m.uniqname in potential_actives:
             status_text = (' you will be considered active and eligible '
                            'to vote upon attending the meeting. While '
                            'your absence will not count against quorum, '
                            'please be advised that voting meetings are '
                            'required to achieve DA/PA status.')
             short_code = 'conditional active'
-        elif m in actual_actives:
+        elif m.uniqname in actual_actives:
             status_text = (' you are an active member. You will be '
                            'eligible to vote at the meeting and will '
                            'count against quorum if you cannot or do not '
@@ -256,13 +307,13 @@ The TBP Website'''
                            'You are welcome to attend the meeting, but '
                            'you will be unable to vote.')
             short_code = 'not active'
-            if m in members_who_graduated:
+            if m.uniqname in members_who_graduated:
                 status_text += (' This may be that you are listed as '
                                 'having graduated. Alumni may specially '
                                 'request active status, but may not vote '
                                 'on candidate election')
                 short_code = 'non-active alum'
-        if m in members_who_graduated:
+        if m.uniqname in members_who_graduated:
             alum_text = ('Our records additionally indicate that you have '
                          'likely graduated but are not yet listed as an '
                          'alumni. If this is the case, please let us know '
@@ -190,6 +190,18 @@ urlpatterns = [
     url(r'^download_elections_voters/$',
         views.download_elections_voters,
         name='download_elections_voters'),
+    url(r'^quorum/(?P<event_id>\d+)/$',
+        views.view_quorum,
+        name='view_quorum'),
+    url(r'^quorum/(?P<event_id>\d+)/elections/$',
+        views.view_elections_quorum,
+        name='view_elections_quorum'),
+    url(r'^quorum/(?P<event_id>\d+)/counts/$',
+        views.get_quorum_counts,
+        name='get_quorum_counts'),
+    url(r'^quorum/(?P<event_id>\d+)/download/$',
+        views.download_quorum_list,
+        name='download_quorum_list'),
     url(r'^view_electee_survey/(?P<uniqname>[a-z]{3,8})/$',
         views.view_electee_survey,
         name='view_electee_survey'),
@@ -1,7 +1,7 @@
 from datetime import date
 import csv
 from decimal import Decimal
-import copy
+import hashlib
 import re
 import logging
 
@@ -19,6 +19,8 @@ from django.core.exceptions import PermissionDenied
 from django.forms.models import modelformset_factory, modelform_factory
 from django.core.urlresolvers import reverse
 
+from django_ajax.decorators import ajax
+
 from corporate.views import update_resume_zips
 from electees.models import (
                     ElecteeGroup,
@@ -69,9 +71,15 @@ from member_resources.forms import (
 from member_resources.models import (
                     ActiveList,
                     GradElecteeList,
+                    QuorumTracker,
                     UndergradElecteeList
 )
-from member_resources.quorum import get_quorum_list, get_quorum_list_elections
+from member_resources.quorum import (
+                    get_quorum_list,
+                    get_quorum_list_elections,
+                    get_tracker_list,
+                    start_quorum_tracker,
+)
 from migweb.context_processors import profile_setup
 from mig_main.demographics import get_members_for_COE, get_members_for_email
 from mig_main import messages
@@ -101,6 +109,7 @@ from mig_main.models import (
                     PREFERENCES,
                     Committee,
                     OfficerPosition,
+                    invalidate_membership,
 )
 from mig_main.utility import (
                     Permissions,
@@ -108,7 +117,8 @@ from mig_main.utility import (
                     get_current_event_leaders,
                     get_current_group_leaders,
                     get_message_dict,
-                    UnicodeWriter,
+                    get_csv_response,
+                    iterate_in_chunks,
                     get_officer_positions_predecessors,
                     get_project_report_term
 )
@@ -117,7 +127,10 @@ from requirements.models import (
                 DistinctionType,
                 Requirement,
                 ProgressItem,
+                ProgressRollup,
                 EventCategory,
+                get_progress_row_versions,
+                get_progress_table_version,
 )
 from requirements.forms import (
                 ManageDuesFormSet,
@@ -171,28 +184,13 @@ The TBP Website''' % {'member_name': profile.get_firstlast_name(),
 
 
 def get_electees_with_status(distinction):
-    query = Q(distinction_type=distinction) & Q(term=AcademicTerm.get_current_term().semester_type)
     dist_standing = distinction.standing_type.all()
-    requirements = Requirement.objects.filter(query)
-    unflattened_reqs = Requirement.package_requirements(requirements)
     electee_profiles = MemberProfile.get_electees().filter(
                                                 standing=dist_standing)
-    electees_with_status = []
-    for profile in electee_profiles:
-        packaged_progress = ProgressItem.package_progress(
-                                ProgressItem.objects.filter(
-                                        member=profile,
-                                        term=AcademicTerm.get_current_term()
-                                )
-        )
-        amount_req = 0
-        amount_has = 0
-        has_dist = distinction.has_distinction_met(
-                                    packaged_progress,
-                                    unflattened_reqs)
-        if has_dist:
-            electees_with_status.append(profile)
-    return electees_with_status
+    return distinction.get_members_with_status(
+                                electee_profiles,
+                                AcademicTerm.get_current_term()
+    )
 
 
 def get_electees_who_completed_reqs():
@@ -206,44 +204,19 @@ def get_electees_who_completed_reqs():
                             standing_type__name="Graduate",
                             name='Electee (grad)'
     )
-    ugrad_query = Q(distinction_type=ugrad_distinction) & Q(term=AcademicTerm.get_current_term().semester_type)
-    grad_query = Q(distinction_type=grad_distinction) & Q(term=AcademicTerm.get_current_term().semester_type)
-
-    ugrad_reqs = Requirement.objects.filter(ugrad_query)
-    grad_reqs = Requirement.objects.filter(grad_query)
-    unflattened_ugrad_reqs = Requirement.package_requirements(ugrad_reqs)
-    unflattened_grad_reqs = Requirement.package_requirements(grad_reqs)
+    term = AcademicTerm.get_current_term()
     ugrad_profiles = MemberProfile.get_electees().filter(
                         standing__name='Undergraduate').order_by('last_name')
     grad_profiles = MemberProfile.get_electees().filter(
                         standing__name='Graduate').order_by('last_name')
-    electees_with_status = []
-    for profile in ugrad_profiles:
-        packaged_progress = ProgressItem.package_progress(
-                                ProgressItem.objects.filter(
-                                    member=profile,
-                                    term=AcademicTerm.get_current_term()
-                                )
-        )
-        has_dist = ugrad_distinction.has_distinction_met(
-                                            packaged_progress,
-                                            unflattened_ugrad_reqs
-        )
-        if has_dist:
-            electees_with_status.append(profile)
-    for profile in grad_profiles:
-        packaged_progress = ProgressItem.package_progress(
-                                ProgressItem.objects.filter(
-                                    member=profile,
-                                    term=AcademicTerm.get_current_term()
-                                )
-        )
-        has_dist = grad_distinction.has_distinction_met(
-                                        packaged_progress,
-                                        unflattened_grad_reqs
-        )
-        if has_dist:
-            electees_with_status.append(profile)
+    electees_with_status = ugrad_distinction.get_members_with_status(
+                                                    ugrad_profiles,
+                                                    term
+    )
+    electees_with_status += grad_distinction.get_members_with_status(
+                                                    grad_profiles,
+                                                    term
+    )
     return electees_with_status
 
 
@@ -294,72 +267,83 @@ def get_common_context(request):
     return context_dict
 
 
-def get_events_signed_up_hours(uniqname):
-    events_attending = CalendarEvent.objects.filter(
-                            eventshift__attendees__uniqname=uniqname
-                        ).filter(completed=False).distinct()
-    category_hours = {}
-    for event in events_attending:
-        if ProgressItem.objects.filter(
-                            member__uniqname=uniqname,
-                            related_event=event):
+def get_events_signed_up_by_member(profiles):
+    """ Returns {uniqname: event summaries} for the upcoming events each
+    member is signed up for but has not yet received progress from.
+
+    Each summary has the event's category, name, the end of the member's
+    last shift ('end_date') and the hours the member will earn. The shifts
+    for all of the members are fetched at once.
+    """
+    attendance = CalendarEvent.get_attendance_by_attendee(
+                            CalendarEvent.objects.filter(completed=False),
+                            profiles
+    )
+    event_ids = set(event_id for uniqname, event_id in attendance)
+    with_progress = set(ProgressItem.objects.filter(
+                            member__in=profiles,
+                            related_event__in=event_ids
+                    ).values_list('member_id', 'related_event_id'))
+    events = CalendarEvent.objects.in_bulk(list(event_ids))
+    categories = EventCategory.get_categories_with_ancestors(
+                    set(event.event_type_id for event in events.values())
+    )
+    events_signed_up = {profile.uniqname: [] for profile in profiles}
+    for (uniqname, event_id), event_attendance in sorted(attendance.items()):
+        if (uniqname, event_id) in with_progress:
             continue
-        if event.event_type not in category_hours:
-            category_hours[event.event_type] = 0
-        shifts = event.eventshift_set.filter(
-                        attendees__uniqname=uniqname).order_by('start_time')
-        n = shifts.count()
-        count = 0
-        hours = 0
-        while count < n:
-            start_time = shifts[count].start_time
-            end_time = shifts[count].end_time
-            while count < (n-1) and shifts[count+1].start_time < end_time:
-                count += 1
-                end_time = shifts[count].end_time
-            hours += (end_time-start_time).seconds/3600.0
-            count += 1
-        if event.is_fixed_progress():
-            category_hours[event.event_type] += 1
-        else:
-            category_hours[event.event_type] += hours
+        event = events[event_id]
+        events_signed_up[uniqname].append({
+                    'category': categories[event.event_type_id][0],
+                    'name': event.name,
+                    'end_date': event_attendance['end_time'],
+                    'hours': event_attendance['hours']})
+    return events_signed_up
+
+
+def get_events_signed_up_hours(events_signed_up):
+    """ Returns the hours from the event summaries totalled by category. """
+    category_hours = {}
+    for event_summary in events_signed_up:
+        category = event_summary['category']
+        category_hours[category] = (category_hours.get(category, 0) +
+                                    event_summary['hours'])
     return category_hours
 
 
-def package_future_progress(packaged_progress, category_hours):
+def package_future_progress(packaged_progress, category_hours,
+                            categories=None):
     ## TODO fix saturation
-    future_progress = copy.deepcopy(packaged_progress)
+    if categories is None:
+        categories = EventCategory.get_categories_with_ancestors(
+                        set(event_type.id for event_type in category_hours)
+        )
+    future_progress = {
+        event_category: dict(amounts)
+        for event_category, amounts in packaged_progress.items()
+    }
     for event_type, hours in category_hours.items():
-        if event_type in future_progress.keys():
-            future_progress[event_type]['full'] += Decimal(hours)
-            future_progress[event_type]['sat'] += Decimal(hours)
-        else:
-            future_progress[event_type] = {'full': 0, 'sat': 0}
-            future_progress[event_type]['full'] = Decimal(hours)
-            future_progress[event_type]['sat'] = Decimal(hours)
-        event_type_temp = event_type
-        while event_type_temp.parent_category is not None:
-            event_type_temp = event_type_temp.parent_category
-            if event_type_temp in future_progress.keys():
-                future_progress[event_type_temp]['full'] += Decimal(hours)
-                future_progress[event_type_temp]['sat'] += Decimal(hours)
-            else:
-                future_progress[event_type_temp] = {'full': 0, 'sat': 0}
-                future_progress[event_type_temp]['full'] = Decimal(hours)
-                future_progress[event_type_temp]['sat'] = Decimal(hours)
+        for event_category in categories[event_type.id]:
+            amounts = future_progress.setdefault(
+                                        event_category,
+                                        {'full': 0, 'sat': 0}
+            )
+            amounts['full'] += Decimal(hours)
+            amounts['sat'] += Decimal(hours)
     return future_progress
 
 
-def sorted_reqs2html_recursive(sorted_reqs,
+def sorted_reqs2html_recursive(requirement_tree,
                                progress_items,
                                distinctions,
                                padding):
     html_string = ''
-    for event_category, data in sorted_reqs.items():
+    for node in requirement_tree:
+        event_category = node.event_category
         html_string += '<tr><td style=\"padding-left:'+str(padding)+'em;\"><b>'+unicode(event_category)+'</b></td>\n'
         amount = 0
         if event_category in progress_items:
-            if distinctions.count() > 1 and progress_items[event_category]['sat'] != progress_items[event_category]['full']:
+            if len(distinctions) > 1 and progress_items[event_category]['sat'] != progress_items[event_category]['full']:
                 amount = progress_items[event_category]['sat']
                 html_string += "<td><p rel=\"tooltip\" data-trigger=\"hover\" data-toggle=\"popover\" data-placement=\"right\" data-content=\"Only 15 hours may be counted from a single event toward PA status. "+str(progress_items[event_category]['full'])+" total hours have been completed in this category.\">"+str(amount)+'*</p></td>\n'
             else:
@@ -367,11 +351,8 @@ def sorted_reqs2html_recursive(sorted_reqs,
                 html_string += "<td>"+str(amount)+'</td>\n'
         else:
             html_string += '<td>0</td>\n'
-        for distinction in distinctions.order_by('display_order'):
-            req = data["requirements"].filter(distinction_type=distinction)
-            amount_req = 0
-            if req:
-                amount_req = req[0].amount_required
+        for distinction in distinctions:
+            amount_req = node.get_amount(distinction.id) or 0
             html_string += '<td'
             if amount >= amount_req:
                 html_string += ' class=\"requirement-met\"'
@@ -382,19 +363,17 @@ def sorted_reqs2html_recursive(sorted_reqs,
             html_string += '</td>\n'
         html_string += '</tr>\n'
         html_string += sorted_reqs2html_recursive(
-                                    data["children"],
+                                    node.children,
                                     progress_items,
                                     distinctions,
                                     padding+2)
     return html_string
 
 
-def flatten_reqs(sorted_reqs):
+def flatten_reqs(requirement_tree):
     flattened_reqs = []
-    for event_category, data in sorted_reqs.items():
-        flattened_reqs.append(event_category)
-        if data["children"]:
-            flattened_reqs.extend(flatten_reqs(data["children"]))
+    for node in requirement_tree:
+        flattened_reqs.extend(node.flatten())
     return flattened_reqs
 
 
@@ -408,7 +387,7 @@ def flatten_progress(progress, reqs):
     return flattened_progress
 
 
-def sorted_reqs2html(sorted_reqs, progress_items, distinctions):
+def sorted_reqs2html(requirement_tree, progress_items, distinctions):
     html_string = '<table class="table table-striped table-bordered">\n<thead>\n<tr>\n<th>Requirement</th>\n'
     html_string += '<th>Completed</th>\n'
     if distinctions.count > 1:
@@ -419,10 +398,11 @@ def sorted_reqs2html(sorted_reqs, progress_items, distinctions):
     for distinction in distinctions.order_by('display_order'):
         html_string += '<th>' + distinction.name + '</th>\n'
     html_string += '</tr>\n</thead>'
-    return html_string+sorted_reqs2html_recursive(sorted_reqs,
-                                                  progress_items,
-                                                  distinctions,
-                                                  0) + '</table>'
+    return html_string+sorted_reqs2html_recursive(
+                                requirement_tree,
+                                progress_items,
+                                list(distinctions.order_by('display_order')),
+                                0) + '</table>'
 
 
 def user_is_member(user):
@@ -822,55 +802,22 @@ def view_progress(request, uniqname):
         can_edit_progress = Permissions.can_manage_active_progress(request.user)
     else:
         can_edit_progress = Permissions.can_manage_electee_progress(request.user)
-    query = Q()
-    for distinction in distinctions:
-        query = query | Q(distinction_type=distinction)
-    query = query & Q(term=AcademicTerm.get_current_term().semester_type)
-    requirements = Requirement.objects.filter(query)
-    sorted_reqs = Requirement.package_requirements(requirements)
+    requirement_tree = Requirement.get_requirement_tree(
+                        distinctions,
+                        AcademicTerm.get_current_term().semester_type
+    )
     progress = ProgressItem.objects.filter(member=profile,
                                            term=AcademicTerm.get_current_term())
+    packaged_current_progress = ProgressRollup.package_progress(
+                                        profile,
+                                        AcademicTerm.get_current_term()
+    )
     is_own_progress = False
     if request.user.username == uniqname:
         is_own_progress = True
-    events_attending = CalendarEvent.objects.filter(
-                                eventshift__attendees__uniqname=uniqname
-                        ).filter(completed=False).distinct()
-    events_signed_up_for = []
-    category_hours = {}
-    for event in events_attending:
-        if ProgressItem.objects.filter(member__uniqname=uniqname, related_event=event):
-            continue
-        if event.event_type not in category_hours:
-            category_hours[event.event_type] = 0
-        shifts = event.eventshift_set.filter(attendees__uniqname=uniqname).order_by('start_time')
-        event_summary = {
-                    'category': event.event_type,
-                    'name': event.name,
-                    'end_date': None,
-                    'hours': 0}
-        n = shifts.count()
-        count = 0
-        hours = 0
-        while count < n:
-            start_time = shifts[count].start_time
-            end_time = shifts[count].end_time
-            while count < (n-1) and shifts[count+1].start_time < end_time:
-                count += 1
-                end_time = shifts[count].end_time
-            hours += (end_time-start_time).seconds/3600.0
-            count += 1
-        if event.is_fixed_progress():
-            category_hours[event.event_type] += 1
-            event_summary['hours'] += 1
-        else:
-            category_hours[event.event_type] += hours
-            event_summary['hours'] += hours
-        if n:
-            event_summary['end_date'] = end_time
-        events_signed_up_for.append(event_summary)
+    events_signed_up_for = get_events_signed_up_by_member([profile])[uniqname]
+    category_hours = get_events_signed_up_hours(events_signed_up_for)
     template = loader.get_template('member_resources/view_progress.html')
-    packaged_current_progress = ProgressItem.package_progress(progress)
     packaged_future_progress = package_future_progress(packaged_current_progress, category_hours)
     if is_own_progress:
         subnav = 'view_own_progress'
@@ -878,8 +825,8 @@ def view_progress(request, uniqname):
         subnav = 'view_others_progress'
     context_dict = {
         'profile': profile,
-        'reqs_html': sorted_reqs2html(sorted_reqs, ProgressItem.package_progress(progress), distinctions),
-        'reqs_html_future': sorted_reqs2html(sorted_reqs, packaged_future_progress, distinctions),
+        'reqs_html': sorted_reqs2html(requirement_tree, packaged_current_progress, distinctions),
+        'reqs_html_future': sorted_reqs2html(requirement_tree, packaged_future_progress, distinctions),
         'is_own_progress': is_own_progress,
         'progress_items': progress,
         'events_signed_up_for': events_signed_up_for,
@@ -908,313 +855,268 @@ def view_progress_list(request):
     return HttpResponse(template.render(context_dict, request))
 
 
+def get_progress_csv_rows(profiles, distinctions, amount_key,
+                          skip_without_progress=False):
+    """ Yields the rows of a progress spreadsheet, starting with the header.
+
+    The profiles are read in chunks and each chunk's progress is loaded from
+    the rollup table in a single query, so rows are produced as they are
+    needed instead of all up front.
+    """
+    term = AcademicTerm.get_current_term()
+    distinctions = [distinction for distinction in distinctions.order_by('name')]
+    requirement_tree = Requirement.get_requirement_tree(
+                            distinctions,
+                            term.semester_type
+    )
+    reqs = flatten_reqs(requirement_tree)
+    first_row = ['Name', 'uniqname'] + [unicode(req) for req in reqs]
+    for distinction in distinctions:
+        first_row.append('Has ' + unicode(distinction) + ' status?')
+        first_row.append('Is close ?')
+    yield first_row
+    for profile_chunk in iterate_in_chunks(profiles):
+        progress_by_member = ProgressRollup.package_progress_by_member(
+                                        term,
+                                        profile_chunk
+        )
+        for profile in profile_chunk:
+            packaged_progress = progress_by_member.get(profile.uniqname, {})
+            dist_progress = []
+            include_in_sheet = not skip_without_progress
+            for distinction in distinctions:
+                amount_req = 0
+                amount_has = 0
+                for node in requirement_tree:
+                    event_category = node.event_category
+                    amount_req_temp = node.get_amount(distinction.id) or 0
+                    if event_category in packaged_progress:
+                        amount_has_temp = packaged_progress[event_category][amount_key]
+                    else:
+                        amount_has_temp = 0
+                    if amount_has_temp > amount_req_temp:
+                        amount_has = amount_has + amount_req_temp
+                    else:
+                        amount_has = amount_has + amount_has_temp
+                    amount_req = amount_req + amount_req_temp
+                has_dist = distinction.has_distinction_met(
+                                            packaged_progress,
+                                            requirement_tree
+                )
+                close_dist = (amount_has/amount_req) > .75
+                dist_progress.append(unicode(has_dist))
+                dist_progress.append(unicode(close_dist))
+                if amount_has > 0:
+                    include_in_sheet = True
+            if not include_in_sheet:
+                continue
+            progress = flatten_progress(packaged_progress, reqs)
+            yield ([profile.get_full_name(), profile.uniqname] +
+                   [unicode(item[amount_key]) for item in progress] +
+                   dist_progress)
+
+
 def download_active_progress(request):
     if not Permissions.can_download_active_status(request.user):
         request.session['error_message'] = 'You are not authorized to view actives\' progress.'
         return redirect('member_resources:index')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="ActiveProgress.csv"'
-
-    writer = UnicodeWriter(response)
-
     distinctions_actives = DistinctionType.objects.filter(status_type__name="Active").distinct()
-    query = Q()
-    for distinction in distinctions_actives:
-        query = query | Q(distinction_type=distinction)
-    query = query & Q(term=AcademicTerm.get_current_term().semester_type)
-    requirements = Requirement.objects.filter(query)
-    unflattened_reqs = Requirement.package_requirements(requirements)
-    active_reqs = flatten_reqs(unflattened_reqs)
-    progress_rows = []
     active_profiles = Permissions.profiles_you_can_view(request.user).filter(status__name="Active")
-    for profile in active_profiles:
-        packaged_progress = ProgressItem.package_progress(
-                                            ProgressItem.objects.filter(
-                                                            member=profile,
-                                                            term=AcademicTerm.get_current_term()
-                                            )
-        )
-        row = {
-            'member': profile,
-            'progress': flatten_progress(packaged_progress, active_reqs)
-        }
-        dist_progress = []
-        include_in_sheet = False
-        for distinction in distinctions_actives.order_by('name'):
-            amount_req = 0
-            amount_has = 0
-            for event_category, data in unflattened_reqs.items():
-                req = data['requirements'].filter(distinction_type=distinction)
-                if req:
-                    amount_req_temp = req[0].amount_required
-                else:
-                    amount_req_temp = 0
-                if event_category in packaged_progress:
-                    amount_has_temp = packaged_progress[event_category]['sat']
-                else:
-                    amount_has_temp = 0
-                if amount_has_temp > amount_req_temp:
-                    amount_has = amount_has + amount_req_temp
-                else:
-                    amount_has = amount_has + amount_has_temp
-                amount_req = amount_req + amount_req_temp
-            has_dist = distinction.has_distinction_met(packaged_progress, unflattened_reqs)
-            close_dist = (amount_has/amount_req) > .75
-            dist_progress.append(unicode(has_dist))
-            dist_progress.append(unicode(close_dist))
-            if amount_has > 0:
-                include_in_sheet = True
-        row['distinctions'] = dist_progress
-        if include_in_sheet:
-            progress_rows.append(row)
-    active_reqs_unicode = []
-    for req in active_reqs:
-        active_reqs_unicode.append(unicode(req))
-    first_row = ['Name', 'uniqname']+active_reqs_unicode
-    for distinction in distinctions_actives.order_by('name'):
-        first_row.append('Has ' + unicode(distinction) + ' status?')
-        first_row.append('Is close ?')
-    writer.writerow(first_row)
-    for row in progress_rows:
-        progress_temp = []
-        for item in row['progress']:
-            progress_temp.append(unicode(item['sat']))
-        row_to_write = [row["member"].get_full_name(), row["member"].uniqname]+progress_temp+row["distinctions"]
-        writer.writerow(row_to_write)
-
-    return response
+    return get_csv_response(
+                'ActiveProgress.csv',
+                get_progress_csv_rows(
+                        active_profiles,
+                        distinctions_actives,
+                        'sat',
+                        skip_without_progress=True
+                )
+    )
 
 
 def download_grad_el_progress(request):
     if not Permissions.can_manage_electee_progress(request.user):
         request.session['error_message'] = 'You are not authorized to view electees\' progress.'
         return redirect('member_resources:index')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="GradElecteeProgress.csv"'
-
-    writer = UnicodeWriter(response)
     distinctions_grad_el = DistinctionType.objects.filter(
                                 status_type__name="Electee").filter(
                                     standing_type__name="Graduate").distinct()
-    query = Q()
-    for distinction in distinctions_grad_el:
-        query = query | Q(distinction_type=distinction)
-    query = query & Q(term=AcademicTerm.get_current_term().semester_type)
-    requirements = Requirement.objects.filter(query)
-    unflattened_reqs = Requirement.package_requirements(requirements)
-    grad_electees_reqs = flatten_reqs(unflattened_reqs)
-    progress_rows_grad_el = []
     grad_el_profiles = Permissions.profiles_you_can_view(
                             request.user).filter(
                                 status__name="Electee").filter(
                                         standing__name="Graduate")
-    for profile in grad_el_profiles:
-        packaged_progress = ProgressItem.package_progress(
-                                ProgressItem.objects.filter(
-                                        member=profile,
-                                        term=AcademicTerm.get_current_term()
-                                )
-        )
-        row = {
-            'member': profile,
-            'progress': flatten_progress(packaged_progress, grad_electees_reqs)
-        }
-        dist_progress = []
-        for distinction in distinctions_grad_el.order_by('name'):
-            amount_req = 0
-            amount_has = 0
-            for event_category, data in unflattened_reqs.items():
-                req = data["requirements"].filter(distinction_type=distinction)
-                if req:
-                    amount_req_temp = req[0].amount_required
-                else:
-                    amount_req_temp = 0
-                if event_category in packaged_progress:
-                    amount_has_temp = packaged_progress[event_category]['full']
-                else:
-                    amount_has_temp = 0
-                if amount_has_temp > amount_req_temp:
-                    amount_has = amount_has + amount_req_temp
-                else:
-                    amount_has = amount_has + amount_has_temp
-                amount_req = amount_req+amount_req_temp
-            has_dist = distinction.has_distinction_met(packaged_progress,
-                                                       unflattened_reqs)
-            close_dist = (amount_has/amount_req)>.75
-            dist_progress.append(unicode(has_dist))
-            dist_progress.append(unicode(close_dist))
-        row['distinctions'] = dist_progress
-        progress_rows_grad_el.append(row)
-    grad_el_reqs_unicode = []
-    for req in grad_electees_reqs:
-        grad_el_reqs_unicode.append(unicode(req))
-    first_row = ['Name', 'uniqname'] + grad_el_reqs_unicode
-    for distinction in distinctions_grad_el.order_by('name'):
-        first_row.append('Has ' + unicode(distinction) + ' status?')
-        first_row.append('Is close ?')
-    writer.writerow(first_row)
-    for row in progress_rows_grad_el:
-        progress_temp = []
-        for item in row['progress']:
-            progress_temp.append(unicode(item['full']))
-        row_to_write = [row["member"].get_full_name(), row["member"].uniqname]+progress_temp+row["distinctions"]
-        writer.writerow(row_to_write)
-
-    return response
+    return get_csv_response(
+                'GradElecteeProgress.csv',
+                get_progress_csv_rows(
+                        grad_el_profiles,
+                        distinctions_grad_el,
+                        'full'
+                )
+    )
 
 
 def download_ugrad_el_progress(request):
     if not Permissions.can_manage_electee_progress(request.user):
         request.session['error_message'] = 'You are not authorized to view electees\' progress.'
         return redirect('member_resources:index')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="UndergradElecteeProgress.csv"'
-
-    writer = UnicodeWriter(response)
     distinctions_ugrad_el = DistinctionType.objects.filter(
                                 status_type__name='Electee').filter(
                                     standing_type__name='Undergraduate'
                                         ).distinct()
-    query = Q()
-    for distinction in distinctions_ugrad_el:
-        query = query | Q(distinction_type=distinction)
-    query = query & Q(term=AcademicTerm.get_current_term().semester_type)
-    requirements = Requirement.objects.filter(query)
-    unflattened_reqs = Requirement.package_requirements(requirements)
-    ugrad_electees_reqs = flatten_reqs(unflattened_reqs)
-    progress_rows_ugrad_el = []
     ugrad_el_profiles = Permissions.profiles_you_can_view(
                             request.user).filter(
                                 status__name='Electee').filter(
                                     standing__name='Undergraduate')
-    for profile in ugrad_el_profiles:
-        packaged_progress = ProgressItem.package_progress(
-                                ProgressItem.objects.filter(
-                                    member=profile,
-                                    term=AcademicTerm.get_current_term()
-                                )
+    return get_csv_response(
+                'UndergradElecteeProgress.csv',
+                get_progress_csv_rows(
+                        ugrad_el_profiles,
+                        distinctions_ugrad_el,
+                        'full'
+                )
+    )
+
+
+def build_progress_row(profile, packaged_progress, category_hours,
+                       categories, distinctions, reqs, requirement_tree,
+                       status_name):
+    """ Returns the progress table row for a single member.
+
+    The distinctions are a list, already ordered by name.
+    """
+    packaged_future_progress = package_future_progress(
+                                        packaged_progress,
+                                        category_hours,
+                                        categories
+    )
+    row = {
+        'member': profile,
+        'progress': flatten_progress(packaged_progress, reqs),
+        'future_progress': flatten_progress(
+                                packaged_future_progress,
+                                reqs
         )
-        row = {
-            'member': profile,
-            'progress': flatten_progress(packaged_progress, ugrad_electees_reqs)
-        }
-        dist_progress = []
-        for distinction in distinctions_ugrad_el.order_by('name'):
-            amount_req = 0
-            amount_has = 0
-            for event_category, data in unflattened_reqs.items():
-                req = data['requirements'].filter(distinction_type=distinction)
-                if req:
-                    amount_req_temp = req[0].amount_required
-                else:
-                    amount_req_temp = 0
-                if event_category in packaged_progress:
-                    amount_has_temp = packaged_progress[event_category]['full']
-                else:
-                    amount_has_temp = 0
-                if amount_has_temp > amount_req_temp:
-                    amount_has = amount_has + amount_req_temp
-                else:
-                    amount_has = amount_has + amount_has_temp
-                amount_req = amount_req+amount_req_temp
-            has_dist = distinction.has_distinction_met(packaged_progress, unflattened_reqs)
-            close_dist = (amount_has/amount_req) > .75
-            dist_progress.append(unicode(has_dist))
-            dist_progress.append(unicode(close_dist))
-        row['distinctions'] = dist_progress
-        progress_rows_ugrad_el.append(row)
-    ugrad_el_reqs_unicode = []
-    for req in ugrad_electees_reqs:
-        ugrad_el_reqs_unicode.append(unicode(req))
-    first_row = ['Name', 'uniqname'] + ugrad_el_reqs_unicode
-    for distinction in distinctions_ugrad_el.order_by('name'):
-        first_row.append('Has '+unicode(distinction)+' status?')
-        first_row.append('Is close ?')
-    writer.writerow(first_row)
-    for row in progress_rows_ugrad_el:
-        progress_temp = []
-        for item in row["progress"]:
-            progress_temp.append(unicode(item['full']))
-        row_to_write = [row["member"].get_full_name(), row["member"].uniqname]+progress_temp+row["distinctions"]
-        writer.writerow(row_to_write)
-
-    return response
-
-
-def assemble_table(user, keys, status_name, standing_names):
-    distinctions = cache.get(keys[0], None)
-    reqs = cache.get(keys[1], None)
-    progress_rows = cache.get(keys[2], None)
-    if not distinctions:
-        distinctions = DistinctionType.objects.filter(
+    }
+    merged_progress = []
+    for count in range(len(row['progress'])):
+        merged_progress.append({
+                                'has': row['progress'][count],
+                                'will_have': row['future_progress'][count]
+                                })
+    row['merged'] = merged_progress
+    dist_progress = []
+    for distinction in distinctions:
+        amount_req = 0
+        amount_has = 0
+        for node in requirement_tree:
+            event_category = node.event_category
+            amount_req_temp = node.get_amount(distinction.id) or 0
+            if event_category in packaged_progress:
+                dict_key = 'sat' if status_name == 'Active' else 'full'
+                amount_has_temp = packaged_progress[event_category][dict_key]
+            else:
+                amount_has_temp = 0
+            if amount_has_temp > amount_req_temp:
+                amount_has = amount_has + amount_req_temp
+            else:
+                amount_has = amount_has + amount_has_temp
+            amount_req = amount_req+amount_req_temp
+        has_dist = distinction.has_distinction_met(packaged_progress, requirement_tree)
+        close_dist = (Decimal(1.0)*amount_has)/amount_req > .75
+        dist_progress.append(has_dist)
+        dist_progress.append(close_dist)
+    row['distinctions'] = dist_progress
+    return row
+
+
+def assemble_table(user, key_prefix, status_name, standing_names):
+    """ Returns the distinctions, flattened requirements and progress rows
+    for the members with the given status and standings that the user can
+    view.
+
+    Each member's row is cached on its own under that member's progress
+    version, so a change to one member only recomputes their row. The
+    assembled table is cached under the full set of row keys, which makes
+    the viewer's visible profiles part of the key.
+    """
+    term = AcademicTerm.get_current_term()
+    table_key = '%s_%d_%s' % (
+                        key_prefix,
+                        term.id,
+                        get_progress_table_version()
+    )
+    distinctions_and_reqs = cache.get(table_key+'_REQS', None)
+    if distinctions_and_reqs:
+        distinctions, reqs = distinctions_and_reqs
+    else:
+        distinctions = list(DistinctionType.objects.filter(
                             status_type__name=status_name).filter(
                                 standing_type__name__in=standing_names
-                            ).distinct().order_by('name')
-        cache.set(keys[0], distinctions, 60*60*5)  # 5 hours time-out\
-    if not reqs or not progress_rows:
-        query = Q()
-        for distinction in distinctions:
-            query = query | Q(distinction_type=distinction)
-        query = query & Q(term=AcademicTerm.get_current_term().semester_type)
-        requirements = Requirement.objects.filter(query)
-        unflattened_reqs = Requirement.package_requirements(requirements)
-        reqs = flatten_reqs(unflattened_reqs)
-        progress_rows = []
-        profiles = Permissions.profiles_you_can_view(user).filter(
-                            status__name=status_name).filter(
-                                standing__name__in=standing_names)
-        for profile in profiles:
-            packaged_progress = ProgressItem.package_progress(
-                                    ProgressItem.objects.filter(
-                                        member=profile,
-                                        term=AcademicTerm.get_current_term()
-                                    )
+                            ).distinct().order_by('name'))
+        reqs = flatten_reqs(Requirement.get_requirement_tree(
+                                    distinctions,
+                                    term.semester_type
+        ))
+        cache.set(table_key+'_REQS', (distinctions, reqs), 60*60*5)
+    profiles = Permissions.profiles_you_can_view(user).filter(
+                        status__name=status_name).filter(
+                            standing__name__in=standing_names)
+    profiles = [profile for profile in profiles]
+    row_versions = get_progress_row_versions(
+                        [profile.uniqname for profile in profiles]
+    )
+    row_keys = [
+        '%s_ROW_%s_%s' % (
+                table_key,
+                profile.uniqname,
+                row_versions[profile.uniqname]
+        )
+        for profile in profiles
+    ]
+    visible_key = table_key+'_ROWS_'+hashlib.md5(
+                                    '|'.join(row_keys)).hexdigest()
+    progress_rows = cache.get(visible_key, None)
+    if progress_rows is not None:
+        return distinctions, reqs, progress_rows
+    cached_rows = cache.get_many(row_keys)
+    missing = [
+        (profile, row_key)
+        for profile, row_key in zip(profiles, row_keys)
+        if row_key not in cached_rows
+    ]
+    if missing:
+        requirement_tree = Requirement.get_requirement_tree(
+                                    distinctions,
+                                    term.semester_type
+        )
+        missing_profiles = [profile for profile, row_key in missing]
+        progress_by_member = ProgressRollup.package_progress_by_member(
+                                        term,
+                                        missing_profiles
+        )
+        events_signed_up = get_events_signed_up_by_member(missing_profiles)
+        categories = EventCategory.get_categories_with_ancestors(
+                        set(event_summary['category'].id
+                            for member_events in events_signed_up.values()
+                            for event_summary in member_events)
+        )
+        new_rows = {}
+        for profile, row_key in missing:
+            new_rows[row_key] = build_progress_row(
+                                    profile,
+                                    progress_by_member.get(profile.uniqname, {}),
+                                    get_events_signed_up_hours(
+                                        events_signed_up[profile.uniqname]
+                                    ),
+                                    categories,
+                                    distinctions,
+                                    reqs,
+                                    requirement_tree,
+                                    status_name
             )
-            category_hours = get_events_signed_up_hours(profile.uniqname)
-            packaged_future_progress = package_future_progress(packaged_progress, category_hours)
-            row = {
-                'member': profile,
-                'progress': flatten_progress(packaged_progress, reqs),
-                'future_progress': flatten_progress(
-                                        packaged_future_progress,
-                                        reqs
-                )
-            }
-            merged_progress = []
-            for count in range(len(row['progress'])):
-                merged_progress.append({
-                                        'has': row['progress'][count],
-                                        'will_have': row['future_progress'][count]
-                                        })
-            row['merged'] = merged_progress
-            dist_progress = []
-            for distinction in distinctions.order_by('name'):
-                amount_req = 0
-                amount_has = 0
-                for event_category, data in unflattened_reqs.items():
-                    req = data['requirements'].filter(distinction_type=distinction)
-                    if req:
-                        amount_req_temp = req[0].amount_required
-                    else:
-                        amount_req_temp = 0
-                    if event_category in packaged_progress:
-                        dict_key = 'sat' if status_name == 'Active' else 'full'
-                        amount_has_temp = packaged_progress[event_category][dict_key]
-                    else:
-                        amount_has_temp = 0
-                    if amount_has_temp > amount_req_temp:
-                        amount_has = amount_has + amount_req_temp
-                    else:
-                        amount_has = amount_has + amount_has_temp
-                    amount_req = amount_req+amount_req_temp
-                has_dist = distinction.has_distinction_met(packaged_progress, unflattened_reqs)
-                close_dist = (Decimal(1.0)*amount_has)/amount_req > .75
-                dist_progress.append(has_dist)
-                dist_progress.append(close_dist)
-            row['distinctions'] = dist_progress
-            progress_rows.append(row)
-        cache.set(keys[1], reqs, 60*60*5)  # 5 hours time-out
-        cache.set(keys[2], progress_rows, 60*60*5)
+        cache.set_many(new_rows, 60*60*5)  # 5 hours time-out
+        cached_rows.update(new_rows)
+    progress_rows = [cached_rows[row_key] for row_key in row_keys]
+    cache.set(visible_key, progress_rows, 60*60*5)
     return distinctions, reqs, progress_rows
 
 
@@ -1227,11 +1129,7 @@ def view_progress_table(request):
     if can_manage_actives:
         distinctions_actives, active_reqs, progress_rows = assemble_table(
                                             request.user,
-                                            (
-                                                'PROGRESS_TABLE_ACTIVE_DIST',
-                                                'PROGRESS_TABLE_ACTIVE_REQS',
-                                                'PROGRESS_TABLE_ACTIVE_ROWS'
-                                            ),
+                                            'PROGRESS_TABLE_ACTIVE',
                                             'Active',
                                             [
                                                 'Undergraduate',
@@ -1246,21 +1144,13 @@ def view_progress_table(request):
     if can_manage_electees:
         distinctions_ugrad_el, ugrad_electees_reqs, progress_rows_ugrad_el = assemble_table(
                                                         request.user,
-                                                        (
-                                                            'PROGRESS_TABLE_UGRADEL_DIST',
-                                                            'PROGRESS_TABLE_UGRADEL_REQS',
-                                                            'PROGRESS_TABLE_UGRADEL_ROWS'
-                                                        ),
+                                                        'PROGRESS_TABLE_UGRADEL',
                                                         'Electee',
                                                         ['Undergraduate']
         )
         distinctions_grad_el, grad_electees_reqs, progress_rows_grad_el = assemble_table(
                                                         request.user,
-                                                        (
-                                                            'PROGRESS_TABLE_GRADEL_DIST',
-                                                            'PROGRESS_TABLE_GRADEL_REQS',
-                                                            'PROGRESS_TABLE_GRADEL_ROWS'
-                                                        ),
+                                                        'PROGRESS_TABLE_GRADEL',
                                                         'Electee',
                                                         ['Graduate']
         )
@@ -2101,6 +1991,7 @@ def clear_electee_lists(request):
         return redirect('member_resources:index')
     UndergradElecteeList.objects.all().delete()
     GradElecteeList.objects.all().delete()
+    invalidate_membership()
     request.session['success_message'] = 'Electees lists successfully cleared.'
     return redirect('member_resources:edit_list')
 
@@ -2135,6 +2026,7 @@ def edit_list(request):
                 else:
                     to_delete1.delete()
                     to_delete2.delete()
+                    invalidate_membership()
             if (not error_lists['bad_uniqnames'] and
                     not error_lists['missing_uniqnames']):
                 request.session['success_message'] = ('All uniqnames removed '
@@ -3424,6 +3316,66 @@ def download_elections_voters(request):
     return get_quorum_list_elections()
 
 
+def get_voting_meeting(event_id):
+    return get_object_or_404(
+                CalendarEvent,
+                id=event_id,
+                event_type__name='Voting Meeting Attendance'
+    )
+
+
+def view_quorum(request, event_id, is_elections=False):
+    if not Permissions.can_view_demographics(request.user):
+        request.session['error_message'] = ('You are not authorized to view '
+                                            'member data')
+        return get_previous_page(request, alternate='member_resources:index')
+    event = get_voting_meeting(event_id)
+    tracker = start_quorum_tracker(
+                    event,
+                    is_elections=is_elections,
+                    restart=(request.method == 'POST' and
+                             'restart' in request.POST)
+    )
+    template = loader.get_template('member_resources/quorum.html')
+    context_dict = {
+        'event': event,
+        'tracker': tracker,
+        'counts': tracker.get_counts(),
+        'subnav': 'misc_reqs',
+        }
+    context_dict.update(get_common_context(request))
+    context_dict.update(get_permissions(request.user))
+    return HttpResponse(template.render(context_dict, request))
+
+
+def view_elections_quorum(request, event_id):
+    return view_quorum(request, event_id, is_elections=True)
+
+
+@ajax
+def get_quorum_counts(request, event_id):
+    if not Permissions.can_view_demographics(request.user):
+        return {}
+    tracker = get_object_or_404(QuorumTracker, event_id=event_id)
+    return {
+        'fragments': {
+            '#quorum-counts': loader.render_to_string(
+                                    'member_resources/quorum_counts.html',
+                                    {'counts': tracker.get_counts()}
+            )
+        }
+    }
+
+
+def download_quorum_list(request, event_id):
+    if not Permissions.can_view_demographics(request.user):
+        request.session['error_message'] = ('You are not authorized to view '
+                                            'member data')
+        return get_previous_page(request, alternate='member_resources:index')
+    tracker = get_object_or_404(QuorumTracker, event_id=event_id)
+    return get_tracker_list(tracker)
+
+
 def view_electee_survey(request, uniqname):
     if (not hasattr(request.user, 'userprofile') or
        not request.user.userprofile.is_member()):
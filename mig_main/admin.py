@@ -13,6 +13,7 @@ from mig_main.models import (
                     SlideShowPhoto,
                     UserPreference,
                     Committee,
+                    OutgoingEmail,
 )
 
 
@@ -85,3 +86,10 @@ admin.site.register(UserProfile)
 admin.site.register(SlideShowPhoto)
 admin.site.register(UserPreference)
 admin.site.register(Committee)
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'time_added', 'time_sent', 'attempts']
+    list_filter = ['status']
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
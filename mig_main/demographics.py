@@ -1,7 +1,6 @@
 import numpy
 from matplotlib import pyplot
-from django.db.models import Count
-from django.http import HttpResponse
+from django.db.models import Count, prefetch_related_objects
 
 from event_cal.models import CalendarEvent
 from history.models import Distinction, Officer
@@ -16,7 +15,7 @@ from mig_main.models import (
                     ALUM_MAIL_FREQ_CHOICES,
                     GENDER_CHOICES,
 )
-from mig_main.utility import UnicodeWriter
+from mig_main.utility import get_csv_response, iterate_in_chunks
 from requirements.models import ProgressItem, DistinctionType, SemesterType
 
 
@@ -212,98 +211,131 @@ def get_area_chart_of_distribution(dist):
     pass
 
 
-def get_members_for_COE():
-    members = MemberProfile.get_actives().exclude(standing__name='Alumni')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="MemberData.csv"'
-
-    writer = UnicodeWriter(response)
-    writer.writerow([
-                'First Name',
-                'Last Name',
-                'uniqname',
-                'Active?',
-                'Officer?',
-                'Standing',
-                'Major'
-    ])
-    for member in members:
-        current_term = AcademicTerm.get_current_term()
-        was_active = 'Active' if Distinction.objects.filter(
-                                member=member,
-                                term=current_term.get_previous_full_term()
-                            ).exists() else 'Inactive'
-        officer_terms = Officer.objects.filter(
-                            user=member,
-                            term__in=[
-                                current_term.get_previous_full_term(),
-                                current_term,
-                            ]
-        )
-        if officer_terms.exists():
-            officer_pos = ', '.join(
-                            [unicode(officer.position) + ' ' +
-                             ', '.join(
-                                [unicode(term) for term in officer.term.all()]
-                            ) for officer in officer_terms])
-        else:
-            officer_pos = 'Member'
-        writer.writerow([
-                member.first_name,
-                member.last_name,
-                member.uniqname,
-                was_active,
-                officer_pos,
-                member.standing.name,
-                ', '.join([major.name for major in member.major.all()])
-        ])
-    return response
-
-def get_members_for_email():
-    members = MemberProfile.objects.all().order_by('last_name','first_name','uniqname')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="MemberData_forEmail.csv"'
-
-    writer = UnicodeWriter(response)
-    writer.writerow([
-                'First Name',
-                'Last Name',
-                'uniqname',
-                'Status',
-                'Standing',
-                'Email Preference',
-                'Corporate Email Preference',
-                'Graduation Date',
-                'Most Recent Event'
-    ])
-    for member in members:
-        current_term = AcademicTerm.get_current_term()
-        progress_terms = AcademicTerm.objects.filter(progressitem__in=member.progressitem_set.all()).distinct()
-        events = CalendarEvent.objects.filter(eventshift__in=member.event_attendee.all()).distinct()
-        event_terms = AcademicTerm.objects.filter(calendarevent__in=events).distinct()
-        if progress_terms.exists():
-            if event_terms.exists():
-                most_recent_term = max(max(progress_terms),max(event_terms)).get_abbreviation()
+def get_members_for_COE_rows():
+    """ Yields the rows of the member data spreadsheet sent to the college,
+    starting with the header.
+
+    Past distinctions and officer positions are loaded once, and majors are
+    loaded per chunk of members.
+    """
+    current_term = AcademicTerm.get_current_term()
+    previous_term = current_term.get_previous_full_term()
+    was_active_members = set(
+            Distinction.objects.filter(term=previous_term).values_list(
+                                                            'member_id',
+                                                            flat=True
+            )
+    )
+    officers_by_member = {}
+    officers = Officer.objects.filter(
+                    term__in=[previous_term, current_term]
+    ).select_related('position').prefetch_related('term')
+    for officer in officers:
+        officers_by_member.setdefault(officer.user_id, []).append(officer)
+    yield [
+            'First Name',
+            'Last Name',
+            'uniqname',
+            'Active?',
+            'Officer?',
+            'Standing',
+            'Major'
+    ]
+    members = MemberProfile.get_actives().exclude(
+                        standing__name='Alumni'
+    ).select_related('standing')
+    for member_chunk in iterate_in_chunks(members):
+        prefetch_related_objects(member_chunk, 'major')
+        for member in member_chunk:
+            if member.uniqname in was_active_members:
+                was_active = 'Active'
             else:
-                most_recent_term = max(progress_terms).get_abbreviation()
-        else:
-            if event_terms.exists():
-                most_recent_term = max(event_terms).get_abbreviation()
+                was_active = 'Inactive'
+            officer_terms = officers_by_member.get(member.uniqname, [])
+            if officer_terms:
+                officer_pos = ', '.join(
+                                [unicode(officer.position) + ' ' +
+                                 ', '.join(
+                                    [unicode(term) for term in officer.term.all()]
+                                ) for officer in officer_terms])
+            else:
+                officer_pos = 'Member'
+            yield [
+                    member.first_name,
+                    member.last_name,
+                    member.uniqname,
+                    was_active,
+                    officer_pos,
+                    member.standing.name,
+                    ', '.join([major.name for major in member.major.all()])
+            ]
+
+
+def get_members_for_COE():
+    return get_csv_response('MemberData.csv', get_members_for_COE_rows())
+
+
+def get_members_for_email_rows():
+    """ Yields the rows of the member email spreadsheet, starting with the
+    header.
+
+    The terms each member has progress or event sign-ups in are loaded per
+    chunk of members, so the number of queries does not grow per member.
+    """
+    terms = AcademicTerm.objects.select_related('semester_type').in_bulk()
+    yield [
+            'First Name',
+            'Last Name',
+            'uniqname',
+            'Status',
+            'Standing',
+            'Email Preference',
+            'Corporate Email Preference',
+            'Graduation Date',
+            'Most Recent Event'
+    ]
+    members = MemberProfile.objects.all().select_related(
+                                    'status',
+                                    'standing'
+    ).order_by('last_name', 'first_name', 'uniqname')
+    for member_chunk in iterate_in_chunks(members):
+        uniqnames = [member.uniqname for member in member_chunk]
+        member_terms = {}
+        progress_terms = ProgressItem.objects.filter(
+                                member__in=uniqnames
+        ).values_list('member_id', 'term_id').distinct()
+        event_terms = CalendarEvent.objects.filter(
+                                eventshift__attendees__in=uniqnames
+        ).values_list('eventshift__attendees', 'term_id').distinct()
+        for uniqname, term_id in list(progress_terms) + list(event_terms):
+            member_terms.setdefault(uniqname, []).append(terms[term_id])
+        for member in member_chunk:
+            if member.uniqname in member_terms:
+                most_recent_term = max(
+                                    member_terms[member.uniqname]
+                ).get_abbreviation()
             else:
                 most_recent_term = 'None'
-        stopped_electing = member.is_electee() and not member.still_electing
-        mail_pref = member.get_alum_mail_freq_display()
-        if not member.is_alumni():
-            mail_pref = 'N/A'
-        writer.writerow([
-                member.first_name,
-                member.last_name,
-                member.uniqname,
-                unicode(member.status) if not stopped_electing else unicode(member.status)+' (stopped)',
-                unicode(member.standing),
-                mail_pref,
-                'TRUE' if member.jobs_email else 'FALSE',
-                unicode(member.expect_grad_date),
-                most_recent_term,
-        ])
-    return response
\ No newline at end of file
+            stopped_electing = (member.status.name == 'Electee' and
+                                not member.still_electing)
+            mail_pref = member.get_alum_mail_freq_display()
+            if member.standing.name != 'Alumni':
+                mail_pref = 'N/A'
+            yield [
+                    member.first_name,
+                    member.last_name,
+                    member.uniqname,
+                    unicode(member.status) if not stopped_electing else unicode(member.status)+' (stopped)',
+                    unicode(member.standing),
+                    mail_pref,
+                    'TRUE' if member.jobs_email else 'FALSE',
+                    unicode(member.expect_grad_date),
+                    most_recent_term,
+            ]
+
+
+def get_members_for_email():
+    return get_csv_response(
+                'MemberData_forEmail.csv',
+                get_members_for_email_rows()
+    )
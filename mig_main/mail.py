@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from mig_main.models import OutgoingEmail
+
+
+def get_outbox_connection(backend=None, **kwargs):
+    """ Returns a connection to the backend that actually delivers the
+    queued email (OUTBOX_EMAIL_BACKEND unless another is given).
+    """
+    return get_connection(
+                backend or settings.OUTBOX_EMAIL_BACKEND,
+                **kwargs
+    )
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """ An email backend that adds messages to the outbox instead of sending
+    them. The send_queued_email command sends them later.
+
+    Messages with attachments are not queued but sent straight away.
+    """
+    def send_messages(self, email_messages):
+        messages = [m for m in email_messages if m.recipients()]
+        queued = [m for m in messages if not m.attachments]
+        OutgoingEmail.queue_messages(queued)
+        attached = [m for m in messages if m.attachments]
+        if attached:
+            connection = get_outbox_connection(
+                                    fail_silently=self.fail_silently
+            )
+            connection.send_messages(attached)
+        return len(messages)
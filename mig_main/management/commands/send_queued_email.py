@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from mig_main.mail import get_outbox_connection
+from mig_main.models import EMAIL_SEND_RATE, OutgoingEmail
+
+
+class Command(BaseCommand):
+    help = ('Sends the queued email over a single connection. Meant to be run '
+            'every minute or so, one at a time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--limit',
+                type=int,
+                dest='limit',
+                default=None,
+                help='Send at most this many messages.'
+        )
+        parser.add_argument(
+                '--rate',
+                type=float,
+                dest='rate',
+                default=EMAIL_SEND_RATE,
+                help='Send at most this many messages a second.'
+        )
+        parser.add_argument(
+                '--backend',
+                dest='backend',
+                default=None,
+                help=('Deliver through this email backend instead of '
+                      'OUTBOX_EMAIL_BACKEND, e.g. '
+                      'django.core.mail.backends.console.EmailBackend.')
+        )
+        parser.add_argument(
+                '--purge-days',
+                type=int,
+                dest='purge_days',
+                default=30,
+                help='Delete sent and failed messages older than this.'
+        )
+
+    def handle(self, *args, **options):
+        connection = get_outbox_connection(options['backend'])
+        sent, failed = OutgoingEmail.send_queued(
+                            connection,
+                            limit=options['limit'],
+                            rate=options['rate']
+        )
+        OutgoingEmail.purge(options['purge_days'])
+        self.stdout.write('Sent %d emails, %d failed.' % (sent, failed))
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mig_main', '0014_auto_20160103_1812'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.TextField()),
+                ('body', models.TextField()),
+                ('from_email', models.CharField(max_length=254)),
+                ('addresses', models.TextField()),
+                ('headers', models.TextField(default=b'{}')),
+                ('alternatives', models.TextField(default=b'[]')),
+                ('status', models.CharField(choices=[(b'Q', b'Queued'), (b'S', b'Sent'), (b'F', b'Failed')], default=b'Q', max_length=1)),
+                ('time_added', models.DateTimeField(auto_now_add=True)),
+                ('time_sent', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:50
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mig_main', '0015_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='status',
+            field=models.CharField(choices=[(b'Q', b'Queued'), (b'P', b'Sending'), (b'S', b'Sent'), (b'F', b'Failed')], default=b'Q', max_length=1),
+        ),
+    ]
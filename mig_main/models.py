@@ -1,13 +1,21 @@
+from copy import copy
+from datetime import timedelta
+import json
+
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
 from django.core.validators import validate_email, RegexValidator
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.encoding import force_unicode
 from django.utils.text import slugify
+from time import sleep, time
+from uuid import uuid4
 
 from localflavor.us.models import PhoneNumberField
 from stdimage import StdImageField
@@ -16,6 +24,151 @@ from mig_main.pdf_field import ContentTypeRestrictedFileField, pdf_types
 from mig_main.location_field import LocationField
 
 
+# Version of the cached navigation dropdowns, changed whenever something the
+# dropdowns list (elections, outreach pages, the current term) changes.
+NAV_DROPDOWNS_VERSION_KEY = 'NAV_DROPDOWNS_VERSION'
+# Version of the cached membership classifications used by profile_setup,
+# changed whenever a profile or one of the member lists changes.
+MEMBERSHIP_VERSION_KEY = 'MEMBERSHIP_VERSION'
+# Version of the terms held by TermRegistry, and how many seconds a process
+# trusts its copy before checking the version and the term tables again.
+TERM_REGISTRY_VERSION_KEY = 'TERM_REGISTRY_VERSION'
+TERM_REGISTRY_RECHECK = 5
+# Queued email is sent at most EMAIL_SEND_RATE messages per second. Failed
+# messages are retried after an exponentially growing delay (in seconds) up
+# to EMAIL_MAX_ATTEMPTS times.
+EMAIL_SEND_RATE = 5
+EMAIL_MAX_ATTEMPTS = 6
+EMAIL_RETRY_DELAY = 60
+# A worker claims each email before sending it. A claim that is not settled
+# within EMAIL_CLAIM_TIMEOUT seconds (the worker died) is released.
+EMAIL_CLAIM_TIMEOUT = 60*10
+
+
+def get_cache_version(key):
+    """ Returns the version stored in the cache under key.
+
+    A missing version is replaced with a fresh one so that entries cached
+    under an evicted version can never be picked back up.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def invalidate_cache_version(key):
+    cache.set(key, uuid4().hex, None)
+
+
+def get_nav_dropdowns_version():
+    return get_cache_version(NAV_DROPDOWNS_VERSION_KEY)
+
+
+def invalidate_nav_dropdowns():
+    invalidate_cache_version(NAV_DROPDOWNS_VERSION_KEY)
+
+
+def get_membership_version():
+    return get_cache_version(MEMBERSHIP_VERSION_KEY)
+
+
+def invalidate_membership():
+    invalidate_cache_version(MEMBERSHIP_VERSION_KEY)
+
+
+class TermRegistry(object):
+    """ A process-local copy of the semester types, academic terms and the
+    current term.
+
+    The rows are loaded once per process and reused until they change. The
+    process making a change reloads at once. Every TERM_REGISTRY_RECHECK
+    seconds the others compare the current term and the number and largest
+    id of the terms and semester types against their copy, so they notice a
+    new current term or an added or removed term within that time even
+    though the cache is not shared between processes. Edits to an existing
+    term are only seen elsewhere through the term version, so with a
+    process-local cache they wait for the process to restart.
+
+    Callers get copies of the terms and semester types, so changing one
+    does not change it for the rest of the process.
+    """
+    version = None
+    checked_at = 0
+    semester_types = {}
+    terms = {}
+    current_term = None
+
+    @classmethod
+    def load(cls):
+        if cls.version and time() - cls.checked_at < TERM_REGISTRY_RECHECK:
+            return
+        semester_type_model = AcademicTerm._meta.get_field(
+                                        'semester_type').related_model
+        version = (
+            get_cache_version(TERM_REGISTRY_VERSION_KEY),
+            tuple(CurrentTerm.objects.values_list('current_term_id',
+                                                  flat=True)),
+            cls.get_table_state(AcademicTerm),
+            cls.get_table_state(semester_type_model),
+        )
+        if version != cls.version:
+            semester_types_by_id = semester_type_model.objects.in_bulk()
+            terms = {}
+            for term in AcademicTerm.objects.all():
+                term.semester_type = semester_types_by_id[term.semester_type_id]
+                terms[(term.year, term.semester_type_id)] = term
+            current_term = None
+            current_terms = CurrentTerm.objects.values_list(
+                                            'current_term__year',
+                                            'current_term__semester_type')
+            if current_terms:
+                current_term = terms.get(current_terms[0])
+            cls.semester_types = {
+                semester_type.name: semester_type
+                for semester_type in semester_types_by_id.values()
+            }
+            cls.terms = terms
+            cls.current_term = current_term
+            cls.version = version
+        cls.checked_at = time()
+
+    @staticmethod
+    def get_table_state(model):
+        state = model.objects.aggregate(count=Count('id'), max_id=Max('id'))
+        return state['count'], state['max_id']
+
+    @classmethod
+    def invalidate(cls):
+        cls.version = None
+        invalidate_cache_version(TERM_REGISTRY_VERSION_KEY)
+
+    @staticmethod
+    def copy_term(term):
+        if term is None:
+            return None
+        term_copy = copy(term)
+        term_copy.semester_type = copy(term.semester_type)
+        return term_copy
+
+    @classmethod
+    def get_current_term(cls):
+        cls.load()
+        return cls.copy_term(cls.current_term)
+
+    @classmethod
+    def get_term(cls, year, semester_type):
+        cls.load()
+        return cls.copy_term(cls.terms.get((year, semester_type.id)))
+
+    @classmethod
+    def get_semester_type(cls, name):
+        cls.load()
+        return copy(cls.semester_types.get(name))
+
+
 def resume_file_name(instance, filename):
     """ Returns the resume filename for a member.
 
@@ -104,10 +257,27 @@ class AcademicTerm(models.Model):
 
     @classmethod
     def get_current_term(cls):
-        current_terms = CurrentTerm.objects.all()
-        if current_terms.exists():
-            return current_terms[0].current_term
-        return None
+        return TermRegistry.get_current_term()
+
+    @classmethod
+    def get_term(cls, year, semester_type):
+        """ Returns the term for the year and semester type, creating it if
+        it does not exist yet.
+        """
+        term = TermRegistry.get_term(year, semester_type)
+        if term:
+            return term
+        if cls.objects.filter(
+                        year=year,
+                        semester_type=semester_type).exists():
+            TermRegistry.invalidate()
+            return cls.objects.get(
+                        year=year,
+                        semester_type=semester_type)
+        else:
+            a = cls(year=year, semester_type=semester_type)
+            a.save()
+            return a
 
     def get_previous_full_term(self):
         new_type = self.semester_type.get_previous_full_type()
@@ -115,16 +285,7 @@ class AcademicTerm(models.Model):
             new_year = self.year - 1
         else:
             new_year = self.year
-        if self.__class__.objects.filter(
-                            year=new_year,
-                            semester_type=new_type).exists():
-            return self.__class__.objects.get(
-                        year=new_year,
-                        semester_type=new_type)
-        else:
-            a = self.__class__(year=new_year, semester_type=new_type)
-            a.save()
-            return a
+        return self.__class__.get_term(new_year, new_type)
 
     def get_next_term(self):
         new_type = self.semester_type.get_next_type()
@@ -132,16 +293,7 @@ class AcademicTerm(models.Model):
             new_year = self.year + 1
         else:
             new_year = self.year
-        if self.__class__.objects.filter(
-                            year=new_year,
-                            semester_type=new_type).exists():
-            return self.__class__.objects.get(
-                        year=new_year,
-                        semester_type=new_type)
-        else:
-            a = self.__class__(year=new_year, semester_type=new_type)
-            a.save()
-            return a
+        return self.__class__.get_term(new_year, new_type)
 
     def get_next_full_term(self):
         new_type = self.semester_type.get_next_full_type()
@@ -149,16 +301,15 @@ class AcademicTerm(models.Model):
             new_year = self.year + 1
         else:
             new_year = self.year
-        if self.__class__.objects.filter(
-                            year=new_year,
-                            semester_type=new_type).exists():
-            return self.__class__.objects.get(
-                        year=new_year,
-                        semester_type=new_type)
-        else:
-            a = self.__class__(year=new_year, semester_type=new_type)
-            a.save()
-            return a
+        return self.__class__.get_term(new_year, new_type)
+
+    def save(self, *args, **kwargs):
+        super(AcademicTerm, self).save(*args, **kwargs)
+        TermRegistry.invalidate()
+
+    def delete(self, *args, **kwargs):
+        super(AcademicTerm, self).delete(*args, **kwargs)
+        TermRegistry.invalidate()
 
     def get_abbreviation(self):
         return self.semester_type.name[0]+str(self.year)
@@ -226,11 +377,15 @@ class CurrentTerm(models.Model):
                 not CurrentTerm.objects.get().id == self.id):
             return
         super(CurrentTerm, self).save(*args, **kwargs)
+        TermRegistry.invalidate()
+        invalidate_nav_dropdowns()
 
     def delete(self, *args, **kwargs):
         if CurrentTerm.objects.count() <= 1:
             return
         super(CurrentTerm, self).delete(*args, **kwargs)
+        TermRegistry.invalidate()
+        invalidate_nav_dropdowns()
 
 
 class TBPChapter(models.Model):
@@ -452,6 +607,14 @@ class UserProfile(models.Model):
     def __unicode__(self):
         return self.get_full_name()+" ("+self.uniqname+")"
 
+    def save(self, *args, **kwargs):
+        super(UserProfile, self).save(*args, **kwargs)
+        invalidate_membership()
+
+    def delete(self, *args, **kwargs):
+        super(UserProfile, self).delete(*args, **kwargs)
+        invalidate_membership()
+
     def __gt__(self, user2):
         if not hasattr(user2, 'last_name'):
             return True
@@ -738,3 +901,172 @@ https://tbp.engin.umich.edu%(link)s'''
                 [self.recipient.get_email()],
                 fail_silently=True
         )
+
+
+class OutgoingEmail(models.Model):
+    """ An email in the site's outbox.
+
+    The site's email backend (mig_main.mail.QueuedEmailBackend) stores
+    messages here instead of sending them during the request. The
+    send_queued_email command sends them over a single connection, rate
+    limited and retrying failures with an exponential backoff. Sent and
+    failed messages are kept, with their status, until they are purged.
+
+    Each email is claimed before it is sent, so overlapping runs of the
+    command never send the same email twice.
+    """
+    STATUS_CHOICES = (
+        ('Q', 'Queued'),
+        ('P', 'Sending'),
+        ('S', 'Sent'),
+        ('F', 'Failed'),
+    )
+    subject = models.TextField()
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    # JSON of the to, cc, bcc and reply_to address lists.
+    addresses = models.TextField()
+    headers = models.TextField(default='{}')
+    # JSON list of (content, mimetype) pairs, e.g. html versions of the body.
+    alternatives = models.TextField(default='[]')
+    status = models.CharField(
+                max_length=1,
+                choices=STATUS_CHOICES,
+                default='Q'
+    )
+    time_added = models.DateTimeField(auto_now_add=True)
+    time_sent = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    def __unicode__(self):
+        return '%s (%s)' % (self.subject, self.get_status_display())
+
+    @classmethod
+    def from_message(cls, message):
+        """ Returns an unsaved outbox entry for the email message.
+
+        Attachments are not stored.
+        """
+        return cls(
+                subject=force_unicode(message.subject),
+                body=force_unicode(message.body),
+                from_email=force_unicode(message.from_email),
+                addresses=json.dumps({
+                    'to': list(message.to),
+                    'cc': list(message.cc),
+                    'bcc': list(message.bcc),
+                    'reply_to': list(message.reply_to),
+                }),
+                headers=json.dumps(message.extra_headers),
+                alternatives=json.dumps(
+                            list(getattr(message, 'alternatives', []))
+                )
+        )
+
+    @classmethod
+    def queue_messages(cls, messages):
+        """ Adds the email messages to the outbox."""
+        cls.objects.bulk_create([cls.from_message(m) for m in messages])
+
+    @classmethod
+    def get_due_emails(cls):
+        """ Returns the queued emails that should be sent now, oldest
+        first, along with those whose claim has expired.
+        """
+        return cls.objects.filter(
+                    status__in=['Q', 'P'],
+                    next_attempt__lte=timezone.now()
+        ).order_by('id')
+
+    def claim(self):
+        """ Marks the email as being sent until EMAIL_CLAIM_TIMEOUT from now.
+
+        Returns False if another worker claimed (or settled) it since it was
+        read, in which case it must not be sent.
+        """
+        next_attempt = timezone.now() + timedelta(seconds=EMAIL_CLAIM_TIMEOUT)
+        claimed = OutgoingEmail.objects.filter(
+                    pk=self.pk,
+                    status=self.status,
+                    next_attempt=self.next_attempt
+        ).update(status='P', next_attempt=next_attempt)
+        if claimed:
+            self.status = 'P'
+            self.next_attempt = next_attempt
+        return bool(claimed)
+
+    @classmethod
+    def purge(cls, days):
+        """ Deletes the sent and failed emails older than the given number of
+        days.
+        """
+        cls.objects.filter(
+                status__in=['S', 'F'],
+                time_added__lt=timezone.now() - timedelta(days=days)
+        ).delete()
+
+    def get_message(self, connection=None):
+        """ Returns the email message to send for this entry."""
+        addresses = json.loads(self.addresses)
+        message = EmailMultiAlternatives(
+                    self.subject,
+                    self.body,
+                    self.from_email,
+                    addresses['to'],
+                    bcc=addresses['bcc'],
+                    connection=connection,
+                    headers=json.loads(self.headers),
+                    cc=addresses['cc'],
+                    reply_to=addresses['reply_to']
+        )
+        for content, mimetype in json.loads(self.alternatives):
+            message.attach_alternative(content, mimetype)
+        return message
+
+    @classmethod
+    def send_queued(cls, connection, limit=None, rate=EMAIL_SEND_RATE):
+        """ Sends the due emails over the connection, at most rate messages a
+        second. Returns how many were sent and how many failed.
+
+        The connection is kept open across messages and reopened after a
+        failure. Emails that another run claims first are skipped.
+        """
+        emails = cls.get_due_emails()
+        if limit:
+            emails = emails[:limit]
+        interval = 1.0 / rate if rate else 0
+        sent = failed = 0
+        connection.open()
+        try:
+            for email in emails:
+                started = time()
+                if not email.claim():
+                    continue
+                try:
+                    connection.send_messages([email.get_message(connection)])
+                except Exception, err:
+                    email.attempts += 1
+                    email.last_error = unicode(err)
+                    if email.attempts >= EMAIL_MAX_ATTEMPTS:
+                        email.status = 'F'
+                    else:
+                        email.status = 'Q'
+                        email.next_attempt = timezone.now() + timedelta(
+                                seconds=EMAIL_RETRY_DELAY * 2 ** email.attempts
+                        )
+                    failed += 1
+                    connection.close()
+                    connection.open()
+                else:
+                    email.status = 'S'
+                    email.time_sent = timezone.now()
+                    sent += 1
+                email.save()
+                wait = interval - (time() - started)
+                if wait > 0:
+                    sleep(wait)
+        finally:
+            connection.close()
+        return sent, failed
@@ -0,0 +1,113 @@
+"""
+Query counts for the Permissions checks.
+
+These live apart from the other mig_main tests so that they can run on their
+own:
+
+    python manage.py test mig_main.tests.test_permissions
+"""
+from inspect import getargspec
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from history.models import Officer
+from history.tests.factories import OfficerFactory
+from mig_main.models import (
+            AcademicTerm,
+            Major,
+            MemberProfile,
+            OfficerPosition,
+            ShirtSize,
+            Standing,
+            Status,
+            TBPChapter,
+)
+from mig_main.tests.factories import AcademicTermFactory, TBPChapterFactory,\
+                            StandingFactory, StatusFactory, MajorFactory,\
+                            ShirtSizeFactory, CurrentTermFactory, NUM_OFFICERS
+from mig_main.utility import Permissions
+
+# Checks that look beyond the user's own roles and so always query.
+UNCACHED_PERMISSION_CHECKS = ['can_see_follow_up']
+
+
+def setUpModule():
+    AcademicTermFactory.create_batch(18)
+    TBPChapterFactory.create_batch(3)
+    StandingFactory.create_batch(3)
+    StatusFactory.create_batch(2)
+    MajorFactory.create_batch(3)
+    ShirtSizeFactory.create_batch(3)
+    CurrentTermFactory()
+    OfficerFactory.create_batch(NUM_OFFICERS)
+    User.objects.create_user('johndoe', 'johndoe@umich.edu', 'password')
+    User.objects.create_superuser('jimharb', 'jimharb@umich.edu', 'password')
+
+
+def tearDownModule():
+    Officer.objects.all().delete()
+    OfficerPosition.objects.all().delete()
+    MemberProfile.objects.all().delete()
+    AcademicTerm.objects.all().delete()
+    ShirtSize.objects.all().delete()
+    Major.objects.all().delete()
+    Status.objects.all().delete()
+    Standing.objects.all().delete()
+    TBPChapter.objects.all().delete()
+    User.objects.all().delete()
+
+
+def get_user_permission_checks():
+    """ Returns the names of the Permissions checks that take only a user. """
+    checks = []
+    for name in dir(Permissions):
+        if not name.startswith('can_'):
+            continue
+        if getargspec(getattr(Permissions, name)).args == ['cls', 'user']:
+            checks.append(name)
+    return checks
+
+
+def count_permission_queries(user):
+    """ Returns a dictionary mapping each permission check to the number of
+    queries it issued for the user.
+    """
+    query_counts = {}
+    for name in get_user_permission_checks():
+        with CaptureQueriesContext(connection) as context:
+            getattr(Permissions, name)(user)
+        query_counts[name] = len(context.captured_queries)
+    return query_counts
+
+
+class PermissionsQueryCountTestCase(TestCase):
+
+    def get_users(self):
+        usernames = ['johndoe', 'jimharb']
+        usernames.extend(
+            Officer.objects.values_list('user__user__username', flat=True)
+        )
+        return [User.objects.get(username=username) for username in usernames]
+
+    def test_users_include_officers(self):
+        self.assertGreater(len(self.get_users()), 2)
+
+    def test_checks_answered_from_context(self):
+        for user in self.get_users():
+            count_permission_queries(user)
+            query_counts = count_permission_queries(user)
+            for name, num_queries in query_counts.items():
+                if name in UNCACHED_PERMISSION_CHECKS:
+                    continue
+                self.assertEqual(
+                        num_queries,
+                        0,
+                        msg='%s issued %d queries for %s' % (
+                                            name,
+                                            num_queries,
+                                            user.username
+                        )
+                )
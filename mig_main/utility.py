@@ -1,24 +1,42 @@
 import csv
 import codecs
 import cStringIO
+import hashlib
+import json
 import os
-from datetime import date
+import shutil
+import zipfile
+from datetime import date, datetime
 
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.utils.functional import cached_property
 
 
 from electees.models import ElecteeGroup, ElecteeProcessVisibility
 from elections.models import Election
 from event_cal.models import CalendarEvent
-from mig_main.models import AcademicTerm, OfficerPosition, MemberProfile
+from mig_main.models import (
+                    AcademicTerm,
+                    OfficerPosition,
+                    MemberProfile,
+                    UserProfile,
+                    get_nav_dropdowns_version,
+)
 from requirements.models import SemesterType
 from history.models import Officer, ProjectReport, OfficerPositionRelationship
 from member_resources.models import ProjectLeaderList
 from outreach.models import OutreachEventType
 
+# The number of members fetched at a time for CSV exports.
+CSV_CHUNK_SIZE = 200
+# The file in a synced directory that records what was copied into it.
+SYNC_MANIFEST_NAME = '.manifest.json'
+
 
 def zipdir(path, zipf):
     for root, dirs, files in os.walk(path):
@@ -143,7 +161,60 @@ def get_previous_page(request, alternate='home', args=tuple()):
             return redirect(alternate)
 
 
+def get_dropdown_permissions(user):
+    """ Returns the permissions that decide which dropdown links a user sees.
+
+    The dropdowns are built from these alone, so users with the same
+    permissions share the same cached dropdowns.
+    """
+    return {
+        'is_member': bool(Permissions.get_profile(user)),
+        'has_user_profile': Permissions.get_context(user).has_user_profile,
+        'can_view_calendar_admin': Permissions.can_view_calendar_admin(user),
+        'can_manage_electee_progress':
+            Permissions.can_manage_electee_progress(user),
+        'can_view_more_than_own_progress':
+            Permissions.can_view_more_than_own_progress(user),
+        'can_manage_membership_admin': (
+            Permissions.can_manage_misc_reqs(user) or
+            Permissions.can_change_requirements(user)),
+        'can_manage_website': Permissions.can_manage_website(user),
+    }
+
+
 def get_dropdowns(user):
+    """ Returns the navigation dropdowns for the user.
+
+    The dropdowns are cached per combination of dropdown permissions and per
+    day, since the current elections depend on the date. The link to the
+    user's own progress is the only per-user piece and is added after the
+    cached dropdowns are loaded.
+    """
+    permissions = get_dropdown_permissions(user)
+    fingerprint = ''.join([
+        '1' if permissions[name] else '0' for name in sorted(permissions)
+    ])
+    cache_key = 'NAV_DROPDOWNS_%s_%s_%s' % (
+                        get_nav_dropdowns_version(),
+                        date.today().isoformat(),
+                        fingerprint
+    )
+    dropdowns = cache.get(cache_key, None)
+    if dropdowns is None:
+        dropdowns = build_dropdowns(permissions)
+        cache.set(cache_key, dropdowns, 60*60*24)
+    if permissions['is_member']:
+        own_progress_link = reverse('member_resources:view_progress',
+                                    args=[user.username])
+        dropdowns['member_resources'] = [
+            dict(dropdown, link=own_progress_link)
+            if dropdown['subnav'] == 'view_own_progress' else dropdown
+            for dropdown in dropdowns['member_resources']
+        ]
+    return dropdowns
+
+
+def build_dropdowns(permissions):
     # NOTE: subsub navs will not show in dropdowns but will
     # show in the secondary bar (currently just for member resources).
     # Three levels deep is max supported
@@ -194,13 +265,13 @@ def get_dropdowns(user):
                     'link_name': 'My Events',
                     'link': reverse('event_cal:my_events')
     })
-    if hasattr(user, 'userprofile') and user.userprofile.is_member():
+    if permissions['is_member']:
         dropdowns['event_cal'].append({
                     'subnav': 'tutoring_form',
                     'link_name': 'Submit Tutoring Form',
                     'link': reverse('event_cal:submit_tutoring_form')
         })
-    if Permissions.can_view_calendar_admin(user):
+    if permissions['can_view_calendar_admin']:
         dropdowns['event_cal'].append({
                     'subnav': 'admin',
                     'link_name': 'Calendar Admin',
@@ -223,7 +294,8 @@ def get_dropdowns(user):
                     'link_name': 'Tutoring',
                     'link': reverse('outreach:tutoring')
     })
-    for event_type in OutreachEventType.get_active():
+    for event_type in OutreachEventType.get_active().select_related(
+                                                'event_category'):
         dropdowns['outreach'].append({
                     'subnav': event_type.url_stem,
                     'link_name': event_type.get_tab_name(),
@@ -233,7 +305,7 @@ def get_dropdowns(user):
 
     # electees: subnav of member_resources
     electee_dropdowns = []
-    if Permissions.can_manage_electee_progress(user):
+    if permissions['can_manage_electee_progress']:
         electee_dropdowns.append({
                     'subnav': 'groups',
                     'link_name': 'Manage Electee Teams',
@@ -251,10 +323,12 @@ def get_dropdowns(user):
         })
 
     # elections: subnav of member_resources, depends on existing elections
-    elections = Election.get_current_elections()
+    elections = Election.get_current_elections().select_related(
+                                                'term__semester_type')
+    elections = [election for election in elections]
     elections_dropdowns = []
     for election in elections:
-        if elections.count() > 1:
+        if len(elections) > 1:
             elections_dropdowns.append({
                     'subnav': 'list'+unicode(election.id),
                     'link_name': 'Nomination List (%s)' % (
@@ -270,7 +344,7 @@ def get_dropdowns(user):
         })
 
     # member_resources
-    if hasattr(user, 'userprofile') and user.userprofile.is_member():
+    if permissions['is_member']:
         dropdowns['member_resources'].append({
                     'subnav': 'member_profiles',
                     'link_name': 'Member Profiles',
@@ -282,27 +356,25 @@ def get_dropdowns(user):
                     'link_name': 'Members Resources',
                     'link': reverse('member_resources:index')
         })
-    if hasattr(user, 'userprofile') and user.userprofile.is_member():
+    if permissions['is_member']:
         dropdowns['member_resources'].append({
                     'subnav': 'view_own_progress',
                     'link_name': 'Track My Progress',
-                    'link': reverse('member_resources:view_progress',
-                                    args=[user.username])
+                    'link': None
         })
-    if Permissions.can_view_more_than_own_progress(user):
+    if permissions['can_view_more_than_own_progress']:
         dropdowns['member_resources'].append({
                     'subnav': 'view_others_progress',
                     'link_name': 'View Others\' Progress',
                     'link': reverse('member_resources:view_progress_list')
         })
-    if (Permissions.can_manage_misc_reqs(user) or
-       Permissions.can_change_requirements(user)):
+    if permissions['can_manage_membership_admin']:
         dropdowns['member_resources'].append({
                     'subnav': 'misc_reqs',
                     'link_name': 'Membership Admin',
                     'link': reverse('member_resources:view_misc_reqs')
         })
-    if hasattr(user, 'userprofile'):
+    if permissions['has_user_profile']:
         dropdowns['member_resources'].append({
                     'subnav': 'playground',
                     'link_name': 'TBPlayground',
@@ -325,7 +397,7 @@ def get_dropdowns(user):
                     'link': reverse('elections:index'),
                     'subsubnav': elections_dropdowns
     })
-    if Permissions.can_manage_website(user):
+    if permissions['can_manage_website']:
         dropdowns['member_resources'].append({
                     'subnav': 'website',
                     'link_name': 'Manage Website',
@@ -360,7 +432,7 @@ def get_dropdowns(user):
                     'link_name': 'Alumni Newsletters',
                     'link': reverse('history:alumninews_view')
     })
-    if hasattr(user, 'userprofile') and user.userprofile.is_member():
+    if permissions['is_member']:
         dropdowns['publications'].append({
                     'subnav': 'project_reports',
                     'link_name': 'Chapter Project Reports',
@@ -374,11 +446,9 @@ def get_dropdowns(user):
 
 def get_quick_links(user):
     quick_links = []
-    if not hasattr(user, 'userprofile'):
-        return quick_links
-    if not user.userprofile.is_member():
+    profile = Permissions.get_profile(user)
+    if not profile:
         return quick_links
-    profile = user.userprofile.memberprofile
     if profile.standing.name != 'Alumni':
         quick_links.append({
                 'link': reverse(
@@ -387,7 +457,6 @@ def get_quick_links(user):
                         ),
                 'link_name': 'Track My Progress'
         })
-    positions = Permissions.get_current_officer_positions(user)
     if Permissions.can_add_announcements(user):
         quick_links.append({
                 'link_name': 'Add Weekly Announcement',
@@ -400,10 +469,10 @@ def get_quick_links(user):
         })
     # Pres items-nothing unique
     # VP items
-    if positions.filter(
-                Q(position__name='Vice President') |
-                Q(position__name='Graduate Student Coordinator') |
-                Q(position__name='Graduate Student Vice President')).exists():
+    if Permissions.has_current_position(user, (
+                'Vice President',
+                'Graduate Student Coordinator',
+                'Graduate Student Vice President')):
         quick_links.append({
                     'link_name': 'Member Admin',
                     'link': reverse('member_resources:view_misc_reqs')
@@ -414,13 +483,13 @@ def get_quick_links(user):
         })
     # Secretary items - nothing unique
     # Treasurer items
-    if positions.filter(position__name='Treasurer').exists():
+    if Permissions.has_current_position(user, ('Treasurer',)):
         quick_links.append({
                     'link_name': 'Manage Dues Payment',
                     'link': reverse('member_resources:manage_dues')
         })
     # Service Officer
-    if positions.filter(position__name='Service Coordinator').exists():
+    if Permissions.has_current_position(user, ('Service Coordinator',)):
         quick_links.append({
                 'link_name': 'Manage Project Leaders',
                 'link': reverse('member_resources:manage_project_leaders')
@@ -433,13 +502,13 @@ def get_quick_links(user):
     # Intersociety - nothing unique
     # NI, Corp, EVP, Historian - nothing unique
     # Publicity
-    if positions.filter(position__name='Publicity Officer').exists():
+    if Permissions.has_current_position(user, ('Publicity Officer',)):
         quick_links.append({
                 'link_name': 'Generate Weekly Announcements',
                 'link': reverse('event_cal:generate_announcements')
         })
     # Membership Officer -- also needs meeting sign-in once that's a thing
-    if positions.filter(position__name='Membership Officer').exists():
+    if Permissions.has_current_position(user, ('Membership Officer',)):
         quick_links.append({
                 'link_name': 'Member Admin',
                 'link': reverse('member_resources:view_misc_reqs')
@@ -473,14 +542,135 @@ def get_quick_links(user):
     return quick_links
 
 
+class PermissionContext(object):
+    """ The roles of a single user that the permission checks depend on.
+
+    Each piece is loaded the first time it is needed and then kept for the
+    life of the context, which Permissions ties to the user object (and so
+    to the request for request.user).
+    """
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def profile(self):
+        if not self.user.pk:
+            return None
+        profiles = MemberProfile.objects.filter(
+                        user=self.user
+        ).select_related('status', 'standing')
+        if not profiles:
+            return None
+        return profiles[0]
+
+    @cached_property
+    def current_term(self):
+        return AcademicTerm.get_current_term()
+
+    @cached_property
+    def has_user_profile(self):
+        if self.profile:
+            return True
+        if not self.user.pk:
+            return False
+        return UserProfile.objects.filter(user=self.user).exists()
+
+    @cached_property
+    def officer_term(self):
+        term = self.current_term
+        if term.semester_type.name == 'Summer':
+            term = term.get_next_full_term()
+        return term
+
+    @cached_property
+    def current_positions(self):
+        """ Returns a dictionary mapping the position types ('O' for officers
+        and 'C' for chairs) to the names of the user's current positions.
+        """
+        positions = {'O': set(), 'C': set()}
+        if not self.profile:
+            return positions
+        officers = Officer.objects.filter(
+                        user=self.profile,
+                        term=self.officer_term,
+                        position__position_type__in=positions.keys()
+        ).values_list('position__name', 'position__position_type')
+        for name, position_type in officers:
+            positions[position_type].add(name)
+        return positions
+
+    @cached_property
+    def previous_positions(self):
+        if not self.profile:
+            return set()
+        term = self.current_term.get_previous_full_term()
+        return set(Officer.objects.filter(
+                        user=self.profile,
+                        term=term,
+                        position__position_type='O'
+        ).values_list('position__name', flat=True))
+
+    @cached_property
+    def is_project_leader(self):
+        if not self.profile:
+            return False
+        return self.profile.projectleaderlist_set.all().exists()
+
+    @cached_property
+    def led_event_ids(self):
+        """ Returns the ids of the events the user is a leader of.
+        """
+        if not self.profile:
+            return frozenset()
+        return frozenset(self.profile.event_leader.values_list(
+                                                        'id',
+                                                        flat=True
+        ))
+
+    @cached_property
+    def leads_electee_group(self):
+        if not self.profile:
+            return False
+        return ElecteeGroup.objects.filter(
+                    Q(leaders=self.profile) | Q(officers=self.profile)
+        ).exists()
+
+
 class Permissions:
+    @classmethod
+    def get_context(cls, user):
+        """ Returns the PermissionContext for the user, creating it the first
+        time the user object is checked.
+        """
+        if not hasattr(user, 'permission_context'):
+            user.permission_context = PermissionContext(user)
+        return user.permission_context
+
     @classmethod
     def get_profile(cls, user):
-        if not hasattr(user, 'userprofile'):
-            return None
-        if not user.userprofile.is_member():
-            return None
-        return user.userprofile.memberprofile
+        return cls.get_context(user).profile
+
+    @classmethod
+    def has_current_position(cls, user, names=None):
+        """ Returns whether the user currently holds one of the named officer
+        positions, or any officer position if no names are given.
+        """
+        current_positions = cls.get_context(user).current_positions['O']
+        if names is None:
+            return bool(current_positions)
+        return not current_positions.isdisjoint(names)
+
+    @classmethod
+    def has_current_chair_position(cls, user):
+        return bool(cls.get_context(user).current_positions['C'])
+
+    @classmethod
+    def has_previous_position(cls, user, names):
+        return not cls.get_context(user).previous_positions.isdisjoint(names)
+
+    @classmethod
+    def is_project_leader(cls, user):
+        return cls.get_context(user).is_project_leader
 
     @classmethod
     def can_nominate(cls, user):
@@ -512,12 +702,9 @@ class Permissions:
         profile = cls.get_profile(user)
         if not profile:
             return Officer.objects.none()
-        term = AcademicTerm.get_current_term()
-        if term.semester_type.name == 'Summer':
-            term = term.get_next_full_term()
         current_positions = Officer.objects.filter(
                                     user=profile,
-                                    term=term,
+                                    term=cls.get_context(user).officer_term,
                                     position__position_type='O'
         )
         return current_positions
@@ -527,12 +714,9 @@ class Permissions:
         profile = cls.get_profile(user)
         if not profile:
             return Officer.objects.none()
-        term = AcademicTerm.get_current_term()
-        if term.semester_type.name == 'Summer':
-            term = term.get_next_full_term()
         current_positions = Officer.objects.filter(
                                 user=profile,
-                                term=term,
+                                term=cls.get_context(user).officer_term,
                                 position__position_type='C'
         )
         return current_positions
@@ -541,16 +725,14 @@ class Permissions:
     def can_create_events(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
-        current_chairs = cls.get_current_chair_positions(user)
-        if current_chairs.exists():
+        if cls.has_current_chair_position(user):
             return True
         profile = cls.get_profile(user)
         if not profile:
             return False
-        if profile.projectleaderlist_set.all().exists():
+        if cls.is_project_leader(user):
             return True
         return False
 
@@ -558,40 +740,48 @@ class Permissions:
     def can_delete_events(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Service Coordinator') |
-                 Q(position__name='New Initiatives Officer') |
-                 Q(position__name='Vice President') |
-                 Q(position__name='Activities Officer') |
-                 Q(position__name='Graduate Student Vice President') |
-                 Q(position__name='Chapter Development Officer'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Service Coordinator',
+                     'New Initiatives Officer',
+                     'Vice President',
+                     'Activities Officer',
+                     'Graduate Student Vice President',
+                     'Chapter Development Officer')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
 
     @classmethod
     def can_edit_event(cls, event, user):
-        try:
-            if (hasattr(user, 'userprofile') and
-               user.userprofile.memberprofile in event.leaders.all()):
-                return True
-            else:
-                return cls.can_delete_events(user)
-        except ObjectDoesNotExist:
-            return False
+        return cls.can_edit_event_id(event.id, user)
+
+    @classmethod
+    def can_edit_event_id(cls, event_id, user):
+        if event_id in cls.get_context(user).led_event_ids:
+            return True
+        return cls.can_delete_events(user)
+
+    @classmethod
+    def get_editable_event_ids(cls, events, user):
+        """ Returns the ids of those of the events that the user can edit.
+        Checks the user's positions and the events they lead once for all
+        the events.
+        """
+        event_ids = set([event.id for event in events])
+        if cls.can_delete_events(user):
+            return event_ids
+        return event_ids & cls.get_context(user).led_event_ids
 
     @classmethod
     def can_update_mindset_materials(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Service Coordinator') |
-                 Q(position__name='K-12 Outreach Officer') |
-                 Q(position__name='Advisor'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Service Coordinator',
+                     'K-12 Outreach Officer',
+                     'Advisor')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -600,8 +790,7 @@ class Permissions:
     def view_officer_meetings_by_default(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         return False
 
@@ -609,13 +798,12 @@ class Permissions:
     def can_access_project_reports(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         profile = cls.get_profile(user)
         if not profile:
             return False
-        if profile.projectleaderlist_set.all().exists():
+        if cls.is_project_leader(user):
             return True
         return False
 
@@ -623,8 +811,7 @@ class Permissions:
     def can_view_meeting_feedback(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         return False
 
@@ -632,12 +819,11 @@ class Permissions:
     def can_add_external_service(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='Graduate Student Coordinator') |
-                 Q(position__name='Service Coordinator') |
-                 Q(position__name='Vice President') |
-                 Q(position__name='Graduate Student Vice President'))
-        if current_positions.filter(query).exists():
+        positions = ('Graduate Student Coordinator',
+                     'Service Coordinator',
+                     'Vice President',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -646,12 +832,11 @@ class Permissions:
     def can_upload_articles(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Historian') |
-                 Q(position__name='New Initiatives Officer') |
-                 Q(position__name='Chapter Development Officer'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Historian',
+                     'New Initiatives Officer',
+                     'Chapter Development Officer')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -660,8 +845,7 @@ class Permissions:
     def can_add_announcements(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        return current_positions.exists()
+        return cls.has_current_position(user)
 
     @classmethod
     def can_generate_announcements(cls, user):
@@ -671,9 +855,8 @@ class Permissions:
     def can_upload_minutes(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        current_chairs = cls.get_current_chair_positions(user)
-        if current_positions.exists() or current_chairs.exists():
+        if (cls.has_current_position(user) or
+           cls.has_current_chair_position(user)):
             return True
         else:
             return False
@@ -682,11 +865,10 @@ class Permissions:
     def can_post_web_article(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         profile = cls.get_profile(user)
-        if profile and profile.projectleaderlist_set.all().exists():
+        if profile and cls.is_project_leader(user):
             return True
         else:
             return False
@@ -695,10 +877,9 @@ class Permissions:
     def can_approve_web_article(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Publicity Officer'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Publicity Officer')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -712,26 +893,23 @@ class Permissions:
             return False
         if user.is_superuser:
             return True
-        if not hasattr(user, 'userprofile'):
-            return False
-        if not user.userprofile.is_member():
+        if not cls.get_profile(user):
             return False
-        current_positions = cls.get_current_officer_positions(user)
         if profile2[0].status.name == 'Electee':
-            query = (Q(position__name='President') |
-                     Q(position__name='Vice President') |
-                     Q(position__name='Graduate Student Coordinator') |
-                     Q(position__name='Graduate Student Vice President'))
-            if current_positions.filter(query).exists():
+            positions = ('President',
+                         'Vice President',
+                         'Graduate Student Coordinator',
+                         'Graduate Student Vice President')
+            if cls.has_current_position(user, positions):
                 return True
             else:
                 return False
         else:
-            query = (Q(position__name='President') |
-                     Q(position__name='Vice President') |
-                     Q(position__name='Membership Officer') |
-                     Q(position__name='Graduate Student Vice President'))
-            if current_positions.filter(query).exists():
+            positions = ('President',
+                         'Vice President',
+                         'Membership Officer',
+                         'Graduate Student Vice President')
+            if cls.has_current_position(user, positions):
                 return True
             else:
                 return False
@@ -745,34 +923,31 @@ class Permissions:
             return False
         if user.is_superuser:
             return True
-        if not hasattr(user, 'userprofile'):
-            return False
-        if not user.userprofile.is_member():
+        if not cls.get_profile(user):
             return False
-        current_positions = cls.get_current_officer_positions(user)
         if profile2[0].status.name == 'Electee':
-            query = (Q(position__name='President') |
-                     Q(position__name='Vice President') |
-                     Q(position__name='Graduate Student Coordinator') |
-                     Q(position__name='Graduate Student Vice President'))
-            if current_positions.filter(query).exists():
+            positions = ('President',
+                         'Vice President',
+                         'Graduate Student Coordinator',
+                         'Graduate Student Vice President')
+            if cls.has_current_position(user, positions):
                 return True
             elif ElecteeGroup.objects.filter(
                         members=profile2[0],
-                        leaders=user.userprofile.memberprofile).exists():
+                        leaders=cls.get_profile(user)).exists():
                 return True
             elif ElecteeGroup.objects.filter(
                         members=profile2,
-                        officers=user.userprofile.memberprofile).exists():
+                        officers=cls.get_profile(user)).exists():
                 return True
             else:
                 return False
         else:
-            query = (Q(position__name='President') |
-                     Q(position__name='Vice President') |
-                     Q(position__name='Membership Officer') |
-                     Q(position__name='Graduate Student Vice President'))
-            if current_positions.filter(query).exists():
+            positions = ('President',
+                         'Vice President',
+                         'Membership Officer',
+                         'Graduate Student Vice President')
+            if cls.has_current_position(user, positions):
                 return True
             else:
                 return False
@@ -781,20 +956,16 @@ class Permissions:
     def can_view_more_than_own_progress(cls, user):
         if user.is_superuser:
             return True
-        if (not hasattr(user, 'userprofile') or
-           not user.userprofile.is_member()):
+        if not cls.get_profile(user):
             return False
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Vice President') |
-                 Q(position__name='Graduate Student Coordinator') |
-                 Q(position__name='Membership Officer') |
-                 Q(position__name='Graduate Student Vice President'))
-        query2 = (Q(leaders=user.userprofile.memberprofile) |
-                  Q(officers=user.userprofile.memberprofile))
-        if current_positions.filter(query).exists():
-            return True
-        elif ElecteeGroup.objects.filter(query2).exists():
+        positions = ('President',
+                     'Vice President',
+                     'Graduate Student Coordinator',
+                     'Membership Officer',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
+            return True
+        elif cls.get_context(user).leads_electee_group:
                 return True
         else:
             return False
@@ -805,10 +976,8 @@ class Permissions:
         if user.is_superuser:
             return ProjectReport.objects.filter(
                         term__in=terms).distinct().order_by('name')
-        current_positions = cls.get_current_officer_positions(user)
-        previous_positions = cls.get_previous_officer_positions(user)
-        if (current_positions.filter(position__name='Secretary').exists() or
-           previous_positions.filter(position__name='Secretary').exists()):
+        if (cls.has_current_position(user, ('Secretary',)) or
+           cls.has_previous_position(user, ('Secretary',))):
             return ProjectReport.objects.filter(
                                 term__in=terms).distinct().order_by('name')
         profile = cls.get_profile(user)
@@ -817,6 +986,8 @@ class Permissions:
         query = Q()
         events = CalendarEvent.objects.filter(term__in=terms).filter(
                                                 ~Q(project_report=None))
+        current_positions = cls.get_current_officer_positions(
+                                        user).select_related('position')
         for position in current_positions:
             query = query | Q(assoc_officer=position.position)
         query = query | Q(leaders=profile)
@@ -829,22 +1000,21 @@ class Permissions:
     def profiles_you_can_view(cls, user):
         if user.is_superuser:
             return MemberProfile.get_members()
-        current_positions = cls.get_current_officer_positions(user)
-        query_all = (Q(position__name='President') |
-                     Q(position__name='Vice President') |
-                     Q(position__name='Graduate Student Vice President'))
-        query_actives = Q(position__name='Membership Officer')
-        query_electees = Q(position__name='Graduate Student Coordinator')
-        query_electee_groups = (Q(leaders=user.userprofile.memberprofile) |
-                                Q(officers=user.userprofile.memberprofile))
+        positions_all = ('President',
+                         'Vice President',
+                         'Graduate Student Vice President')
+        query_electee_groups = (Q(leaders=cls.get_profile(user)) |
+                                Q(officers=cls.get_profile(user)))
         query_out = MemberProfile.objects.none()
-        if current_positions:
-            if current_positions.filter(query_all).exists():
+        if cls.has_current_position(user):
+            if cls.has_current_position(user, positions_all):
                 return MemberProfile.get_members()
-            if current_positions.filter(query_actives).exists():
+            if cls.has_current_position(user, ('Membership Officer',)):
                 query_out = query_out | MemberProfile.get_actives()
-            if current_positions.filter(query_electees).exists():
+            if cls.has_current_position(user, ('Graduate Student Coordinator',)):
                 query_out = query_out | MemberProfile.get_electees()
+        if not cls.get_context(user).leads_electee_group:
+            return query_out
 
         electee_groups_led = ElecteeGroup.objects.filter(
                                 query_electee_groups
@@ -860,9 +1030,8 @@ class Permissions:
             return True
         if cls.can_manage_active_progress(user):
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_other_people = Q(position__name='Service Coordinator')
-        if current_positions.filter(query_other_people).exists():
+        positions = ('Service Coordinator',)
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -871,12 +1040,11 @@ class Permissions:
     def can_manage_active_progress(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_actives = (Q(position__name='President') |
-                         Q(position__name='Vice President') |
-                         Q(position__name='Membership Officer') |
-                         Q(position__name='Graduate Student Vice President'))
-        if current_positions.filter(query_actives).exists():
+        positions = ('President',
+                     'Vice President',
+                     'Membership Officer',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -885,9 +1053,8 @@ class Permissions:
     def can_download_active_status(cls, user):
         if cls.can_manage_active_progress(user):
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_actives = Q(position__name='Secretary')
-        if current_positions.filter(query_actives).exists():
+        positions = ('Secretary',)
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -896,12 +1063,11 @@ class Permissions:
     def can_manage_electee_progress(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_electees = (Q(position__name='President') |
-                          Q(position__name='Vice President') |
-                          Q(position__name='Graduate Student Coordinator') |
-                          Q(position__name='Graduate Student Vice President'))
-        if current_positions.filter(query_electees).exists():
+        positions = ('President',
+                     'Vice President',
+                     'Graduate Student Coordinator',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -910,9 +1076,8 @@ class Permissions:
     def can_add_electee_members(cls, user):
         if cls.can_manage_electee_progress(user):
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_add_electees = Q(position__name='Secretary')
-        if current_positions.filter(query_add_electees).exists():
+        positions = ('Secretary',)
+        if cls.has_current_position(user, positions):
             return True
         return False
 
@@ -924,12 +1089,9 @@ class Permissions:
     def can_process_project_reports(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        previous_positions = cls.get_previous_officer_positions(user)
-        query = Q(position__name='Secretary')
-        if current_positions.filter(query).exists():
+        if cls.has_current_position(user, ('Secretary',)):
             return True
-        if previous_positions.filter(query).exists():
+        if cls.has_previous_position(user, ('Secretary',)):
             return True
         return False
 
@@ -937,10 +1099,9 @@ class Permissions:
     def can_change_ugrad_electee_requirements(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_positions = (Q(position__name='President') |
-                           Q(position__name='Vice President'))
-        if current_positions.filter(query_positions).exists():
+        positions = ('President',
+                     'Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -968,11 +1129,10 @@ class Permissions:
     def can_approve_tutoring(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_dues = (Q(position__name='President') |
-                      Q(position__name='Service Coordinator') |
-                      Q(position__name='Campus Outreach Officer'))
-        if current_positions.filter(query_dues).exists():
+        positions = ('President',
+                     'Service Coordinator',
+                     'Campus Outreach Officer')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -981,10 +1141,9 @@ class Permissions:
     def can_manage_finances(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_dues = (Q(position__name='President') |
-                      Q(position__name='Treasurer'))
-        if current_positions.filter(query_dues).exists():
+        positions = ('President',
+                     'Treasurer')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -993,12 +1152,11 @@ class Permissions:
     def can_manage_electee_paperwork(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_dues = (Q(position__name='President') |
-                      Q(position__name='Vice President') |
-                      Q(position__name='Graduate Student Coordinator') |
-                      Q(position__name='Graduate Student Vice President'))
-        if current_positions.filter(query_dues).exists():
+        positions = ('President',
+                     'Vice President',
+                     'Graduate Student Coordinator',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -1007,13 +1165,12 @@ class Permissions:
     def can_view_background_forms(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_forms = (Q(position__name='President') |
-                       Q(position__name='Secretary') |
-                       Q(position__name='Vice President') |
-                       Q(position__name='Graduate Student Coordinator') |
-                       Q(position__name='Graduate Student Vice President'))
-        if current_positions.filter(query_forms).exists():
+        positions = ('President',
+                     'Secretary',
+                     'Vice President',
+                     'Graduate Student Coordinator',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -1029,8 +1186,7 @@ class Permissions:
     def can_manage_project_leaders(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         return False
 
@@ -1038,10 +1194,9 @@ class Permissions:
     def can_manage_officers(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query_officers = (Q(position__name='President') |
-                          Q(position__name='Website Officer'))
-        if current_positions.filter(query_officers).exists():
+        positions = ('President',
+                     'Website Officer')
+        if cls.has_current_position(user, positions):
             return True
         return False
 
@@ -1061,11 +1216,10 @@ class Permissions:
     def can_view_pending_events(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Secretary') |
-                 Q(position__name='Service Coordinator'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Secretary',
+                     'Service Coordinator')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -1074,11 +1228,10 @@ class Permissions:
     def can_view_missing_reports(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Secretary') |
-                 Q(position__name='Service Coordinator'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Secretary',
+                     'Service Coordinator')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -1087,12 +1240,11 @@ class Permissions:
     def can_edit_corporate_page(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Corporate Relations Officer') |
-                 Q(position__name='Professional Development Officer') |
-                 Q(position__name='External Vice President'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Corporate Relations Officer',
+                     'Professional Development Officer',
+                     'External Vice President')
+        if cls.has_current_position(user, positions):
             return True
         else:
             return False
@@ -1101,8 +1253,7 @@ class Permissions:
     def can_add_corporate_contact(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         else:
             return False
@@ -1111,10 +1262,7 @@ class Permissions:
     def can_add_company(cls, user):
         if user.is_superuser:
             return True
-        p = cls.get_profile(user)
-        if not p:
-            return False
-        if p.is_member():
+        if cls.get_profile(user):
             return True
         return False
 
@@ -1122,10 +1270,7 @@ class Permissions:
     def can_add_event_photo(cls, user):
         if user.is_superuser:
             return True
-        p = cls.get_profile(user)
-        if not p:
-            return False
-        if p.is_member():
+        if cls.get_profile(user):
             return True
         return False
 
@@ -1134,26 +1279,20 @@ class Permissions:
         p = cls.get_profile(user)
         if not p:
             return False
-        if not p.is_member():
-            return False
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Vice President') |
-                 Q(position__name='Graduate Student Vice President'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Vice President',
+                     'Graduate Student Vice President')
+        if cls.has_current_position(user, positions):
             return True
-        if p.memberprofile.status.name == 'Electee':
+        if p.status.name == 'Electee':
             return True
         return False
 
     @classmethod
     def can_view_interview_pairings(cls, user):
-        p = cls.get_profile(user)
-        if not p:
-            return False
-        if not p.is_member():
+        if not cls.get_profile(user):
             return False
         else:
             return True
@@ -1163,19 +1302,16 @@ class Permissions:
         p = cls.get_profile(user)
         if not p:
             return False
-        if not p.is_member():
-            return False
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         # switch flipped part
         try:
             vis = ElecteeProcessVisibility.objects.get(
-                        term=AcademicTerm.get_current_term()
+                        term=cls.get_context(user).current_term
             )
-            if vis.followups_visible and p.is_active():
+            if vis.followups_visible and p.status.name == 'Active':
                 return True
             return False
         except ObjectDoesNotExist:
@@ -1191,8 +1327,7 @@ class Permissions:
 
     @classmethod
     def can_create_thread(cls, user):
-        if (not hasattr(user, 'userprofile') or
-           not user.userprofile.is_member()):
+        if not cls.get_profile(user):
             return False
         return True
 
@@ -1202,8 +1337,7 @@ class Permissions:
             return False
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         return False
 
@@ -1211,11 +1345,10 @@ class Permissions:
     def can_manage_background_checks(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Service Coordinator') |
-                 Q(position__name='K-12 Outreach Officer'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Service Coordinator',
+                     'K-12 Outreach Officer')
+        if cls.has_current_position(user, positions):
             return True
         return False
 
@@ -1223,10 +1356,9 @@ class Permissions:
     def can_view_demographics(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        query = (Q(position__name='President') |
-                 Q(position__name='Membership Officer'))
-        if current_positions.filter(query).exists():
+        positions = ('President',
+                     'Membership Officer')
+        if cls.has_current_position(user, positions):
             return True
         return False
 
@@ -1234,8 +1366,7 @@ class Permissions:
     def can_manage_committees(cls, user):
         if user.is_superuser:
             return True
-        current_positions = cls.get_current_officer_positions(user)
-        if current_positions.exists():
+        if cls.has_current_position(user):
             return True
         return False
 
@@ -1267,3 +1398,232 @@ class UnicodeWriter:
     def writerows(self, rows):
         for row in rows:
             self.writerow(row)
+
+
+class CSVBuffer:
+    """ A write-only stream that holds what is written until it is drained.
+
+    Lets a UnicodeWriter produce chunks for a streaming response.
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def drain(self):
+        data = ''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iterate_in_chunks(queryset, chunk_size=CSV_CHUNK_SIZE):
+    """ Yields lists of at most chunk_size objects from the queryset.
+
+    The rows are read with iterator() so the full result is never cached,
+    and each chunk is small enough to bulk-load related data for.
+    """
+    chunk = []
+    for obj in queryset.iterator():
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_csv(rows):
+    writer_buffer = CSVBuffer()
+    writer = UnicodeWriter(writer_buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield writer_buffer.drain()
+
+
+def get_csv_response(filename, rows):
+    """ Returns a streaming CSV download of the rows.
+
+    The rows can be any iterable of lists of unicode strings, ideally a
+    generator, so that the first bytes go out before the later rows have
+    been computed.
+    """
+    response = StreamingHttpResponse(
+                    generate_csv(rows),
+                    content_type='text/csv'
+    )
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (filename)
+    return response
+
+
+def get_file_hash(path):
+    """ Returns the SHA-1 hex digest of the file's contents. """
+    file_hash = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), ''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_synced_files(location):
+    """ Returns the set of paths, relative to the directory, of the files in
+    a directory kept by sync_directory.
+    """
+    synced_files = set()
+    for root, dirs, files in os.walk(location):
+        for file_name in files:
+            relative_path = os.path.relpath(os.path.join(root, file_name),
+                                            location)
+            if relative_path != SYNC_MANIFEST_NAME:
+                synced_files.add(relative_path)
+    return synced_files
+
+
+def sync_directory(location, entries, directories=()):
+    """ Makes the directory hold exactly the given files and returns what
+    changed, as a dictionary of the sorted relative paths 'added',
+    'replaced' and 'removed'.
+
+    The entries map paths relative to the directory to the files to copy
+    there. A manifest in the directory records the source, size, mtime and
+    content hash of each copied file, so a file is only copied when its
+    source changed (and a source that was merely touched is not copied
+    again). Files that are no longer listed are removed, along with empty
+    folders other than the given directories.
+    """
+    manifest_path = os.path.join(location, SYNC_MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (IOError, ValueError):
+        manifest = {}
+    changes = {'added': [], 'replaced': [], 'removed': []}
+    on_disk = get_synced_files(location)
+    new_manifest = {}
+    for relative_path, source in entries.iteritems():
+        source_stat = os.stat(source)
+        record = {
+            'source': source,
+            'size': source_stat.st_size,
+            'mtime': source_stat.st_mtime,
+        }
+        previous = manifest.get(relative_path)
+        is_current = previous and relative_path in on_disk
+        if (is_current and
+           all(previous.get(key) == record[key] for key in record)):
+            new_manifest[relative_path] = previous
+            continue
+        record['hash'] = get_file_hash(source)
+        new_manifest[relative_path] = record
+        if is_current and previous.get('hash') == record['hash']:
+            continue
+        destination = os.path.join(location, relative_path)
+        if not os.path.exists(os.path.dirname(destination)):
+            os.makedirs(os.path.dirname(destination))
+        shutil.copy(source, destination)
+        if relative_path in on_disk:
+            changes['replaced'].append(relative_path)
+        else:
+            changes['added'].append(relative_path)
+    for relative_path in on_disk.difference(entries):
+        os.remove(os.path.join(location, relative_path))
+        changes['removed'].append(relative_path)
+    for directory in directories:
+        if not os.path.exists(os.path.join(location, directory)):
+            os.makedirs(os.path.join(location, directory))
+    kept_directories = set(
+            os.path.normpath(os.path.join(location, directory))
+            for directory in directories
+    )
+    for root, dirs, files in os.walk(location, topdown=False):
+        if (root != location and root not in kept_directories and
+           not os.listdir(root)):
+            os.rmdir(root)
+    if not os.path.exists(location):
+        os.makedirs(location)
+    with open(manifest_path, 'w') as f:
+        json.dump(new_manifest, f)
+    for paths in changes.values():
+        paths.sort()
+    return changes
+
+
+def update_zip(zip_path, location, changes):
+    """ Brings the zip of the synced directory up to date with the changes
+    returned by sync_directory.
+
+    Added files are appended to the existing zip, as long as it then holds
+    exactly the directory's files. Since files cannot be removed from a zip,
+    anything else means the zip is written afresh, to a temporary file that
+    then takes its place.
+    """
+    synced_files = get_synced_files(location)
+    if (os.path.exists(zip_path) and not changes['replaced'] and
+       not changes['removed']):
+        added = set(changes['added'])
+        zip_f = zipfile.ZipFile(zip_path, 'a', allowZip64=True)
+        names = set(zip_f.namelist())
+        if not (names & added) and (names | added) == synced_files:
+            for relative_path in changes['added']:
+                zip_f.write(os.path.join(location, relative_path),
+                            relative_path)
+            zip_f.close()
+            return
+        zip_f.close()
+    temporary_path = zip_path + '.tmp'
+    zip_f = zipfile.ZipFile(temporary_path, 'w', allowZip64=True)
+    for relative_path in sorted(synced_files):
+        zip_f.write(os.path.join(location, relative_path), relative_path)
+    zip_f.close()
+    os.rename(temporary_path, zip_path)
+
+
+class ZipBuffer(CSVBuffer):
+    """ A write-only stream that holds what is written until it is drained,
+    and knows how much has been written so that a ZipFile can write to it.
+    """
+    def __init__(self):
+        CSVBuffer.__init__(self)
+        self.position = 0
+
+    def write(self, data):
+        CSVBuffer.write(self, data)
+        self.position += len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+
+def generate_zip(entries):
+    """ Yields a zip of the files piece by piece, one file at a time.
+
+    The entries are (name in the zip, path) pairs. Each file is read whole
+    and stored uncompressed, which suits PDFs, so nothing needs to seek.
+    """
+    zip_buffer = ZipBuffer()
+    zip_f = zipfile.ZipFile(zip_buffer, 'w', allowZip64=True)
+    for name, path in entries:
+        with open(path, 'rb') as f:
+            data = f.read()
+        modified = datetime.fromtimestamp(os.path.getmtime(path))
+        info = zipfile.ZipInfo(name, modified.timetuple()[:6])
+        info.external_attr = 0644 << 16
+        zip_f.writestr(info, data)
+        yield zip_buffer.drain()
+    zip_f.close()
+    yield zip_buffer.drain()
+
+
+def get_zip_response(filename, entries):
+    """ Returns a streaming zip download of the (name in the zip, path)
+    entries, built as it is sent rather than ahead of time.
+    """
+    response = StreamingHttpResponse(
+                    generate_zip(entries),
+                    content_type='application/zip'
+    )
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (filename)
+    return response
@@ -1,16 +1,32 @@
+from django.core.cache import cache
+
 from member_resources.models import ActiveList, GradElecteeList, UndergradElecteeList
-from mig_main.models import UserProfile, MemberProfile
-from mig_main.utility import get_dropdowns
+from mig_main.models import UserProfile, get_membership_version
+from mig_main.utility import Permissions, get_dropdowns
 from migweb.settings import DEBUG
-def profile_setup(request):
-    profile = MemberProfile.objects.filter(uniqname=request.user.username)
-    if profile.exists():
-        if profile.filter(status__name='Active').exists():
+
+ANONYMOUS_PROFILE_INFO = {'is_active_member':False,
+                          'is_ugrad_electee':False,
+                          'is_grad_electee':False,
+                          'needs_profile':True}
+
+
+def get_membership_info(user):
+    """ Returns the membership classification used by profile_setup.
+
+    Members are classified from the profile Permissions has already loaded
+    for the request. Everyone else is checked against the member lists, and
+    that result is cached briefly under the membership version, which
+    changes whenever a profile or a list changes.
+    """
+    profile = Permissions.get_profile(user)
+    if profile:
+        if profile.status.name == 'Active':
             return {'is_active_member':True,
                 'is_ugrad_electee':False,
                 'is_grad_electee':False,
                 'needs_profile':False}
-        elif profile.filter(standing__name='Undergraduate').exists():
+        elif profile.standing.name == 'Undergraduate':
             return {'is_active_member':False,
                 'is_ugrad_electee':True,
                 'is_grad_electee':False,
@@ -20,16 +36,26 @@ def profile_setup(request):
                 'is_ugrad_electee':False,
                 'is_grad_electee':True,
                 'needs_profile':False}
-
-    is_active_member = ActiveList.objects.filter(uniqname=request.user.username).exists()
-    is_ugrad_electee = UndergradElecteeList.objects.filter(uniqname=request.user.username).exists()
-    is_grad_electee = GradElecteeList.objects.filter(uniqname=request.user.username).exists()
+    cache_key = 'PROFILE_SETUP_%s_%s' % (get_membership_version(), user.username)
+    membership_info = cache.get(cache_key, None)
+    if membership_info is not None:
+        return membership_info
+    is_active_member = ActiveList.objects.filter(uniqname=user.username).exists()
+    is_ugrad_electee = UndergradElecteeList.objects.filter(uniqname=user.username).exists()
+    is_grad_electee = GradElecteeList.objects.filter(uniqname=user.username).exists()
     needs_member_profile = is_active_member or is_ugrad_electee or is_grad_electee
-    needs_profile = not UserProfile.objects.filter(uniqname=request.user.username).exists() or needs_member_profile
-    return {'is_active_member':is_active_member,
+    needs_profile = not Permissions.get_context(user).has_user_profile or needs_member_profile
+    membership_info = {'is_active_member':is_active_member,
             'is_ugrad_electee':is_ugrad_electee,
             'is_grad_electee':is_grad_electee,
             'needs_profile':needs_profile}
+    cache.set(cache_key, membership_info, 60*5)
+    return membership_info
+
+def profile_setup(request):
+    if not request.user.is_authenticated():
+        return dict(ANONYMOUS_PROFILE_INFO)
+    return get_membership_info(request.user)
 
 def debug_features(request):
     return {'debug_features':DEBUG}
@@ -4,6 +4,11 @@ DEBUG = False
 DEBUG_user = ''
 OTHER_APPS=()
 invalid_template_string=''
+# Site email is queued in the database and sent by the send_queued_email
+# command through OUTBOX_EMAIL_BACKEND. local_settings can point that at the
+# console or file backends for testing.
+EMAIL_BACKEND = 'mig_main.mail.QueuedEmailBackend'
+OUTBOX_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 try:
     from local_settings import *
 except ImportError:
@@ -187,7 +192,8 @@ LOGGING = {
         'mail_admins': {
             'level': 'ERROR',
             'filters': ['require_debug_false'],
-            'class': 'django.utils.log.AdminEmailHandler'
+            'class': 'django.utils.log.AdminEmailHandler',
+            'email_backend': OUTBOX_EMAIL_BACKEND,
         }
     },
     'loggers': {
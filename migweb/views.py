@@ -2,7 +2,6 @@
 import json
 from os.path import isfile
 
-from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.contrib.auth import logout, login
 from django.contrib.auth.models import User
@@ -15,6 +14,7 @@ from django_ajax.decorators import ajax
 import tweepy
 
 from event_cal.models import CalendarEvent, EventPhoto
+from event_cal.views import get_upcoming_events_html
 from history.models import WebsiteArticle
 from mig_main.models import SlideShowPhoto
 from mig_main.utility import get_quick_links, get_message_dict
@@ -52,26 +52,18 @@ def home(request):
     request.session['current_page'] = request.path
     slideshow_photos = SlideShowPhoto.objects.filter(active=True)
     now = timezone.localtime(timezone.now())
-    upcoming_events = CalendarEvent.get_upcoming_events()
     web_articles = WebsiteArticle.get_stories()[:3]
-    upcoming_html = cache.get('upcoming_events_html', None)
-    if not upcoming_html:
-        upcoming_html = loader.render_to_string(
-                            'event_cal/upcoming_events.html',
-                            {'upcoming_events': upcoming_events, 'now': now}
-                        )
-        cache.set('upcoming_events_html', upcoming_html)
     template = loader.get_template('home.html')
     context_dict = {
-        'upcoming_events': upcoming_html,
+        'upcoming_events': get_upcoming_events_html(),
         'web_articles': web_articles,
         'current_time': now,
         'request': request,
         'quick_links': get_quick_links(request.user),
         'slideshow_photos': slideshow_photos,
-        'current_meetings': CalendarEvent.objects.filter(
-                                CalendarEvent.get_current_meeting_query()
-                            ),
+        'current_meetings': CalendarEvent.get_upcoming_feed()[
+                                                        'current_meetings'
+                            ],
         'needs_social_media': True,
         }
     context_dict.update(get_common_context(request))
@@ -4,6 +4,7 @@ from django.core.validators import RegexValidator, MinValueValidator
 from django.db import models
 from stdimage import StdImageField
 
+from mig_main.models import invalidate_nav_dropdowns
 from mig_main.pdf_field import ContentTypeRestrictedFileField, pdf_types
 
 presentation_types = pdf_types + [
@@ -163,6 +164,14 @@ class OutreachEventType(models.Model):
     def __unicode__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        super(OutreachEventType, self).save(*args, **kwargs)
+        invalidate_nav_dropdowns()
+
+    def delete(self, *args, **kwargs):
+        super(OutreachEventType, self).delete(*args, **kwargs)
+        invalidate_nav_dropdowns()
+
     def get_tab_name(self):
         if self.tab_name:
             return self.tab_name
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mig_main.models import AcademicTerm
+from requirements.models import ProgressRollup
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the progress rollup totals from the progress items and '
+            'verifies that they match.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--term',
+                type=int,
+                dest='term_id',
+                default=None,
+                help='Only rebuild/verify the term with this id.'
+        )
+        parser.add_argument(
+                '--verify-only',
+                action='store_true',
+                dest='verify_only',
+                default=False,
+                help='Check the stored totals without rebuilding them.'
+        )
+
+    def handle(self, *args, **options):
+        term = None
+        if options['term_id']:
+            try:
+                term = AcademicTerm.objects.get(id=options['term_id'])
+            except AcademicTerm.DoesNotExist:
+                raise CommandError('No term with id %d' % options['term_id'])
+        if not options['verify_only']:
+            ProgressRollup.rebuild(term)
+        discrepancies = ProgressRollup.find_discrepancies(term)
+        for member_id, term_id, category, expected, stored in discrepancies:
+            self.stdout.write(
+                    '%s (term %d) %s: expected %s/%s, stored %s/%s' % (
+                        member_id,
+                        term_id,
+                        category,
+                        expected['full'],
+                        expected['sat'],
+                        stored['full'],
+                        stored['sat']
+                    )
+            )
+        if discrepancies:
+            raise CommandError(
+                    '%d progress rollups do not match the progress items.' % (
+                        len(discrepancies)
+                    )
+            )
+        self.stdout.write('Progress rollups verified.')
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:34
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    EventCategory = apps.get_model('requirements', 'EventCategory')
+    ProgressItem = apps.get_model('requirements', 'ProgressItem')
+    ProgressRollup = apps.get_model('requirements', 'ProgressRollup')
+    parents = dict(EventCategory.objects.values_list('id', 'parent_category_id'))
+    saturated_amount = Case(
+                When(amount_completed__gt=15, then=Value(15)),
+                default=F('amount_completed'),
+                output_field=DecimalField(max_digits=5, decimal_places=2)
+    )
+    totals = ProgressItem.objects.values_list(
+                'member_id',
+                'term_id',
+                'event_type_id'
+    ).annotate(
+                full=Sum('amount_completed'),
+                sat=Sum(saturated_amount)
+    ).order_by()
+    rolled_up = {}
+    for member_id, term_id, category_id, full, sat in totals:
+        while category_id is not None:
+            key = (member_id, term_id, category_id)
+            if key in rolled_up:
+                rolled_up[key]['full'] += full
+                rolled_up[key]['sat'] += sat
+            else:
+                rolled_up[key] = {'full': full, 'sat': sat}
+            category_id = parents.get(category_id)
+    ProgressRollup.objects.bulk_create(
+        [
+            ProgressRollup(
+                member_id=member_id,
+                term_id=term_id,
+                event_category_id=category_id,
+                full=amounts['full'],
+                sat=amounts['sat']
+            )
+            for (member_id, term_id, category_id), amounts
+            in rolled_up.items()
+        ],
+        batch_size=500
+    )
+
+
+def clear_rollups(apps, schema_editor):
+    ProgressRollup = apps.get_model('requirements', 'ProgressRollup')
+    ProgressRollup.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mig_main', '0014_auto_20160103_1812'),
+        ('requirements', '0006_auto_20140925_2212'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('sat', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('event_category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='requirements.EventCategory')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mig_main.MemberProfile')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mig_main.AcademicTerm')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='progressrollup',
+            unique_together=set([('member', 'term', 'event_category')]),
+        ),
+        migrations.RunPython(build_rollups, clear_rollups),
+    ]
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 15:13
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mig_main', '0015_outgoingemail'),
+        ('event_cal', '0024_googlecalendarchange'),
+        ('requirements', '0007_progressrollup'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='progressitem',
+            index_together=set([('related_event', 'member')]),
+        ),
+    ]
@@ -1,12 +1,84 @@
+from collections import namedtuple
+
 from django.core.cache import cache
 from django.core.validators import RegexValidator, MinValueValidator
-from django.db import models
-from django.db.models import Q
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.query import QuerySet
+from django.db.models.signals import m2m_changed, post_delete
+from django.dispatch import receiver
+from uuid import uuid4
+
+from mig_main.models import (
+            MemberProfile,
+            TermRegistry,
+            invalidate_nav_dropdowns,
+)
+
+# The most hours a single progress item can count toward PA status.
+SATURATION_LIMIT = 15
+# How many stored totals apply_totals reads and writes per batch.
+ROLLUP_BATCH_SIZE = 300
+# How long a requirement tree stays cached under its version.
+REQUIREMENT_TREE_TIMEOUT = 60*60*5
+
+
+# Versions for the cached progress table. The table version covers the
+# distinctions and requirements, the row versions cover each member's progress.
+PROGRESS_TABLE_VERSION_KEY = 'PROGRESS_TABLE_VERSION'
+PROGRESS_ROW_VERSION_PREFIX = 'PROGRESS_ROW_VERSION_'
+# The cached closure of the event category tree. Saving a category only
+# clears the cache of the process that saved it, so other processes pick up
+# the change when their copy times out.
+EVENT_CATEGORY_TREE_KEY = 'EVENT_CATEGORY_TREE'
+EVENT_CATEGORY_TREE_TIMEOUT = 60
 
-from mig_main.models import MemberProfile
 
 def saturate_hours(value):
-    return min(value, 15)
+    return min(value, SATURATION_LIMIT)
+
+
+def get_progress_table_version():
+    """ Returns the current version of the progress table's requirements.
+
+    A missing version is replaced with a fresh one so that entries cached
+    under an evicted version can never be picked back up.
+    """
+    version = cache.get(PROGRESS_TABLE_VERSION_KEY)
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(PROGRESS_TABLE_VERSION_KEY, version, None):
+            version = cache.get(PROGRESS_TABLE_VERSION_KEY, version)
+    return version
+
+
+def get_progress_row_versions(uniqnames):
+    """ Returns a dictionary mapping each uniqname to the current version of
+    that member's progress row.
+    """
+    keys = {PROGRESS_ROW_VERSION_PREFIX + uniqname: uniqname
+            for uniqname in uniqnames}
+    versions = cache.get_many(keys.keys())
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_progress_table():
+    cache.set(PROGRESS_TABLE_VERSION_KEY, uuid4().hex, None)
+
+
+def invalidate_category_tree():
+    cache.delete(EVENT_CATEGORY_TREE_KEY)
+
+
+def invalidate_progress_rows(uniqnames):
+    cache.set_many({
+            PROGRESS_ROW_VERSION_PREFIX + uniqname: uuid4().hex
+            for uniqname in uniqnames
+    }, None)
 
 # Create your models here.
 class DistinctionType(models.Model):
@@ -25,38 +97,48 @@ class DistinctionType(models.Model):
 
     def save(self, *args, **kwargs):
         super(DistinctionType, self).save(*args, **kwargs)
-        cache.delete_many([
-                'PROGRESS_TABLE_ACTIVE_DIST',
-                'PROGRESS_TABLE_UGRADEL_DIST',
-                'PROGRESS_TABLE_GRADEL_DIST'
-        ])
+        invalidate_progress_table()
 
     def delete(self, *args, **kwargs):
         super(DistinctionType, self).delete(*args, **kwargs)
-        cache.delete_many([
-                'PROGRESS_TABLE_ACTIVE_DIST',
-                'PROGRESS_TABLE_UGRADEL_DIST',
-                'PROGRESS_TABLE_GRADEL_DIST'
-        ])
+        invalidate_progress_table()
 
     def get_actives_with_status(self, term, temp_active_ok=False):
-        query =  Q(distinction_type=self) & Q(term=term.semester_type)
-        requirements = Requirement.objects.filter(query)
-        unflattened_reqs = Requirement.package_requirements(requirements)
-        active_profiles = MemberProfile.get_actives() 
-        actives_with_status = []
-        for profile in active_profiles:
-            packaged_progress = ProgressItem.package_progress(ProgressItem.objects.filter(member=profile,term=term))
-            amount_req = 0;
-            amount_has = 0;
-            has_dist = self.has_distinction_met(packaged_progress, unflattened_reqs, temp_active_ok)
-            if has_dist:
-                actives_with_status.append(profile)
-        return actives_with_status
-
-    def has_distinction_met(self, progress, sorted_reqs, temp_active_ok=False):
-        has_dist = True
-        for event_category,data in sorted_reqs.items():
+        return self.get_members_with_status(
+                        MemberProfile.get_actives(),
+                        term,
+                        temp_active_ok
+        )
+
+    def get_members_with_status(self, profiles, term, temp_active_ok=False):
+        """ Returns a list of the profiles that have met this distinction in
+        the given term.
+
+        The term's progress is loaded for all of the profiles at once and the
+        requirement tree is shared with the progress pages, so the number of
+        queries does not grow with the number of members.
+        """
+        requirement_tree = Requirement.get_requirement_tree(
+                                                [self],
+                                                term.semester_type
+        )
+        progress = ProgressRollup.package_progress_by_member(term, profiles)
+        members_with_status = []
+        for profile in profiles:
+            if self.has_distinction_met(
+                        progress.get(profile.uniqname, {}),
+                        requirement_tree,
+                        temp_active_ok):
+                members_with_status.append(profile)
+        return members_with_status
+
+    def has_distinction_met(self, progress, requirement_tree,
+                            temp_active_ok=False):
+        """ Returns True if the packaged progress meets this distinction's
+        requirements in the tree from Requirement.get_requirement_tree.
+        """
+        for node in requirement_tree:
+            event_category = node.event_category
             if event_category in progress:
                 if self.name=="Prestigious Active":
                     amount = progress[event_category]['sat']
@@ -65,20 +147,17 @@ class DistinctionType(models.Model):
 
             else:
                 amount = 0
-            req = data["requirements"].filter(distinction_type=self)
-            amount_req = 0
-            if req:
-                amount_req = req[0].amount_required
+            amount_req = node.get_amount(self.id)
+            if amount_req is not None:
                 if temp_active_ok and event_category.name == 'Meeting Attendance':
                     amount_req-=1
                 if temp_active_ok and event_category.name == 'Voting Meeting Attendance':
                     amount_req=0
-            if amount_req > amount:
-                return False
-            has_dist = has_dist and self.has_distinction_met(progress, data["children"], temp_active_ok)
-            if not has_dist:
+                if amount_req > amount:
+                    return False
+            if not self.has_distinction_met(progress, node.children, temp_active_ok):
                 return False
-        return has_dist
+        return True
 
 
 class SemesterType(models.Model):
@@ -143,37 +222,55 @@ class SemesterType(models.Model):
             res += 2
         return res
 
+    @classmethod
+    def get_by_name(cls, name):
+        """ Returns the semester type with the given name, from the term
+        registry when it is loaded there.
+        """
+        semester_type = TermRegistry.get_semester_type(name)
+        if semester_type:
+            return semester_type
+        return cls.objects.get(name=name)
+
+    def save(self, *args, **kwargs):
+        super(SemesterType, self).save(*args, **kwargs)
+        TermRegistry.invalidate()
+
+    def delete(self, *args, **kwargs):
+        super(SemesterType, self).delete(*args, **kwargs)
+        TermRegistry.invalidate()
+
     def get_previous_type(self):
         if self.name == 'Fall':
-            return self.__class__.objects.get(name='Summer')
+            return self.__class__.get_by_name('Summer')
         if self.name == 'Summer':
-            return self.__class__.objects.get(name='Winter')
+            return self.__class__.get_by_name('Winter')
         if self.name == 'Winter':
-            return self.__class__.objects.get(name='Fall')
+            return self.__class__.get_by_name('Fall')
 
     def get_previous_full_type(self):
         if self.name == 'Fall':
-            return self.__class__.objects.get(name='Winter')
+            return self.__class__.get_by_name('Winter')
         if self.name == 'Summer':
-            return self.__class__.objects.get(name='Winter')
+            return self.__class__.get_by_name('Winter')
         if self.name == 'Winter':
-            return self.__class__.objects.get(name='Fall')
+            return self.__class__.get_by_name('Fall')
 
     def get_next_type(self):
         if self.name == 'Fall':
-            return self.__class__.objects.get(name='Winter')
+            return self.__class__.get_by_name('Winter')
         if self.name == 'Summer':
-            return self.__class__.objects.get(name='Fall')
+            return self.__class__.get_by_name('Fall')
         if self.name == 'Winter':
-            return self.__class__.objects.get(name='Summer')
+            return self.__class__.get_by_name('Summer')
 
     def get_next_full_type(self):
         if self.name == 'Fall':
-            return self.__class__.objects.get(name='Winter')
+            return self.__class__.get_by_name('Winter')
         if self.name == 'Summer':
-            return self.__class__.objects.get(name='Fall')
+            return self.__class__.get_by_name('Fall')
         if self.name == 'Winter':
-            return self.__class__.objects.get(name='Fall')
+            return self.__class__.get_by_name('Fall')
 
 
 class EventCategory(models.Model):
@@ -194,28 +291,146 @@ class EventCategory(models.Model):
     def __unicode__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        moved = self.pk and not EventCategory.objects.filter(
+                                    pk=self.pk,
+                                    parent_category=self.parent_category
+        ).exists()
+        super(EventCategory, self).save(*args, **kwargs)
+        invalidate_category_tree()
+        if moved:
+            ProgressRollup.rebuild()
+        invalidate_progress_table()
+        invalidate_nav_dropdowns()
+
+    def delete(self, *args, **kwargs):
+        super(EventCategory, self).delete(*args, **kwargs)
+        invalidate_category_tree()
+        ProgressRollup.rebuild()
+        invalidate_progress_table()
+        invalidate_nav_dropdowns()
+
+    @classmethod
+    def build_category_tree(cls):
+        """ Returns the closure of the category tree, built from a single
+        query.
+
+        The result is a dictionary with the 'categories' by id, the
+        'ancestors' of each category id (a tuple of ids starting with the
+        category itself, nearest first), the 'descendants' of each category id
+        (a frozenset of ids including the category itself) and the
+        'flattened' tree as a list of (id, depth) pairs in display order.
+        """
+        categories = cls.objects.in_bulk()
+        ancestors = {}
+        descendants = {category_id: set() for category_id in categories}
+        children = {}
+        for category in categories.values():
+            chain = [category.id]
+            parent_id = category.parent_category_id
+            while parent_id is not None and parent_id in categories:
+                chain.append(parent_id)
+                parent_id = categories[parent_id].parent_category_id
+            ancestors[category.id] = tuple(chain)
+            for ancestor_id in chain:
+                descendants[ancestor_id].add(category.id)
+            children.setdefault(category.parent_category_id, []).append(
+                                                                category.id
+            )
+        flattened = []
+        pending = [(category_id, 1)
+                   for category_id in sorted(children.get(None, []),
+                                             reverse=True)]
+        while pending:
+            category_id, depth = pending.pop()
+            flattened.append((category_id, depth))
+            pending.extend(
+                (child_id, depth + 1)
+                for child_id in sorted(children.get(category_id, []),
+                                       reverse=True)
+            )
+        return {
+            'categories': categories,
+            'ancestors': ancestors,
+            'descendants': {
+                category_id: frozenset(ids)
+                for category_id, ids in descendants.items()
+            },
+            'flattened': flattened,
+        }
+
+    @classmethod
+    def get_category_tree(cls, category_ids=()):
+        """ Returns the closure of the category tree (see
+        build_category_tree), from the cache if it is there.
+
+        The cached copy is dropped whenever a category is saved or deleted,
+        and otherwise expires after EVENT_CATEGORY_TREE_TIMEOUT seconds. It
+        is also rebuilt if any of category_ids is missing from it, as happens
+        when another process has just added the category.
+        """
+        category_tree = cache.get(EVENT_CATEGORY_TREE_KEY)
+        if (category_tree is None or
+                not set(category_ids).issubset(category_tree['ancestors'])):
+            category_tree = cls.build_category_tree()
+            cache.set(
+                    EVENT_CATEGORY_TREE_KEY,
+                    category_tree,
+                    EVENT_CATEGORY_TREE_TIMEOUT
+            )
+        return category_tree
+
+    def get_ancestor_ids(self):
+        """ Returns the ids of this category and all of its ancestors,
+        nearest first.
+        """
+        return self.get_category_tree()['ancestors'].get(
+                                                        self.id,
+                                                        (self.id,)
+        )
+
+    def get_descendant_ids(self):
+        """ Returns the ids of this category and all of its descendants. """
+        return self.get_category_tree()['descendants'].get(
+                                                        self.id,
+                                                        frozenset([self.id])
+        )
+
     def get_children(self, query):
         """ Returns a Q object that represents a query to get all of the
         events which correspond to this event category or any of its children.
         """
-        for child in self.eventcategory_set.all():
-            query |= child.get_children(query)
-        return query | Q(event_type=self)
+        return query | Q(event_type__in=self.get_descendant_ids())
 
     @classmethod
     def flatten_category_tree(cls):
         """ Returns a nested list of the category tree(s). """
-        category_array = []
-        for parentless_category in cls.objects.filter(parent_category=None):
-            category_array += parentless_category.flatten_tree(1)
-        return category_array
-    
-    def flatten_tree(category, depth):
-        """ Helper function for flatten_category_tree. """
-        category_array = [{'category': category, 'depth': depth}]
-        for child in category.eventcategory_set.all():
-            category_array += child.flatten_tree(depth+1)
-        return category_array
+        category_tree = cls.get_category_tree()
+        categories = category_tree['categories']
+        return [{'category': categories[category_id], 'depth': depth}
+                for category_id, depth in category_tree['flattened']]
+
+    @classmethod
+    def get_categories_with_ancestors(cls, category_ids=(), fresh=False):
+        """ Returns a dictionary mapping each category id to a list of the
+        category followed by all of its ancestors (nearest first).
+
+        Reads the cached category tree so that progress can be rolled up the
+        tree without following parent_category one hop at a time. The ids the
+        caller is going to look up should be given as category_ids, so that
+        the tree is reloaded if any are missing. Pass fresh=True to build the
+        tree from the database instead, which is needed for anything that
+        is stored, since the cached copy may predate a category being moved.
+        """
+        if fresh:
+            category_tree = cls.build_category_tree()
+        else:
+            category_tree = cls.get_category_tree(category_ids)
+        categories = category_tree['categories']
+        return {
+            category_id: [categories[ancestor_id] for ancestor_id in chain]
+            for category_id, chain in category_tree['ancestors'].items()
+        }
 
 
 class Requirement(models.Model):
@@ -237,18 +452,71 @@ class Requirement(models.Model):
     event_category = models.ForeignKey(EventCategory)
 
     @classmethod
-    def package_requirements(cls, requirements):
-        sorted_reqs = {}
-        return cls.add_child_reqs(sorted_reqs, requirements, None)
-    
+    def build_requirement_tree(cls, distinction_ids, semester_type_id):
+        """ Returns the requirement tree for the distinctions and semester
+        type as a tuple of RequirementNodes in category tree order.
+
+        A category is only included if it and all of its ancestors have
+        requirements. Everything is evaluated up front, taking two queries
+        at most.
+        """
+        amounts = {}
+        for category_id, distinction_id, amount in cls.objects.filter(
+                                distinction_type__in=distinction_ids,
+                                term=semester_type_id
+                        ).order_by('id').values_list(
+                                'event_category_id',
+                                'distinction_type_id',
+                                'amount_required'):
+            amounts.setdefault(category_id, {}).setdefault(
+                                                    distinction_id,
+                                                    amount
+            )
+        category_tree = EventCategory.get_category_tree()
+        categories = category_tree['categories']
+        children = {}
+        for category_id, depth in category_tree['flattened']:
+            if category_id in amounts:
+                children.setdefault(
+                        categories[category_id].parent_category_id,
+                        []
+                ).append(category_id)
+
+        def build_nodes(parent_id):
+            return tuple(
+                RequirementNode(
+                    categories[category_id],
+                    tuple(sorted(amounts[category_id].items())),
+                    build_nodes(category_id)
+                )
+                for category_id in children.get(parent_id, [])
+            )
+        return build_nodes(None)
+
     @classmethod
-    def add_child_reqs(cls, sorted_reqs, requirements, parent):
-        event_categories = EventCategory.objects.filter(parent_category=parent)
-        for event_category in event_categories:
-            reqs = requirements.filter(event_category=event_category)
-            if reqs:
-                sorted_reqs[event_category]={"children":cls.add_child_reqs({},requirements,event_category),"requirements":reqs}
-        return sorted_reqs
+    def get_requirement_tree(cls, distinctions, semester_type):
+        """ Returns the requirement tree (see build_requirement_tree) for the
+        distinctions and semester type, from the cache if it is there.
+
+        The cached trees are keyed on the progress table version, so saving
+        or deleting a requirement, distinction or category replaces them.
+        """
+        distinction_ids = sorted(set(
+                    distinction.id for distinction in distinctions
+        ))
+        cache_key = 'REQUIREMENT_TREE_%s_%d_%s' % (
+                    '_'.join(unicode(pk) for pk in distinction_ids),
+                    semester_type.id,
+                    get_progress_table_version()
+        )
+        requirement_tree = cache.get(cache_key)
+        if requirement_tree is None:
+            requirement_tree = cls.build_requirement_tree(
+                                            distinction_ids,
+                                            semester_type.id
+            )
+            cache.set(cache_key, requirement_tree, REQUIREMENT_TREE_TIMEOUT)
+        return requirement_tree
 
     def __unicode__(self):
         terms = ', '.join([unicode(term) for term in self.term.all()])
@@ -256,19 +524,44 @@ class Requirement(models.Model):
 
     def save(self, *args, **kwargs):
         super(Requirement, self).save(*args, **kwargs)
-        cache.delete_many([
-                'PROGRESS_TABLE_ACTIVE_REQS',
-                'PROGRESS_TABLE_UGRADEL_REQS',
-                'PROGRESS_TABLE_GRADEL_REQS'
-        ])
+        invalidate_progress_table()
 
     def delete(self, *args, **kwargs):
         super(Requirement, self).delete(*args, **kwargs)
-        cache.delete_many([
-                'PROGRESS_TABLE_ACTIVE_REQS',
-                'PROGRESS_TABLE_UGRADEL_REQS',
-                'PROGRESS_TABLE_GRADEL_REQS'
-        ])
+        invalidate_progress_table()
+
+
+class RequirementNode(namedtuple('RequirementNode',
+                                 ['event_category', 'amounts', 'children'])):
+    """ An event category in a requirement tree.
+
+    The amounts are (distinction_type_id, amount_required) pairs and the
+    children are the RequirementNodes of the category's subcategories.
+    """
+    __slots__ = ()
+
+    def get_amount(self, distinction_id):
+        """ Returns the amount the distinction requires, or None if the
+        distinction has no requirement in this category.
+        """
+        for amount_distinction_id, amount in self.amounts:
+            if amount_distinction_id == distinction_id:
+                return amount
+        return None
+
+    def flatten(self):
+        """ Returns this node's category followed by those of all of its
+        descendants in tree order.
+        """
+        flattened = [self.event_category]
+        for child in self.children:
+            flattened.extend(child.flatten())
+        return flattened
+
+
+@receiver(m2m_changed, sender=Requirement.term.through)
+def invalidate_requirement_terms(sender, **kwargs):
+    invalidate_progress_table()
 
 
 class ProgressItem(models.Model):
@@ -292,6 +585,9 @@ class ProgressItem(models.Model):
     date_completed = models.DateField()
     name = models.CharField('Name/Desciption', max_length=100)
 
+    class Meta:
+        index_together = [('related_event', 'member')]
+
     def __unicode__(self):
         return self.member.get_full_name() + ': ' +\
                unicode(self.amount_completed) + ' credit(s) toward ' +\
@@ -299,38 +595,99 @@ class ProgressItem(models.Model):
                unicode(self.date_completed) + ' for '+unicode(self.term)
 
     def save(self, *args, **kwargs):
-        super(ProgressItem, self).save(*args, **kwargs)
-        if self.member.status.name == 'Active':
-            cache.delete('PROGRESS_TABLE_ACTIVE_ROWS')
-        elif self.member.standing.name == 'Undergraduate':
-            cache.delete('PROGRESS_TABLE_UGRADEL_ROWS')
-        else:
-            cache.delete('PROGRESS_TABLE_GRADEL_ROWS')
+        with transaction.atomic():
+            if self.pk:
+                ProgressRollup.remove_progress_items(
+                        ProgressItem.objects.filter(pk=self.pk)
+                )
+            super(ProgressItem, self).save(*args, **kwargs)
+            ProgressRollup.add_progress_items([self])
+        invalidate_progress_rows([self.member_id])
 
-    def delete(self, *args, **kwargs):
-        if self.member.status.name == 'Active':
-            cache.delete('PROGRESS_TABLE_ACTIVE_ROWS')
-        elif self.member.standing.name == 'Undergraduate':
-            cache.delete('PROGRESS_TABLE_UGRADEL_ROWS')
-        else:
-            cache.delete('PROGRESS_TABLE_GRADEL_ROWS')
-        super(ProgressItem, self).delete(*args, **kwargs)
+    @classmethod
+    def aggregate_totals(cls, progress_items):
+        """ Returns (member_id, term_id, event_type_id, full, sat) tuples, one
+        per member, term and event type in the progress_items queryset.
+
+        The full and saturated sums are computed by the database in a single
+        query.
+        """
+        saturated_amount = Case(
+                    When(
+                        amount_completed__gt=SATURATION_LIMIT,
+                        then=Value(SATURATION_LIMIT)
+                    ),
+                    default=F('amount_completed'),
+                    output_field=DecimalField(max_digits=5, decimal_places=2)
+        )
+        return progress_items.values_list(
+                    'member_id',
+                    'term_id',
+                    'event_type_id'
+        ).annotate(
+                    full=Sum('amount_completed'),
+                    sat=Sum(saturated_amount)
+        ).order_by()
+
+    @classmethod
+    def roll_up_totals(cls, totals, fresh=False):
+        """ Rolls the output of aggregate_totals up the category tree.
+
+        Returns {(member_id, term_id, event_category): {'full':, 'sat':}}
+        where each total counts toward its own category and every ancestor.
+        Pass fresh=True when the result is going to be stored (see
+        EventCategory.get_categories_with_ancestors).
+        """
+        totals = list(totals)
+        ancestors = EventCategory.get_categories_with_ancestors(
+                    set(event_type_id for member_id, term_id, event_type_id,
+                        full, sat in totals),
+                    fresh=fresh
+        )
+        rolled_up = {}
+        for member_id, term_id, event_type_id, full, sat in totals:
+            for event_category in ancestors[event_type_id]:
+                key = (member_id, term_id, event_category)
+                if key in rolled_up:
+                    rolled_up[key]['full'] += full
+                    rolled_up[key]['sat'] += sat
+                else:
+                    rolled_up[key] = {'full': full, 'sat': sat}
+        return rolled_up
+
+    @classmethod
+    def package_progress_by_member(cls, term, profiles=None):
+        """ Returns {uniqname: packaged progress} for the term.
+
+        The packaged progress for each member has the same form as the output
+        of package_progress, but it is computed for every member at once from
+        a single aggregated query, with the totals rolled up the category tree
+        in memory. If profiles is given, only those members are included.
+
+        This always reads the raw progress items; pages should prefer the
+        equivalent lookup on ProgressRollup.
+        """
+        progress_items = cls.objects.filter(term=term)
+        if profiles is not None:
+            progress_items = progress_items.filter(member__in=profiles)
+        rolled_up = cls.roll_up_totals(cls.aggregate_totals(progress_items))
+        packaged_progress = {}
+        for (member_id, term_id, event_category), amounts in rolled_up.items():
+            member_progress = packaged_progress.setdefault(member_id, {})
+            member_progress[event_category] = amounts
+        return packaged_progress
 
     @classmethod
     def package_progress(cls, progress_items):
+        progress_items = list(progress_items)
+        ancestors = EventCategory.get_categories_with_ancestors(
+                    set(progress_item.event_type_id
+                        for progress_item in progress_items)
+        )
         packaged_progress={}
         for progress_item in progress_items:
-            associated_event_type =progress_item.event_type
-            if associated_event_type in packaged_progress.keys():
-                packaged_progress[associated_event_type]['full']+=progress_item.amount_completed
-                packaged_progress[associated_event_type]['sat']+=saturate_hours(progress_item.amount_completed)
-            else:
-                packaged_progress[associated_event_type]={'full':0,'sat':0}
-                packaged_progress[associated_event_type]['full']=progress_item.amount_completed
-                packaged_progress[associated_event_type]['sat']=saturate_hours(progress_item.amount_completed)
-            while associated_event_type.parent_category!=None:
-                associated_event_type = associated_event_type.parent_category
-                if associated_event_type in packaged_progress.keys():
+            for associated_event_type in ancestors[progress_item.event_type_id]:
+                if associated_event_type in packaged_progress:
                     packaged_progress[associated_event_type]['full']+=progress_item.amount_completed
                     packaged_progress[associated_event_type]['sat']+=saturate_hours(progress_item.amount_completed)
                 else:
@@ -338,3 +695,234 @@ class ProgressItem(models.Model):
                     packaged_progress[associated_event_type]['full']=progress_item.amount_completed
                     packaged_progress[associated_event_type]['sat']=saturate_hours(progress_item.amount_completed)
         return packaged_progress
+
+
+class ProgressRollup(models.Model):
+    """ A member's total progress in an event category for a term.
+
+    This is a denormalized copy of the ProgressItem totals, where each item
+    counts toward its own category and all of that category's ancestors, so
+    that progress can be read without walking the category tree. It is kept
+    current by ProgressItem.save() and by the remove_deleted_progress
+    post_delete handler, which also covers queryset deletes and cascades
+    (from events, members and so on). It can be rebuilt and checked with
+    the rebuild_progress_rollups management command.
+    """
+    member = models.ForeignKey('mig_main.MemberProfile')
+    term = models.ForeignKey('mig_main.AcademicTerm')
+    event_category = models.ForeignKey(EventCategory)
+    full = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    sat = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('member', 'term', 'event_category')
+
+    def __unicode__(self):
+        return unicode(self.member_id) + ': ' + unicode(self.full) +\
+               ' credit(s) toward ' + unicode(self.event_category) +\
+               ' for ' + unicode(self.term)
+
+    @classmethod
+    def apply_totals(cls, rolled_up, sign=1):
+        """ Adds the output of ProgressItem.roll_up_totals to the stored
+        totals (or subtracts it if sign is -1).
+
+        Works through the totals in batches. Stored rows that change by the
+        same amount are updated by a single query and missing rows are
+        created in bulk, so recording an event's progress for many members
+        takes a handful of queries.
+
+        When subtracting, missing rows are left missing: they have already
+        been deleted along with their member, term or category.
+        """
+        totals = rolled_up.items()
+        for start in range(0, len(totals), ROLLUP_BATCH_SIZE):
+            batch = totals[start:start + ROLLUP_BATCH_SIZE]
+            rollup_ids = {}
+            for rollup_id, member_id, term_id, category_id in (
+                    cls.objects.filter(
+                        member_id__in=set(key[0] for key, amounts in batch),
+                        term_id__in=set(key[1] for key, amounts in batch),
+                        event_category__in=set(key[2] for key, amounts in batch)
+                    ).values_list(
+                        'id',
+                        'member_id',
+                        'term_id',
+                        'event_category_id'
+                    )):
+                rollup_ids[(member_id, term_id, category_id)] = rollup_id
+            ids_by_change = {}
+            missing = []
+            for (member_id, term_id, event_category), amounts in batch:
+                full = sign * amounts['full']
+                sat = sign * amounts['sat']
+                rollup_id = rollup_ids.get(
+                                    (member_id, term_id, event_category.id)
+                )
+                if rollup_id is None:
+                    if sign < 0:
+                        continue
+                    missing.append(cls(
+                                member_id=member_id,
+                                term_id=term_id,
+                                event_category=event_category,
+                                full=full,
+                                sat=sat
+                    ))
+                else:
+                    ids_by_change.setdefault((full, sat), []).append(rollup_id)
+            for (full, sat), ids in ids_by_change.items():
+                cls.objects.filter(id__in=ids).update(
+                                    full=F('full') + full,
+                                    sat=F('sat') + sat
+                )
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create(missing)
+            except IntegrityError:
+                # Another writer created some of these rows first.
+                for rollup in missing:
+                    cls.add_to_row(rollup)
+
+    @classmethod
+    def add_to_row(cls, rollup):
+        """ Creates the unsaved rollup's row, or adds its totals to the row
+        if it already exists.
+        """
+        try:
+            with transaction.atomic():
+                rollup.save()
+        except IntegrityError:
+            cls.objects.filter(
+                    member_id=rollup.member_id,
+                    term_id=rollup.term_id,
+                    event_category_id=rollup.event_category_id
+            ).update(
+                    full=F('full') + rollup.full,
+                    sat=F('sat') + rollup.sat
+            )
+
+    @classmethod
+    def add_progress_items(cls, progress_items, sign=1):
+        """ Adds the given progress items to the stored totals.
+
+        progress_items may be a queryset, in which case it is aggregated in
+        the database, or a list of ProgressItem instances. Pass sign=-1 to
+        remove the items instead.
+        """
+        if isinstance(progress_items, QuerySet):
+            totals = ProgressItem.aggregate_totals(progress_items)
+        else:
+            totals = [
+                (
+                    item.member_id,
+                    item.term_id,
+                    item.event_type_id,
+                    item.amount_completed,
+                    saturate_hours(item.amount_completed)
+                )
+                for item in progress_items
+            ]
+        cls.apply_totals(ProgressItem.roll_up_totals(totals, fresh=True), sign)
+
+    @classmethod
+    def remove_progress_items(cls, progress_items):
+        cls.add_progress_items(progress_items, sign=-1)
+
+    @classmethod
+    def compute_totals(cls, term=None):
+        """ Returns what the stored totals should be, computed from scratch
+        from the progress items.
+        """
+        progress_items = ProgressItem.objects.all()
+        if term:
+            progress_items = progress_items.filter(term=term)
+        return ProgressItem.roll_up_totals(
+                    ProgressItem.aggregate_totals(progress_items),
+                    fresh=True
+        )
+
+    @classmethod
+    def rebuild(cls, term=None):
+        """ Replaces the stored totals (for one term or all of them) with
+        totals computed from the progress items.
+        """
+        rollups = cls.objects.all()
+        if term:
+            rollups = rollups.filter(term=term)
+        rolled_up = cls.compute_totals(term)
+        with transaction.atomic():
+            rollups.delete()
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        member_id=member_id,
+                        term_id=term_id,
+                        event_category=event_category,
+                        full=amounts['full'],
+                        sat=amounts['sat']
+                    )
+                    for (member_id, term_id, event_category), amounts
+                    in rolled_up.items()
+                ],
+                batch_size=500
+            )
+
+    @classmethod
+    def find_discrepancies(cls, term=None):
+        """ Returns a list of (member_id, term_id, event_category, expected,
+        stored) for every stored total that does not match the progress items.
+
+        A missing row is treated the same as a row with zero totals.
+        """
+        zero = {'full': 0, 'sat': 0}
+        expected_totals = cls.compute_totals(term)
+        rollups = cls.objects.select_related('event_category')
+        if term:
+            rollups = rollups.filter(term=term)
+        stored_totals = {}
+        for rollup in rollups:
+            key = (rollup.member_id, rollup.term_id, rollup.event_category)
+            stored_totals[key] = {'full': rollup.full, 'sat': rollup.sat}
+        discrepancies = []
+        for key in set(expected_totals.keys()) | set(stored_totals.keys()):
+            expected = expected_totals.get(key, zero)
+            stored = stored_totals.get(key, zero)
+            if (expected['full'] != stored['full'] or
+               expected['sat'] != stored['sat']):
+                discrepancies.append(key + (expected, stored))
+        return discrepancies
+
+    @classmethod
+    def package_progress_by_member(cls, term, profiles=None):
+        """ Returns {uniqname: packaged progress} for the term, read from the
+        stored totals in a single query.
+
+        The packaged progress has the same form as the output of
+        ProgressItem.package_progress.
+        """
+        rollups = cls.objects.filter(term=term).exclude(full=0, sat=0)
+        if profiles is not None:
+            rollups = rollups.filter(member__in=profiles)
+        packaged_progress = {}
+        for rollup in rollups.select_related('event_category'):
+            member_progress = packaged_progress.setdefault(rollup.member_id, {})
+            member_progress[rollup.event_category] = {
+                    'full': rollup.full,
+                    'sat': rollup.sat
+            }
+        return packaged_progress
+
+    @classmethod
+    def package_progress(cls, profile, term):
+        """ Returns the packaged progress for a single member and term."""
+        return cls.package_progress_by_member(term, [profile]).get(
+                                                        profile.uniqname,
+                                                        {}
+        )
+
+
+@receiver(post_delete, sender=ProgressItem)
+def remove_deleted_progress(sender, instance, **kwargs):
+    ProgressRollup.remove_progress_items([instance])
+    invalidate_progress_rows([instance.member_id])